@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+ReAct vs. plan-and-execute agent (pet_store_agent/plan_execute.py) on the same prompts.
+
+Builds the agent in each AGENT_MODE around the scripted fake chat model, replays
+the prompts from a JSONL file through handle_request and reports model calls per
+request, end-to-end latency percentiles, schema-valid responses and how often the
+two modes return the same status and total. Both modes are run with the prefetch
+stage (prefetch.py) on and off, since prefetch already saves the ReAct agent its
+first model turn.
+
+Usage:
+    python bench/agent_modes.py [--requests bench/prompts.jsonl] [--repeat 3] [--model-latency 0.05]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+import stubs
+from telemetry import percentile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_prompts(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["prompt"] for line in f if line.strip()]
+
+
+def _outcome(response):
+    try:
+        data = json.loads(response)
+    except ValueError:
+        return None
+    return data.get("status"), data.get("total")
+
+
+def run(pet_store_agent, mode, prompts, model_latency):
+    model = stubs.ScriptedChatModel(latency=model_latency)
+    pet_store_agent.set_agent(pet_store_agent.create_agent(model=model, mode=mode))
+    latencies, calls, outcomes = [], [], []
+    valid = 0
+    for prompt in prompts:
+        before = model.stats["model_calls"]
+        started = time.perf_counter()
+        result = pet_store_agent.handle_request(prompt)
+        latencies.append((time.perf_counter() - started) * 1000)
+        calls.append(model.stats["model_calls"] - before)
+        valid += result["metadata"]["validation"]["outcome"] in ("valid", "repaired", "reasked")
+        outcomes.append(_outcome(result["response"]))
+    report = {
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies), 1),
+            "p50": percentile(latencies, 50, 1),
+            "p95": percentile(latencies, 95, 1),
+            "p99": percentile(latencies, 99, 1),
+        },
+        "model_calls_per_request": {
+            "mean": round(statistics.fmean(calls), 2),
+            "max": max(calls),
+        },
+        "valid_responses": valid,
+    }
+    return report, outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", default=os.path.join(BENCH_DIR, "prompts.jsonl"), help="JSONL file of {\"prompt\": ...} lines")
+    parser.add_argument("--repeat", type=int, default=3, help="times to replay the prompts per mode")
+    parser.add_argument("--model-latency", type=float, default=0.05, help="seconds per model call")
+    parser.add_argument("--lambda-latency", type=float, default=0.02, help="seconds per Lambda invocation")
+    parser.add_argument("--kb-latency", type=float, default=0.03, help="seconds per knowledge base retrieval")
+    args = parser.parse_args()
+
+    stubs.install_stand_ins(args.lambda_latency, args.kb_latency)
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    os.environ["MODEL_ROUTER_ENABLED"] = "false"
+    import logging
+    import pet_store_agent
+
+    logging.getLogger().setLevel(logging.WARNING)
+    prompts = load_prompts(args.requests) * args.repeat
+
+    report = {"requests": len(prompts)}
+    for prefetch in ("true", "false"):
+        os.environ["PREFETCH_ENABLED"] = prefetch
+        runs, outcomes = {}, {}
+        for mode in ("react", "plan"):
+            runs[mode], outcomes[mode] = run(pet_store_agent, mode, prompts, args.model_latency)
+        runs["same_status_and_total"] = sum(a == b for a, b in zip(outcomes["react"], outcomes["plan"]))
+        report["prefetch_on" if prefetch == "true" else "prefetch_off"] = runs
+
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
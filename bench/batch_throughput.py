@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Throughput of the JSONL batch runner (pet_store_agent/batch.py) against local stand-ins.
+
+Replays bench/prompts.jsonl through run_batch with the scripted fake chat model at
+several concurrency levels, and reports throughput, error rate and latency
+percentiles for each. A last pass interrupts a run halfway and resumes it, to
+check that resumed runs only process the requests that are missing.
+
+Usage:
+    python bench/batch_throughput.py --requests 120 --concurrency 1 4 16 --model-latency 0.05
+"""
+import os
+import sys
+import json
+import asyncio
+import argparse
+import tempfile
+import itertools
+
+import stubs
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def write_requests(path, count):
+    with open(os.path.join(BENCH_DIR, "prompts.jsonl"), encoding="utf-8") as f:
+        prompts = [json.loads(line)["prompt"] for line in f if line.strip()]
+    with open(path, "w", encoding="utf-8") as f:
+        for i, prompt in zip(range(count), itertools.cycle(prompts)):
+            f.write(json.dumps({"id": f"req-{i:05d}", "prompt": prompt}) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=120, help="requests per run")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="concurrency levels to run")
+    parser.add_argument("--rate", type=float, default=0.0, help="requests started per second, 0 for no limit")
+    parser.add_argument("--model-latency", type=float, default=0.05, help="seconds per model call")
+    parser.add_argument("--lambda-latency", type=float, default=0.02, help="seconds per Lambda invocation")
+    parser.add_argument("--kb-latency", type=float, default=0.03, help="seconds per knowledge base retrieval")
+    args = parser.parse_args()
+
+    stubs.install_stand_ins(args.lambda_latency, args.kb_latency)
+    # Measure the agent, not the retrieval and response caches
+    os.environ["RETRIEVAL_CACHE_ENABLED"] = "false"
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    import logging
+    import pet_store_agent
+    import batch
+
+    pet_store_agent.set_agent(pet_store_agent.create_agent(model=stubs.ScriptedChatModel(latency=args.model_latency)))
+    logging.getLogger().setLevel(logging.WARNING)
+
+    directory = tempfile.mkdtemp(prefix="pet_store_batch_")
+    requests_path = os.path.join(directory, "requests.jsonl")
+    write_requests(requests_path, args.requests)
+
+    report = {"requests": args.requests, "rate": args.rate, "runs": {}}
+    for concurrency in args.concurrency:
+        output_path = os.path.join(directory, f"results_c{concurrency}.jsonl")
+        report["runs"][f"concurrency={concurrency}"] = asyncio.run(
+            batch.run_batch(requests_path, output_path, concurrency=concurrency, rate=args.rate)
+        )
+
+    # Keep only the first half of a finished run's output, then resume it
+    output_path = os.path.join(directory, f"results_c{args.concurrency[-1]}.jsonl")
+    with open(output_path, encoding="utf-8") as f:
+        lines = f.readlines()
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.writelines(lines[:len(lines) // 2])
+    resumed = asyncio.run(batch.run_batch(requests_path, output_path, concurrency=args.concurrency[-1], resume=True))
+    with open(output_path, encoding="utf-8") as f:
+        ids = [json.loads(line)["id"] for line in f]
+    report["resume"] = {
+        "skipped": resumed["skipped"],
+        "processed": resumed["processed"],
+        "complete": len(ids) == len(set(ids)) == args.requests,
+    }
+
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Guest response cache (pet_store_agent/response_cache.py) under repeated guest traffic.
+
+Replays a stream of anonymous "how much is X" / "is X in stock" prompts drawn from
+a Zipf distribution over the stand-in catalog through process_request, once with
+the response cache off and once with it on, and reports latency percentiles, model
+calls and the hit rate. Halfway through the cached run one product's inventory
+crosses a status threshold; the report checks that every answer about it after
+the change matches what the agent answers without the cache.
+
+Usage:
+    python bench/guest_cache.py --requests 300 --model-latency 0.05 --zipf 1.1
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+import stubs
+from telemetry import percentile
+
+# Product whose stock runs out halfway through the cached run
+CHANGED_PRODUCT = "DD006"
+
+
+def guest_prompts():
+    templates = ["How much does {name} cost?", "Is {name} in stock?", "What is the price of {name}?"]
+    return [(product["code"], template.format(name=product["name"])) for product in stubs.CATALOG for template in templates]
+
+
+def traffic(count, exponent, seed):
+    prompts = guest_prompts()
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) ** exponent for rank in range(len(prompts))]
+    return rng.choices(prompts, weights=weights, k=count)
+
+
+def run(pet_store_agent, model, requests, change_at=None):
+    latencies = []
+    answers_after_change = []
+    calls_before = model.stats["model_calls"]
+    for i, (code, prompt) in enumerate(requests):
+        if i == change_at:
+            stubs.INVENTORY[CHANGED_PRODUCT].update(quantity=0, status="out_of_stock")
+        started = time.perf_counter()
+        response = pet_store_agent.process_request(prompt)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if change_at is not None and i >= change_at and code == CHANGED_PRODUCT:
+            answers_after_change.append((prompt, json.loads(response)["status"]))
+    report = {
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 1),
+            "p50": percentile(latencies, 50, 1),
+            "p95": percentile(latencies, 95, 1),
+            "p99": percentile(latencies, 99, 1),
+        },
+        "model_calls": model.stats["model_calls"] - calls_before,
+    }
+    return report, answers_after_change
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300, help="guest requests per run")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of prompt popularity")
+    parser.add_argument("--model-latency", type=float, default=0.05, help="seconds per model call")
+    parser.add_argument("--lambda-latency", type=float, default=0.02, help="seconds per Lambda invocation")
+    parser.add_argument("--kb-latency", type=float, default=0.03, help="seconds per knowledge base retrieval")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    stubs.install_stand_ins(args.lambda_latency, args.kb_latency)
+    import logging
+    import pet_store_agent
+    import response_cache
+
+    model = stubs.ScriptedChatModel(latency=args.model_latency)
+    pet_store_agent.set_agent(pet_store_agent.create_agent(model=model))
+    logging.getLogger().setLevel(logging.WARNING)
+    requests = traffic(args.requests, args.zipf, args.seed)
+    original = dict(stubs.INVENTORY[CHANGED_PRODUCT])
+
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    uncached, _ = run(pet_store_agent, model, requests)
+
+    os.environ["RESPONSE_CACHE_ENABLED"] = "true"
+    cached, after_change = run(pet_store_agent, model, requests, change_at=len(requests) // 2)
+
+    # What the agent answers about the changed product without the cache
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    expected = {prompt: json.loads(pet_store_agent.process_request(prompt))["status"] for prompt, _ in after_change}
+    stubs.INVENTORY[CHANGED_PRODUCT].update(original)
+
+    cached.update(response_cache.cache_stats())
+    report = {
+        "requests": args.requests,
+        "distinct_prompts": len(set(prompt for _, prompt in requests)),
+        "cache_off": uncached,
+        "cache_on": cached,
+        "after_status_change": {
+            "answers": len(after_change),
+            "consistent": all(status == expected[prompt] for prompt, status in after_change),
+        },
+    }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+System function calls against a fault-injecting Lambda stand-in.
+
+Calls get_inventory and get_user_by_id repeatedly through the shared invocation
+layer (system_functions) while the stand-in injects cold-start stalls, throttling
+or a full outage, and reports per scenario the call latency percentiles, the error
+rate, Lambda invocations per call (load amplification) and the layer's counters.
+
+Each scenario runs twice: "baseline" with hedging, retries and the circuit breaker
+effectively off, and "resilient" with the defaults.
+
+Usage:
+    python bench/lambda_faults.py --calls 300 --concurrency 4
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import stubs
+from telemetry import percentile
+
+SCENARIOS = {
+    "healthy": {},
+    "cold_starts": {"slow_rate": 0.05, "slow_latency": 1.0},
+    "throttling": {"error_rate": 0.1},
+    "outage": {"error_rate": 1.0, "error_code": "ServiceException"},
+}
+
+MODES = {
+    "baseline": {"LAMBDA_HEDGING_ENABLED": "false", "LAMBDA_MAX_ATTEMPTS": "1", "LAMBDA_BREAKER_FAILURES": "1000000"},
+    "resilient": {},
+}
+
+MODE_ENV = ("LAMBDA_HEDGING_ENABLED", "LAMBDA_MAX_ATTEMPTS", "LAMBDA_BREAKER_FAILURES")
+
+
+def run(calls, concurrency, latency, scenario, mode):
+    import aws_clients
+    import system_functions
+    from inventory_management import get_inventory
+    from user_management import get_user_by_id
+
+    for name in MODE_ENV:
+        os.environ.pop(name, None)
+    os.environ.update(MODES[mode])
+    system_functions.reset_invocation_state()
+    client = stubs.FaultyLambdaClient(latency, latency / 4, **SCENARIOS[scenario])
+    aws_clients.set_client('lambda', client)
+
+    def call(i):
+        started = time.perf_counter()
+        result = get_inventory("DD006") if i % 2 else get_user_by_id("usr_001")
+        return (time.perf_counter() - started) * 1000, result.startswith("Failed to")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(call, range(calls)))
+
+    latencies = [latency_ms for latency_ms, _ in results]
+    return {
+        "p50_ms": percentile(latencies, 50, 1),
+        "p95_ms": percentile(latencies, 95, 1),
+        "p99_ms": percentile(latencies, 99, 1),
+        "max_ms": round(max(latencies), 1),
+        "error_rate": round(sum(failed for _, failed in results) / calls, 3),
+        "invocations_per_call": round(client.calls["invocations"] / calls, 2),
+        "layer": system_functions.invocation_stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=300, help="tool calls per scenario and mode")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent tool calls")
+    parser.add_argument("--lambda-latency", type=float, default=0.02, help="seconds per healthy Lambda invocation")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), action="append", help="scenario to run (default all)")
+    args = parser.parse_args()
+
+    stubs.install_stand_ins()
+    # Keep the cold-start stall well inside the call deadline
+    os.environ.setdefault("LAMBDA_TIMEOUT_SECONDS", "5")
+
+    report = {"calls": args.calls, "concurrency": args.concurrency, "scenarios": {}}
+    for scenario in args.scenario or SCENARIOS:
+        report["scenarios"][scenario] = {
+            mode: run(args.calls, args.concurrency, args.lambda_latency, scenario, mode) for mode in MODES
+        }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
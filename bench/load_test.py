@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Load test of the AgentCore HTTP server (pet_store_agent/agentcore_entrypoint.py).
+
+Starts the real BedrockAgentCoreApp in a child process, with the scripted fake
+chat model and the in-process Lambda and knowledge base stand-ins behind it, and
+drives POST /invocations over HTTP:
+- closed loop: a fixed number of clients, each sending its next request as soon
+  as the previous one is answered, at each concurrency level
+- open loop: requests started at a fixed arrival rate, whether or not earlier
+  ones were answered, at each rate; latency counts from the scheduled start, so
+  queueing in the server is not hidden
+For each level it reports throughput (responses and successful responses per
+second), latency percentiles, and HTTP errors, timeouts and Error responses. The
+saturation point is the concurrency after which throughput stops growing by at
+least 10%, and the highest arrival rate the server keeps up with (95% of the
+offered rate) within the p95 latency objective and error budget.
+
+With --sessions every closed-loop client continues its own session, to see how
+many concurrent conversations one container holds. With --url the load goes to
+a running server instead, e.g. the container started by `agentcore launch --local`.
+
+Usage:
+    python bench/load_test.py --concurrency 1 2 4 8 16 32 --rates 5 10 20 40 --duration 10 --model-latency 0.5
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import itertools
+import subprocess
+from collections import Counter
+from urllib.parse import urlparse
+from urllib.request import urlopen
+
+import stubs
+from telemetry import percentile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Growth in throughput below which another step of concurrency is not worth it
+SATURATION_GAIN = 0.10
+# Share of the offered rate the server must keep up with
+KEEP_UP_RATIO = 0.95
+
+
+def load_prompts(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["prompt"] for line in f if line.strip()]
+
+
+def serve(args):
+    """Run in the child process: the AgentCore app in front of the stand-ins."""
+    stubs.install_stand_ins(args.lambda_latency, args.kb_latency, args.jitter)
+    if not args.cache:
+        os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    import pet_store_agent
+
+    # Installed before the entrypoint is imported, so its warm-up finds the agent built
+    pet_store_agent.set_agent(pet_store_agent.create_agent(model=stubs.ScriptedChatModel(latency=args.model_latency, jitter=args.jitter)))
+    import logging
+    import agentcore_entrypoint
+
+    logging.getLogger().setLevel(logging.WARNING)
+    agentcore_entrypoint.app.run(port=args.port, host="127.0.0.1")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(args):
+    """Start the server in a child process and wait until it reports Healthy."""
+    port = _free_port()
+    log = tempfile.NamedTemporaryFile(prefix="pet_store_load_server_", suffix=".log", delete=False)
+    command = [
+        sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port),
+        "--model-latency", str(args.model_latency), "--lambda-latency", str(args.lambda_latency),
+        "--kb-latency", str(args.kb_latency), "--jitter", str(args.jitter),
+    ] + (["--cache"] if args.cache else [])
+    process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+
+    url = f"http://127.0.0.1:{port}"
+    started = time.monotonic()
+    while time.monotonic() - started < 120:
+        if process.poll() is not None:
+            break
+        try:
+            with urlopen(f"{url}/ping", timeout=1) as response:
+                if json.loads(response.read()).get("status") == "Healthy":
+                    return process, url
+        except OSError:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    with open(log.name, encoding="utf-8", errors="replace") as f:
+        raise RuntimeError(f"Server did not become healthy:\n{f.read()[-2000:]}")
+
+
+def _dechunk(content):
+    body = b""
+    while content:
+        size, _, rest = content.partition(b"\r\n")
+        length = int(size.split(b";")[0], 16)
+        if length == 0:
+            break
+        body += rest[:length]
+        content = rest[length + 2:]
+    return body
+
+
+async def post(host, port, payload, timeout):
+    """POST a JSON payload to /invocations; returns (HTTP status, body)."""
+    body = json.dumps(payload).encode("utf-8")
+    request = (
+        f"POST /invocations HTTP/1.1\r\nHost: {host}:{port}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+    ).encode("ascii") + body
+
+    async def exchange():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            writer.write(request)
+            await writer.drain()
+            return await reader.read()
+        finally:
+            writer.close()
+
+    raw = await asyncio.wait_for(exchange(), timeout)
+    head, _, content = raw.partition(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    if b"transfer-encoding: chunked" in head.lower():
+        content = _dechunk(content)
+    return status, content
+
+
+def _outcome(status, content):
+    """Classify a response: "ok", "error_response" (the agent answered with the Error status) or "http_error"."""
+    if status != 200:
+        return "http_error"
+    try:
+        response = json.loads(content)
+        if isinstance(response, str):
+            response = json.loads(response)
+    except ValueError:
+        return "ok"
+    return "error_response" if isinstance(response, dict) and response.get("status") == "Error" else "ok"
+
+
+async def timed_request(target, payload, timeout, started=None):
+    """Send one request; latency counts from started (the scheduled start) when given."""
+    loop = asyncio.get_running_loop()
+    started = loop.time() if started is None else started
+    try:
+        outcome = _outcome(*await post(target.hostname, target.port, payload, timeout))
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+    except (OSError, ValueError, IndexError):
+        outcome = "connection_error"
+    return outcome, (loop.time() - started) * 1000
+
+
+def summarize(results, elapsed):
+    outcomes = Counter(outcome for outcome, _ in results)
+    answered = [latency for outcome, latency in results if outcome in ("ok", "error_response")]
+    return {
+        "requests": len(results),
+        "throughput_rps": round(len(answered) / elapsed, 2),
+        "goodput_rps": round(outcomes["ok"] / elapsed, 2),
+        "latency_ms": {
+            "p50": percentile(answered, 50, 1),
+            "p95": percentile(answered, 95, 1),
+            "p99": percentile(answered, 99, 1),
+            "max": round(max(answered), 1) if answered else None,
+        },
+        "errors": {kind: count for kind, count in outcomes.items() if kind != "ok"},
+        "error_rate": round(1 - outcomes["ok"] / len(results), 4) if results else 0.0,
+    }
+
+
+async def closed_loop(target, prompts, concurrency, duration, timeout, sessions):
+    loop = asyncio.get_running_loop()
+    results = []
+    started = loop.time()
+    stop = started + duration
+    session_prefix = f"load-{os.urandom(4).hex()}"
+
+    async def client(i):
+        for n in itertools.count():
+            if loop.time() >= stop:
+                return
+            payload = {"prompt": prompts[(i + n) % len(prompts)]}
+            if sessions:
+                payload["session_id"] = f"{session_prefix}-{i}"
+            results.append(await timed_request(target, payload, timeout))
+
+    await asyncio.gather(*(client(i) for i in range(concurrency)))
+    return summarize(results, loop.time() - started)
+
+
+async def open_loop(target, prompts, rate, duration, timeout):
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    tasks = []
+    for i in itertools.count():
+        scheduled = started + i / rate
+        if scheduled - started >= duration:
+            break
+        await asyncio.sleep(max(0.0, scheduled - loop.time()))
+        tasks.append(asyncio.ensure_future(timed_request(target, {"prompt": prompts[i % len(prompts)]}, timeout, scheduled)))
+    results = await asyncio.gather(*tasks)
+    summary = summarize(results, loop.time() - started)
+    summary["offered_rps"] = rate
+    return summary
+
+
+def closed_loop_saturation(levels):
+    """The concurrency after which throughput grows by less than SATURATION_GAIN."""
+    best = None
+    for concurrency, summary in levels:
+        if best is not None and summary["goodput_rps"] < best[1]["goodput_rps"] * (1 + SATURATION_GAIN):
+            break
+        best = (concurrency, summary)
+    if best is None:
+        return None
+    return {"concurrency": best[0], "goodput_rps": best[1]["goodput_rps"], "p95_ms": best[1]["latency_ms"]["p95"]}
+
+
+def open_loop_saturation(levels, slo_ms, max_error_rate):
+    """The highest arrival rate served at KEEP_UP_RATIO of the offered rate, within the latency objective and error budget."""
+    sustained = None
+    for rate, summary in levels:
+        p95 = summary["latency_ms"]["p95"]
+        if (summary["goodput_rps"] >= rate * KEEP_UP_RATIO and summary["error_rate"] <= max_error_rate
+                and p95 is not None and p95 <= slo_ms):
+            sustained = {"rate_rps": rate, "goodput_rps": summary["goodput_rps"], "p95_ms": p95}
+    return sustained
+
+
+async def run(args, url):
+    target = urlparse(url)
+    prompts = load_prompts(args.requests)
+    report = {"url": url, "duration_s": args.duration, "closed_loop": {}, "open_loop": {}}
+
+    closed = []
+    for concurrency in args.concurrency:
+        summary = await closed_loop(target, prompts, concurrency, args.duration, args.timeout, args.sessions)
+        report["closed_loop"][str(concurrency)] = summary
+        closed.append((concurrency, summary))
+
+    opened = []
+    for rate in args.rates:
+        summary = await open_loop(target, prompts, rate, args.duration, args.timeout)
+        report["open_loop"][str(rate)] = summary
+        opened.append((rate, summary))
+
+    report["saturation"] = {
+        "closed_loop": closed_loop_saturation(closed),
+        "open_loop": open_loop_saturation(opened, args.slo_ms, args.max_error_rate),
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="load an already running server instead of starting one, e.g. http://127.0.0.1:8080")
+    parser.add_argument("--requests", default=os.path.join(BENCH_DIR, "prompts.jsonl"), help="JSONL file of {\"prompt\": ...} lines")
+    parser.add_argument("--concurrency", type=int, nargs="*", default=[1, 2, 4, 8, 16, 32], help="closed-loop concurrency levels")
+    parser.add_argument("--rates", type=float, nargs="*", default=[5, 10, 20, 40], help="open-loop arrival rates, requests per second")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per level")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds before a request counts as timed out")
+    parser.add_argument("--sessions", action="store_true", help="each closed-loop client continues its own session")
+    parser.add_argument("--slo-ms", type=float, default=5000.0, help="p95 latency objective for the open-loop saturation point")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="error budget for the open-loop saturation point")
+    parser.add_argument("--cache", action="store_true", help="leave the guest response cache on")
+    parser.add_argument("--model-latency", type=float, default=0.05, help="seconds per model call")
+    parser.add_argument("--lambda-latency", type=float, default=0.02, help="seconds per Lambda invocation")
+    parser.add_argument("--kb-latency", type=float, default=0.03, help="seconds per knowledge base retrieval")
+    parser.add_argument("--jitter", type=float, default=0.0, help="uniform jitter in seconds added to every stand-in latency")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=8080, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    process = None
+    url = args.url
+    if url is None:
+        process, url = start_server(args)
+    try:
+        report = asyncio.run(run(args, url))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Compare the local product index with knowledge base retrieval on recall and latency.
+
+Builds a snapshot from the stand-in product catalog, then runs a fixed query set
+through the local index and through the (latency-injected) knowledge base stand-in.
+Reports recall@1, recall@k, per-query latency and how often the local index would
+have fallen back to the knowledge base.
+
+Usage:
+    python bench/local_index.py [--kb-latency 0.15] [--k 3] [--output product_index.npz]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+import stubs
+from telemetry import percentile
+
+
+def query_set():
+    """Queries paired with the catalog document they should retrieve."""
+    queries = []
+    for product in stubs.CATALOG:
+        doc_id = f"s3://pet-store-catalog/{product['code']}.txt"
+        queries.append((f"What is the price of {product['name']}?", doc_id))
+        queries.append((f"Do you sell {product['category']}?", doc_id))
+        queries.append((" ".join(product["description"].split()[:6]), doc_id))
+    return queries
+
+
+def evaluate(retrieve, queries, k):
+    hits_at_1 = hits_at_k = 0
+    latencies = []
+    for text, expected in queries:
+        start = time.perf_counter()
+        results = retrieve(text, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        doc_ids = [r["location"]["customDocumentLocation"]["id"] for r in results or []]
+        hits_at_1 += bool(doc_ids) and doc_ids[0] == expected
+        hits_at_k += expected in doc_ids
+    return {
+        "recall_at_1": round(hits_at_1 / len(queries), 3),
+        f"recall_at_{k}": round(hits_at_k / len(queries), 3),
+        "latency_ms_p50": round(statistics.median(latencies), 4),
+        "latency_ms_p95": percentile(latencies, 95, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kb-latency", type=float, default=0.15, help="Seconds per knowledge base retrieval")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--output", help="Where to write the snapshot (default: temporary file)")
+    args = parser.parse_args()
+
+    _, kb_client = stubs.install_stand_ins(kb_latency=args.kb_latency)
+    import product_index
+
+    path = args.output or os.path.join(tempfile.mkdtemp(), "product_index.npz")
+    start = time.perf_counter()
+    product_index.ProductIndex.build(stubs.product_documents()).save(path)
+    build_ms = (time.perf_counter() - start) * 1000
+    os.environ["PRODUCT_INDEX_PATH"] = path
+    index = product_index.get_index()
+
+    queries = query_set()
+
+    def local(text, k):
+        return index.search(text, k)[0]
+
+    def knowledge_base(text, k):
+        response = kb_client.retrieve(
+            retrievalQuery={"text": text},
+            knowledgeBaseId=stubs.PRODUCT_KB_ID,
+            retrievalConfiguration={"vectorSearchConfiguration": {"numberOfResults": k}},
+        )
+        return response["retrievalResults"]
+
+    fallbacks = sum(product_index.local_retrieve(text, args.k) is None for text, _ in queries)
+    report = {
+        "documents": len(index.doc_ids),
+        "queries": len(queries),
+        "snapshot_bytes": os.path.getsize(path),
+        "build_ms": round(build_ms, 2),
+        "local_index": evaluate(local, queries, args.k),
+        "knowledge_base": evaluate(knowledge_base, queries, args.k),
+        "fallback_rate": round(fallbacks / len(queries), 3),
+    }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
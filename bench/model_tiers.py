@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Model tiering (pet_store_agent/model_router.py) with fake fast and strong models.
+
+Installs two scripted chat models as the fast and strong tiers: the fast one
+answers sooner but writes prose instead of the JSON response for a share of its
+final turns, which fails validation and escalates the request to the strong tier.
+Replays the prompts from a JSONL file with the router off (everything on the
+strong tier) and on, and reports latency percentiles, schema-valid responses,
+how requests were routed and the per-tier latency, token and escalation metrics
+from router_stats().
+
+Usage:
+    python bench/model_tiers.py [--requests bench/prompts.jsonl] [--repeat 3]
+                                [--fast-latency 0.02] [--strong-latency 0.08] [--fast-failure-rate 0.1]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from collections import Counter
+
+from langchain_core.messages import AIMessage
+
+import stubs
+from telemetry import percentile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PROSE_ANSWER = "Good news, the product you asked about is available. Let us know if you would like to place an order!"
+
+
+def load_prompts(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["prompt"] for line in f if line.strip()]
+
+
+def flaky_policy(failure_rate, seed):
+    """The scripted policy, answering in prose instead of JSON for failure_rate of the final turns."""
+    rng = random.Random(seed)
+
+    def policy(messages):
+        message = stubs.plan_policy(messages)
+        if not message.tool_calls and rng.random() < failure_rate:
+            return AIMessage(content=PROSE_ANSWER)
+        return message
+    return policy
+
+
+def run(pet_store_agent, prompts):
+    latencies = []
+    valid = 0
+    tiers = Counter()
+    for prompt in prompts:
+        started = time.perf_counter()
+        result = pet_store_agent.handle_request(prompt)
+        latencies.append((time.perf_counter() - started) * 1000)
+        metadata = result["metadata"]
+        valid += metadata["validation"]["outcome"] in ("valid", "repaired", "reasked")
+        tiers["escalated" if metadata["route"]["escalated"] else metadata["route"]["tier"]] += 1
+    return {
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 1),
+            "p50": percentile(latencies, 50, 1),
+            "p95": percentile(latencies, 95, 1),
+            "p99": percentile(latencies, 99, 1),
+        },
+        "valid_responses": valid,
+        "routed": dict(tiers),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", default=os.path.join(BENCH_DIR, "prompts.jsonl"), help="JSONL file of {\"prompt\": ...} lines")
+    parser.add_argument("--repeat", type=int, default=3, help="times to replay the prompts per run")
+    parser.add_argument("--fast-latency", type=float, default=0.02, help="seconds per fast model call")
+    parser.add_argument("--strong-latency", type=float, default=0.08, help="seconds per strong model call")
+    parser.add_argument("--fast-failure-rate", type=float, default=0.1, help="share of fast-tier answers written as prose")
+    parser.add_argument("--lambda-latency", type=float, default=0.02, help="seconds per Lambda invocation")
+    parser.add_argument("--kb-latency", type=float, default=0.03, help="seconds per knowledge base retrieval")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    stubs.install_stand_ins(args.lambda_latency, args.kb_latency)
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    import logging
+    import pet_store_agent
+    import model_router
+    import response_validation
+
+    strong = stubs.ScriptedChatModel(latency=args.strong_latency)
+    fast = stubs.ScriptedChatModel(latency=args.fast_latency, policy=flaky_policy(args.fast_failure_rate, args.seed))
+    pet_store_agent.set_agent(pet_store_agent.create_agent(model=strong), tier=model_router.STRONG)
+    pet_store_agent.set_agent(pet_store_agent.create_agent(model=fast), tier=model_router.FAST)
+    response_validation.set_reask_model(strong)
+    logging.getLogger().setLevel(logging.WARNING)
+    prompts = load_prompts(args.requests) * args.repeat
+
+    report = {"requests": len(prompts)}
+    for name, enabled in (("router_off", "false"), ("router_on", "true")):
+        os.environ["MODEL_ROUTER_ENABLED"] = enabled
+        model_router.reset_router_stats()
+        calls_before = (fast.stats["model_calls"], strong.stats["model_calls"])
+        report[name] = run(pet_store_agent, prompts)
+        report[name]["model_calls"] = {
+            "fast": fast.stats["model_calls"] - calls_before[0],
+            "strong": strong.stats["model_calls"] - calls_before[1],
+        }
+        report[name]["tiers"] = model_router.router_stats()
+
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark multi-tool model turns against latency-injected local stand-ins.
+
+A scripted model emits one turn with several tool calls (user lookup, product
+retrieval, pet care retrieval and inventory checks) and then answers. The script
+compares calling the tools one after another with running the turn through the
+real agent on the sync (invoke) and async (ainvoke) paths.
+
+Usage:
+    python bench/parallel_tools.py [--lambda-latency 0.2] [--kb-latency 0.3] [--runs 5]
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+import stubs
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+
+def multi_tool_turn():
+    """Tool calls emitted together in the first model turn."""
+    return [
+        stubs.tool_call("get_user_by_id", user_id="usr_001"),
+        stubs.tool_call("retrieve_product_info", text="Bark Park Buddy water bottle"),
+        stubs.tool_call("retrieve_pet_care", text="bathing a Chihuahua"),
+        stubs.tool_call("get_inventory", product_code="BP010"),
+        stubs.tool_call("get_inventory", product_code="DD006"),
+    ]
+
+
+def fixed_turn_policy(messages):
+    if isinstance(messages[-1], ToolMessage):
+        return AIMessage(content=json.dumps({"status": "Accept", "message": "Done"}))
+    return AIMessage(content="", tool_calls=multi_tool_turn())
+
+
+def run_sequential(tools_by_name):
+    start = time.perf_counter()
+    for call in multi_tool_turn():
+        tools_by_name[call["name"]].invoke(call["args"])
+    return time.perf_counter() - start
+
+
+def run_invoke(agent):
+    start = time.perf_counter()
+    agent.invoke({"messages": [HumanMessage(content="benchmark")]}, {"configurable": {"thread_id": "bench"}})
+    return time.perf_counter() - start
+
+
+async def run_ainvoke(agent):
+    start = time.perf_counter()
+    await agent.ainvoke({"messages": [HumanMessage(content="benchmark")]}, {"configurable": {"thread_id": "bench"}})
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lambda-latency", type=float, default=0.2, help="Seconds per Lambda invocation")
+    parser.add_argument("--kb-latency", type=float, default=0.3, help="Seconds per knowledge base retrieval")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    stubs.install_stand_ins(lambda_latency=args.lambda_latency, kb_latency=args.kb_latency)
+    import pet_store_agent
+
+    agent = pet_store_agent.create_agent(model=stubs.ScriptedChatModel(policy=fixed_turn_policy))
+    tools_by_name = {tool.name: tool for tool in agent.nodes["tools"].bound.tools_by_name.values()}
+
+    latencies = [args.lambda_latency if call["name"].startswith("get_") else args.kb_latency for call in multi_tool_turn()]
+    results = {
+        "tool_calls": len(latencies),
+        "sum_of_calls_s": round(sum(latencies), 3),
+        "max_of_calls_s": round(max(latencies), 3),
+        "sequential_s": round(statistics.median(run_sequential(tools_by_name) for _ in range(args.runs)), 3),
+        "invoke_s": round(statistics.median(run_invoke(agent) for _ in range(args.runs)), 3),
+        "ainvoke_s": round(statistics.median(asyncio.run(run_ainvoke(agent)) for _ in range(args.runs)), 3),
+    }
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
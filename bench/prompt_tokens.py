@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Token accounting for the system prompt modes.
+
+Runs a fixed prompt set through the real agent with the scripted fake chat model
+in each combination of prompt mode (full, compact) and prompt caching (off, on),
+and reports input tokens per request: total, read from the prompt cache, written
+to the prompt cache, and uncached (billed at the full input rate). Tokens are
+estimated at four characters per token.
+
+Usage:
+    python bench/prompt_tokens.py
+"""
+import sys
+import json
+
+import stubs
+from langchain_core.messages import AIMessage, HumanMessage
+
+PROMPTS = [
+    "A new user is asking about the price of Doggy Delights?",
+    "CustomerId: usr_001\nCustomerRequest: I'm interested in purchasing two water bottles under your bundle deal. Would these bottles also be suitable for bathing my Chihuahua?",
+    "CustomerEmail: jane.smith@virtualpetstore.com\nCustomerRequest: Do you have the Purrfect Tower cat tree in stock?",
+    "Is the Aqua Clear Filter quiet enough for a bedroom aquarium?",
+    "CustomerId: usr_003\nCustomerRequest: I want two Snuggle Bed Grande beds for my dogs. How should I keep them clean?",
+]
+
+MODES = [("full", False), ("full", True), ("compact", False), ("compact", True)]
+
+
+def account(agent):
+    totals = {"model_turns": 0, "input_tokens": 0, "cache_read": 0, "cache_creation": 0, "uncached_input": 0}
+    for prompt in PROMPTS:
+        response = agent.invoke({"messages": [HumanMessage(content=prompt)]})
+        for message in response["messages"]:
+            if not isinstance(message, AIMessage) or not message.usage_metadata:
+                continue
+            usage = message.usage_metadata
+            details = usage.get("input_token_details") or {}
+            totals["model_turns"] += 1
+            totals["input_tokens"] += usage["input_tokens"]
+            totals["cache_read"] += details.get("cache_read", 0)
+            totals["cache_creation"] += details.get("cache_creation", 0)
+            totals["uncached_input"] += usage["input_tokens"] - details.get("cache_read", 0)
+    return {key: round(value / len(PROMPTS), 1) for key, value in totals.items()}
+
+
+def main():
+    stubs.install_stand_ins()
+    import pet_store_agent
+
+    report = {"requests": len(PROMPTS), "per_request": {}}
+    for mode, cache in MODES:
+        stubs._prompt_cache.clear()
+        agent = pet_store_agent.create_agent(model=stubs.ScriptedChatModel(), prompt_mode=mode, prompt_cache=cache)
+        report["per_request"][f"{mode}{'+cache' if cache else ''}"] = account(agent)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
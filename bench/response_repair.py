@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Local repair versus re-asking the model for invalid final responses.
+
+Takes a schema-valid Accept response, breaks it the ways model output tends to
+break (code fences, text around the JSON, numbers as strings, lower-case enums,
+null fields, over-long messages, wrong totals, prose without JSON) and runs each
+variant through validated_response. The re-ask model is the scripted fake chat
+model answering with the valid response after --model-latency seconds, so the
+report shows how many model calls the local repair pass saved, what it costs per
+response, and what the re-ask path costs when repair is not enough.
+
+Usage:
+    python bench/response_repair.py --repeat 200 --model-latency 0.8
+"""
+import sys
+import json
+import time
+import copy
+import argparse
+
+from langchain_core.messages import AIMessage
+
+import stubs
+
+VALID = {
+    "status": "Accept",
+    "message": "Hi John, thank you for your interest! The Doggy Delights you asked about are available.",
+    "customerType": "Guest",
+    "items": [{"productId": "DD006", "price": 54.99, "quantity": 2, "bundleDiscount": 0.10, "total": 104.48, "replenishInventory": False}],
+    "shippingCost": 0.0,
+    "petAdvice": "",
+    "subtotal": 104.48,
+    "additionalDiscount": 0.0,
+    "total": 104.48,
+}
+
+
+def _variant(**changes):
+    response = copy.deepcopy(VALID)
+    for key, value in changes.items():
+        response[key] = value
+    return response
+
+
+def variants():
+    """Return (name, response text) pairs: the valid response and broken versions of it."""
+    valid = json.dumps(VALID, indent=4)
+    wrong_item = copy.deepcopy(VALID)
+    wrong_item["items"][0]["total"] = 109.98
+    return [
+        ("valid", valid),
+        ("code_fence", f"```json\n{valid}\n```"),
+        ("surrounding_text", f"Here is the response:\n{valid}\nLet me know if you need anything else."),
+        ("string_numbers", json.dumps(_variant(total="104.48", shippingCost="$0.00"))),
+        ("enum_case", json.dumps(_variant(status="accept", customerType="guest"))),
+        ("null_fields", json.dumps(_variant(petAdvice=None, additionalDiscount=None))),
+        ("long_message", json.dumps(_variant(message="Thank you for reaching out to us today! " * 12))),
+        ("wrong_totals", json.dumps(dict(wrong_item, subtotal=109.98, total=124.93, shippingCost=14.95))),
+        ("prose", "The Doggy Delights are available at $54.99 each; two come to $104.48 with free shipping."),
+        ("missing_status", json.dumps({k: v for k, v in VALID.items() if k != "status"})),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="validations per variant for the timing")
+    parser.add_argument("--model-latency", type=float, default=0.8, help="seconds per re-ask model call")
+    args = parser.parse_args()
+
+    import response_validation
+
+    model = stubs.ScriptedChatModel(latency=args.model_latency, policy=lambda messages: AIMessage(content=json.dumps(VALID)))
+    response_validation.set_reask_model(model)
+
+    report = {"model_latency_ms": args.model_latency * 1000, "variants": {}}
+    for name, text in variants():
+        calls_before = model.stats["model_calls"]
+        started = time.perf_counter()
+        response, validation = response_validation.validated_response(text)
+        first_ms = (time.perf_counter() - started) * 1000
+        reasked = model.stats["model_calls"] > calls_before
+
+        # Time the local pass alone; re-asked variants are timed once above
+        local_us = None
+        if not reasked:
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                response_validation.validated_response(text, reask_allowed=False)
+            local_us = round((time.perf_counter() - started) / args.repeat * 1e6, 1)
+
+        report["variants"][name] = {
+            "outcome": validation["outcome"],
+            "repairs": validation["repairs"],
+            "status": json.loads(response)["status"],
+            "local_us": local_us,
+            "latency_ms": round(first_ms, 1),
+        }
+
+    outcomes = [v["outcome"] for v in report["variants"].values()]
+    repaired = outcomes.count("repaired")
+    report["summary"] = {
+        "valid": outcomes.count("valid"),
+        "repaired": repaired,
+        "reasked": outcomes.count("reasked"),
+        "failed": outcomes.count("failed"),
+        # Every repaired variant would have cost a re-ask without the local pass
+        "model_calls_saved": repaired,
+        "model_time_saved_ms": round(repaired * args.model_latency * 1000, 1),
+    }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end benchmark for process_request.
+
+Builds the real agent graph with create_agent around the scripted fake chat model,
+points all tools at the in-process stand-ins, replays prompts from a JSONL file
+(one {"prompt": ...} object per line) and reports per-request latency, ReAct turns
+(model calls), tool calls and Python allocations, plus p50/p95/p99 summaries.
+Results are written as JSON so runs from different commits can be diffed.
+
+Usage:
+    python bench/run_bench.py [--requests bench/prompts.jsonl] [--repeat 3]
+                              [--model-latency 0.05] [--lambda-latency 0.02] [--kb-latency 0.03]
+                              [--output bench_results.json] [--compare previous.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import subprocess
+import statistics
+import tracemalloc
+
+import stubs
+from telemetry import percentile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_prompts(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["prompt"] for line in f if line.strip()]
+
+
+def summarize(values, digits=2):
+    return {
+        "mean": round(statistics.fmean(values), digits),
+        "p50": percentile(values, 50, digits),
+        "p95": percentile(values, 95, digits),
+        "p99": percentile(values, 99, digits),
+        "max": round(max(values), digits),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def run_one(pet_store_agent, model, prompt, trace_allocations):
+    before = dict(model.stats)
+    if trace_allocations:
+        tracemalloc.reset_peak()
+        allocated_before = tracemalloc.get_traced_memory()[0]
+
+    start = time.perf_counter()
+    response = pet_store_agent.process_request(prompt)
+    latency_ms = (time.perf_counter() - start) * 1000
+
+    result = {
+        "latency_ms": round(latency_ms, 3),
+        "model_turns": model.stats["model_calls"] - before.get("model_calls", 0),
+        "tool_calls": model.stats["tool_calls"] - before.get("tool_calls", 0),
+        "response_bytes": len(str(response).encode("utf-8")),
+    }
+    if trace_allocations:
+        current, peak = tracemalloc.get_traced_memory()
+        result["peak_alloc_kb"] = round((peak - allocated_before) / 1024, 1)
+        result["retained_alloc_kb"] = round((current - allocated_before) / 1024, 1)
+    return result
+
+
+def compare(current, previous_path):
+    with open(previous_path, encoding="utf-8") as f:
+        previous = json.load(f)
+    deltas = {}
+    for metric, stats in current["summary"].items():
+        old = previous.get("summary", {}).get(metric)
+        if not old:
+            continue
+        deltas[metric] = {
+            key: round(stats[key] - old[key], 3)
+            for key in ("p50", "p95", "p99")
+            if key in old and stats.get(key) is not None and old.get(key) is not None
+        }
+    return {"baseline": previous.get("revision"), "deltas": deltas}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", default=os.path.join(BENCH_DIR, "prompts.jsonl"), help="JSONL file of {\"prompt\": ...} lines")
+    parser.add_argument("--repeat", type=int, default=3, help="Times to replay the request file")
+    parser.add_argument("--model-latency", type=float, default=0.05, help="Seconds per model call")
+    parser.add_argument("--lambda-latency", type=float, default=0.02, help="Seconds per Lambda invocation")
+    parser.add_argument("--kb-latency", type=float, default=0.03, help="Seconds per knowledge base retrieval")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform jitter in seconds applied to every latency")
+    parser.add_argument("--no-allocations", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="Previous results file to diff the summary against")
+    args = parser.parse_args()
+
+    stubs.install_stand_ins(lambda_latency=args.lambda_latency, kb_latency=args.kb_latency, jitter=args.jitter)
+    # Every replay runs the agent; bench/guest_cache.py measures the response cache
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    import pet_store_agent
+
+    model = stubs.ScriptedChatModel(latency=args.model_latency, jitter=args.jitter)
+    pet_store_agent.set_agent(pet_store_agent.create_agent(model=model))
+    prompts = load_prompts(args.requests)
+
+    # Warm-up request so one-off imports and cache fills do not skew the first sample
+    pet_store_agent.process_request(prompts[0])
+
+    requests = []
+    for iteration in range(args.repeat):
+        for i, prompt in enumerate(prompts):
+            result = run_one(pet_store_agent, model, prompt, trace_allocations=False)
+            requests.append({"iteration": iteration, "index": i, **result})
+
+    if not args.no_allocations:
+        tracemalloc.start()
+        for i, prompt in enumerate(prompts):
+            allocations = run_one(pet_store_agent, model, prompt, trace_allocations=True)
+            for request in requests:
+                if request["index"] == i:
+                    request["peak_alloc_kb"] = allocations["peak_alloc_kb"]
+                    request["retained_alloc_kb"] = allocations["retained_alloc_kb"]
+        tracemalloc.stop()
+
+    summary = {
+        "latency_ms": summarize([r["latency_ms"] for r in requests]),
+        "model_turns": summarize([r["model_turns"] for r in requests]),
+        "tool_calls": summarize([r["tool_calls"] for r in requests]),
+    }
+    if not args.no_allocations:
+        summary["peak_alloc_kb"] = summarize([r["peak_alloc_kb"] for r in requests])
+
+    results = {
+        "revision": git_revision(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "config": {
+            "requests_file": os.path.relpath(args.requests),
+            "prompts": len(prompts),
+            "repeat": args.repeat,
+            "model_latency": args.model_latency,
+            "lambda_latency": args.lambda_latency,
+            "kb_latency": args.kb_latency,
+            "jitter": args.jitter,
+        },
+        "summary": summary,
+        "requests": requests,
+    }
+    if args.compare:
+        results["comparison"] = compare(results, args.compare)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    json.dump({k: results[k] for k in ("revision", "summary", "comparison") if k in results}, sys.stdout, indent=2)
+    print(f"\nWrote {len(requests)} request results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Checkpoint cost of multi-turn sessions.
+
+Runs sessions of several turns through process_request against the local
+stand-ins, with the SQLite session store in a temporary directory, and reports
+per turn: checkpoint read and write latency, the bytes stored for the session and
+the size of the SQLite file. Run it with and without a message window to see how
+trimming bounds the per-turn cost.
+
+Usage:
+    python bench/sessions.py --turns 20 --sessions 5 --history-turns 5
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+
+import stubs
+
+FOLLOW_UPS = [
+    "CustomerId: usr_001\nCustomerRequest: How much are two Doggy Delights bags?",
+    "CustomerId: usr_001\nCustomerRequest: And is the Bark Park Buddy bottle in stock?",
+    "CustomerId: usr_001\nCustomerRequest: Would the bottle be suitable for bathing my Chihuahua?",
+    "CustomerId: usr_001\nCustomerRequest: What about the Snuggle Bed Grande for a large dog?",
+]
+
+
+def _mean(values):
+    return round(statistics.fmean(values), 3) if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20, help="turns per session")
+    parser.add_argument("--sessions", type=int, default=5, help="number of sessions")
+    parser.add_argument("--history-turns", type=int, default=5, help="SESSION_HISTORY_TURNS (0 keeps the whole history)")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="pet_store_sessions_")
+    os.environ["SESSION_STORE_PATH"] = os.path.join(directory, "sessions.sqlite")
+    os.environ["SESSION_HISTORY_TURNS"] = str(args.history_turns or 1_000_000)
+
+    stubs.install_stand_ins()
+    import pet_store_agent
+    import session_store
+    import telemetry
+
+    checkpointer = session_store.get_checkpointer()
+    pet_store_agent.set_session_agent(pet_store_agent.create_agent(model=stubs.ScriptedChatModel(), checkpointer=checkpointer))
+
+    per_turn = []
+    for turn in range(args.turns):
+        with telemetry.capture() as exporter:
+            for session in range(args.sessions):
+                pet_store_agent.process_request(FOLLOW_UPS[turn % len(FOLLOW_UPS)], f"bench-{session}")
+        records = exporter.by_kind("checkpoint")
+        stats = checkpointer.stats()
+        per_turn.append({
+            "turn": turn + 1,
+            "get_ms": _mean([r["duration_ms"] for r in records if r["name"] == "get"]),
+            "put_ms": _mean([r["duration_ms"] for r in records if r["name"] == "put"]),
+            "puts_per_request": round(sum(1 for r in records if r["name"] == "put") / args.sessions, 2),
+            "session_bytes": round(stats["checkpoint_bytes"] / max(stats["sessions"], 1)),
+            "file_bytes": stats["file_bytes"],
+        })
+
+    report = {
+        "turns": args.turns,
+        "sessions": args.sessions,
+        "history_turns": args.history_turns,
+        "summary": {
+            "get_ms": _mean([t["get_ms"] for t in per_turn]),
+            "put_ms": _mean([t["put_ms"] for t in per_turn]),
+            "final_session_bytes": per_turn[-1]["session_bytes"],
+            "final_file_bytes": per_turn[-1]["file_bytes"],
+        },
+        "per_turn": per_turn,
+    }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Cold-start profile of the agent process.
+
+Each run starts a fresh interpreter and measures, in order:
+- import: `import pet_store_agent`, what an entrypoint pays before it can serve
+- warm_up: pet_store_agent.warm_up() building the real agent (LangGraph, the Bedrock
+  model class and the AWS clients, pointed at the local stand-ins)
+- first_response / second_response: process_request with the scripted fake chat model
+The parent also reports interpreter start to first response, wall clock.
+
+A separate `python -X importtime -c "import pet_store_agent"` run is broken down
+into the slowest modules and the top-level packages they belong to.
+
+Usage:
+    python bench/startup.py --runs 5 --top 15
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from collections import defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENT_DIR = os.path.join(os.path.dirname(BENCH_DIR), "pet_store_agent")
+PROMPT = "A new user is asking about the price of Doggy Delights?"
+
+
+def child():
+    """Run in a fresh interpreter: time each startup phase and print them as JSON."""
+    sys.path.insert(0, AGENT_DIR)
+    phases = {}
+
+    started = time.perf_counter()
+    import pet_store_agent
+    phases["import_ms"] = (time.perf_counter() - started) * 1000
+
+    # The stand-ins are not part of the agent's startup
+    sys.path.insert(0, BENCH_DIR)
+    import stubs
+    stubs.install_stand_ins()
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+
+    started = time.perf_counter()
+    pet_store_agent.warm_up()
+    phases["warm_up_ms"] = (time.perf_counter() - started) * 1000
+
+    pet_store_agent.set_agent(pet_store_agent.create_agent(model=stubs.ScriptedChatModel()))
+    for phase in ("first_response_ms", "second_response_ms"):
+        started = time.perf_counter()
+        pet_store_agent.process_request(PROMPT)
+        phases[phase] = (time.perf_counter() - started) * 1000
+
+    print(json.dumps(phases))
+
+
+def run_child():
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child"],
+        capture_output=True, text=True, check=True,
+    )
+    phases = json.loads(result.stdout.strip().splitlines()[-1])
+    phases["process_total_ms"] = (time.perf_counter() - started) * 1000
+    return phases
+
+
+def import_breakdown(top):
+    """Parse `python -X importtime` output for import pet_store_agent."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import pet_store_agent"],
+        capture_output=True, text=True, cwd=AGENT_DIR, check=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        # "import time:  self [us] | cumulative | imported package", nesting shown by indentation
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+
+    packages = defaultdict(int)
+    for name, self_us, _ in modules:
+        packages[name.split(".")[0]] += self_us
+    total = next((cumulative for name, _, cumulative in modules if name == "pet_store_agent"), None)
+    return {
+        "total_ms": round(total / 1000, 1) if total else None,
+        "modules": len(modules),
+        "slowest_modules_self_ms": {name: round(self_us / 1000, 1) for name, self_us, _ in sorted(modules, key=lambda m: -m[1])[:top]},
+        "packages_self_ms": {name: round(us / 1000, 1) for name, us in sorted(packages.items(), key=lambda p: -p[1])[:top]},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes to time")
+    parser.add_argument("--top", type=int, default=15, help="modules and packages to list in the import breakdown")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    runs = [run_child() for _ in range(args.runs)]
+    report = {
+        "runs": args.runs,
+        "median_ms": {phase: round(statistics.median(run[phase] for run in runs), 1) for phase in runs[0]},
+        "importtime": import_breakdown(args.top),
+    }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,505 @@
+"""
+Local stand-ins for the agent's external dependencies, used by the benchmarks.
+
+Provides latency-injected replacements for the inventory/user management Lambdas
+and both Bedrock knowledge bases, plus a scripted chat model that drives the real
+LangGraph agent through the execution plan in SYSTEM_PROMPT without calling Bedrock.
+"""
+import io
+import os
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import itertools
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+AGENT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pet_store_agent')
+if AGENT_DIR not in sys.path:
+    sys.path.insert(0, AGENT_DIR)
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import Field
+
+from plan_execute import EXTRACTION_PROMPT, FACTS_HEADER
+from pricing import price_order
+
+PRODUCT_KB_ID = "LOCALPRODUCTKB"
+PET_CARE_KB_ID = "LOCALPETCAREKB"
+INVENTORY_FUNCTION = "local-inventory-management"
+USER_FUNCTION = "local-user-management"
+REGION = "us-west-2"
+
+CATALOG = [
+    {"code": "DD006", "name": "Doggy Delights", "price": 54.99, "category": "dog food",
+     "description": "30lb bag of premium grain-free dry dog food with real meat as the first ingredient."},
+    {"code": "BP010", "name": "Bark Park Buddy", "price": 16.99, "category": "dog accessories",
+     "description": "Portable dog water bottle with a convenient fold-out bowl for hydration on walks."},
+    {"code": "CM001", "name": "Meow Munchies", "price": 29.99, "category": "cat food",
+     "description": "Crunchy salmon flavoured dry cat food for adult cats."},
+    {"code": "PT003", "name": "Purrfect Tower", "price": 129.99, "category": "cat furniture",
+     "description": "Five level cat tree with scratching posts, hammock and hideaway."},
+    {"code": "FF004", "name": "Feather Frenzy", "price": 9.99, "category": "cat toys",
+     "description": "Interactive feather wand toy for playful cats."},
+    {"code": "CB005", "name": "Chew Buddy Bone", "price": 12.49, "category": "dog toys",
+     "description": "Durable rubber chew bone that supports dental health."},
+    {"code": "AQ007", "name": "Aqua Clear Filter", "price": 39.95, "category": "aquarium",
+     "description": "Quiet three stage aquarium filter for tanks up to 50 gallons."},
+    {"code": "BH008", "name": "Birdie Haven Cage", "price": 189.00, "category": "bird supplies",
+     "description": "Spacious flight cage with perches, feeders and a removable tray."},
+    {"code": "SG009", "name": "Snuggle Bed Grande", "price": 79.50, "category": "dog beds",
+     "description": "Orthopedic memory foam bed for large dogs with a washable cover."},
+    {"code": "HT011", "name": "Hamster Trail Kit", "price": 24.99, "category": "small pets",
+     "description": "Modular tunnel and wheel kit for hamsters and gerbils."},
+]
+
+INVENTORY = {
+    "DD006": {"quantity": 150, "status": "in_stock", "reorder_level": 50},
+    "BP010": {"quantity": 12, "status": "low_stock", "reorder_level": 10},
+    "CM001": {"quantity": 150, "status": "in_stock", "reorder_level": 50},
+    "PT003": {"quantity": 0, "status": "out_of_stock", "reorder_level": 5},
+    "FF004": {"quantity": 300, "status": "in_stock", "reorder_level": 40},
+    "CB005": {"quantity": 45, "status": "in_stock", "reorder_level": 40},
+    "AQ007": {"quantity": 8, "status": "low_stock", "reorder_level": 10},
+    "BH008": {"quantity": 20, "status": "in_stock", "reorder_level": 5},
+    "SG009": {"quantity": 60, "status": "in_stock", "reorder_level": 15},
+    "HT011": {"quantity": 0, "status": "out_of_stock", "reorder_level": 10},
+}
+
+USERS = [
+    {"id": "usr_001", "name": "John Doe", "email": "john.doe@virtualpetstore.com",
+     "subscription_status": "active", "subscription_end_date": "2027-01-31T00:00:00Z"},
+    {"id": "usr_002", "name": "Jane Smith", "email": "jane.smith@virtualpetstore.com",
+     "subscription_status": "expired", "subscription_end_date": "2025-06-30T00:00:00Z"},
+    {"id": "usr_003", "name": "Maria Garcia", "email": "maria.garcia@virtualpetstore.com",
+     "subscription_status": "active", "subscription_end_date": "2026-12-31T00:00:00Z"},
+]
+
+PET_CARE_DOCS = [
+    ("dog-bathing.txt", "Bathe most dogs every four to six weeks using a mild dog shampoo in a pet bath or sink. Small breeds such as Chihuahuas chill easily, so use lukewarm water and dry them promptly."),
+    ("dog-hydration.txt", "Dogs need about one ounce of water per pound of body weight each day. Offer water frequently on walks, especially in warm weather."),
+    ("cat-nutrition.txt", "Adult cats need a high protein diet. Measure dry food portions to prevent obesity and always provide fresh water."),
+    ("aquarium-care.txt", "Change ten to fifteen percent of aquarium water weekly and rinse filter media in tank water, never tap water."),
+    ("bird-cage.txt", "Place bird cages away from drafts and kitchens. Clean perches and trays weekly and offer fresh vegetables daily."),
+]
+
+
+def product_documents() -> List[Dict[str, str]]:
+    """Return the product catalog as knowledge base documents."""
+    return [
+        {
+            "id": f"s3://pet-store-catalog/{p['code']}.txt",
+            "text": f"Product: {p['name']} ({p['code']})\nCategory: {p['category']}\nPrice: ${p['price']:.2f}\nDescription: {p['description']}",
+        }
+        for p in CATALOG
+    ]
+
+
+def pet_care_documents() -> List[Dict[str, str]]:
+    """Return the pet care knowledge base documents."""
+    return [{"id": f"s3://pet-care-kb/{name}", "text": text} for name, text in PET_CARE_DOCS]
+
+
+class _Latency:
+    """Fixed latency plus optional uniform jitter, in seconds."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+
+    def sample(self) -> float:
+        return max(0.0, self.latency + (random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0))
+
+
+class FakeLambdaClient(_Latency):
+    """In-process stand-in for the inventory and user management Lambda functions."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0):
+        super().__init__(latency, jitter)
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def invoke(self, FunctionName: str, Payload: str, **kwargs) -> Dict[str, Any]:
+        request = json.loads(Payload)
+        function = request.get("function")
+        params = {p["name"]: p["value"] for p in request.get("parameters", [])}
+        with self._lock:
+            self.calls[function] += 1
+        time.sleep(self.sample())
+
+        if function == "getInventory":
+            body = self._inventory(params.get("product_code"))
+        elif function == "getUserById":
+            body = next((u for u in USERS if u["id"] == params.get("user_id")), {"error": "User not found"})
+        elif function == "getUserByEmail":
+            body = next((u for u in USERS if u["email"] == params.get("user_email")), {"error": "User not found"})
+        else:
+            body = {"error": f"Unknown function {function}"}
+
+        lambda_response = {
+            "response": {"functionResponse": {"responseBody": {"TEXT": {"body": json.dumps(body)}}}}
+        }
+        return {"StatusCode": 200, "Payload": io.BytesIO(json.dumps(lambda_response).encode("utf-8"))}
+
+    def _inventory(self, product_code: Optional[str]) -> Any:
+        def record(code):
+            product = next(p for p in CATALOG if p["code"] == code)
+            return {"product_code": code, "name": product["name"], "last_updated": "2026-10-01T00:00:00Z", **INVENTORY[code]}
+
+        if not product_code:
+            return [record(code) for code in INVENTORY]
+        if product_code not in INVENTORY:
+            return {"error": f"Product {product_code} not found"}
+        return record(product_code)
+
+
+class FaultyLambdaClient(FakeLambdaClient):
+    """
+    FakeLambdaClient that injects faults: a share of calls stall like a cold start,
+    and a share fail with throttling or service errors before reaching the function.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, slow_rate: float = 0.0,
+                 slow_latency: float = 1.0, error_rate: float = 0.0, error_code: str = "TooManyRequestsException"):
+        super().__init__(latency, jitter)
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.error_code = error_code
+
+    def invoke(self, FunctionName: str, Payload: str, **kwargs) -> Dict[str, Any]:
+        from botocore.exceptions import ClientError
+
+        with self._lock:
+            self.calls["invocations"] += 1
+        if random.random() < self.error_rate:
+            time.sleep(self.sample())
+            status = 429 if self.error_code == "TooManyRequestsException" else 500
+            with self._lock:
+                self.calls["faults"] += 1
+            raise ClientError(
+                {"Error": {"Code": self.error_code, "Message": "Injected fault"}, "ResponseMetadata": {"HTTPStatusCode": status}},
+                "Invoke",
+            )
+        if random.random() < self.slow_rate:
+            time.sleep(self.slow_latency)
+        return super().invoke(FunctionName, Payload, **kwargs)
+
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _tokens(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+class FakeBedrockAgentRuntimeClient(_Latency):
+    """In-process stand-in for Bedrock knowledge base retrieval, scored by token overlap."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0):
+        super().__init__(latency, jitter)
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self.knowledge_bases = {PRODUCT_KB_ID: product_documents(), PET_CARE_KB_ID: pet_care_documents()}
+
+    def retrieve(self, retrievalQuery: Dict[str, Any], knowledgeBaseId: str,
+                 retrievalConfiguration: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        with self._lock:
+            self.calls[knowledgeBaseId] += 1
+        time.sleep(self.sample())
+
+        limit = ((retrievalConfiguration or {}).get("vectorSearchConfiguration") or {}).get("numberOfResults", 10)
+        query = set(_tokens(retrievalQuery["text"]))
+        results = []
+        for doc in self.knowledge_bases.get(knowledgeBaseId, []):
+            words = set(_tokens(doc["text"]))
+            overlap = len(query & words)
+            if not overlap:
+                continue
+            score = min(0.99, 0.2 + overlap / max(1, len(query)))
+            results.append({
+                "content": {"text": doc["text"]},
+                "location": {"type": "CUSTOM", "customDocumentLocation": {"id": doc["id"]}},
+                "score": round(score, 4),
+            })
+        results.sort(key=lambda r: r["score"], reverse=True)
+        return {"retrievalResults": results[:limit]}
+
+
+def install_stand_ins(lambda_latency: float = 0.0, kb_latency: float = 0.0, jitter: float = 0.0):
+    """
+    Point the agent's environment and shared client registry at the local stand-ins.
+
+    Returns:
+        Tuple of (FakeLambdaClient, FakeBedrockAgentRuntimeClient).
+    """
+    import aws_clients
+
+    os.environ.update({
+        "AWS_REGION": REGION,
+        "KNOWLEDGE_BASE_1_ID": PRODUCT_KB_ID,
+        "KNOWLEDGE_BASE_2_ID": PET_CARE_KB_ID,
+        "SYSTEM_FUNCTION_1_NAME": INVENTORY_FUNCTION,
+        "SYSTEM_FUNCTION_2_NAME": USER_FUNCTION,
+    })
+    lambda_client = FakeLambdaClient(lambda_latency, jitter)
+    kb_client = FakeBedrockAgentRuntimeClient(kb_latency, jitter)
+    aws_clients.set_client('lambda', lambda_client)
+    aws_clients.set_client('bedrock-agent-runtime', kb_client, REGION)
+    return lambda_client, kb_client
+
+
+# Scripted chat model
+
+_CUSTOMER_ID = re.compile(r"\busr_\d+\b")
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+")
+_PRODUCT_CODE = re.compile(r"\(([A-Z]{2}\d{3})\)")
+_PRICE = re.compile(r"Price: \$([0-9.]+)")
+_PET_CARE_WORDS = {"bath", "bathing", "care", "groom", "grooming", "feed", "feeding", "healthy", "suitable", "safe", "advice"}
+_call_ids = itertools.count(1)
+
+
+def tool_call(name: str, **args) -> Dict[str, Any]:
+    """Build a tool call entry for an AIMessage."""
+    return {"name": name, "args": args, "id": f"call_{next(_call_ids)}", "type": "tool_call"}
+
+
+def _conversation(messages: List[BaseMessage]):
+    """Split messages into the latest human prompt and the turns that followed it."""
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            return str(messages[i].content), messages[i + 1:]
+    return "", list(messages)
+
+
+def _tool_results(turn: List[BaseMessage]) -> Dict[str, List[str]]:
+    results: Dict[str, List[str]] = {}
+    for msg in turn:
+        if isinstance(msg, ToolMessage):
+            results.setdefault(msg.name, []).append(str(msg.content))
+    return results
+
+
+def _parse_json(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def plan_policy(messages: List[BaseMessage]) -> AIMessage:
+    """
+    Follow the execution plan in SYSTEM_PROMPT deterministically.
+
+    Turn 1 looks up the user and the product in parallel, turn 2 checks inventory
+    (and pet care for subscribers), and the last turn writes the JSON response.
+    The extraction and synthesis calls of the plan-and-execute agent are answered
+    from the request and the lookup results they carry.
+    """
+    prompt, turn = _conversation(messages)
+    if messages and messages[0].content == EXTRACTION_PROMPT:
+        return _extraction_answer(prompt)
+    if FACTS_HEADER in prompt:
+        return _synthesis_answer(prompt)
+    results = _tool_results(turn)
+    ai_turns = sum(1 for m in turn if isinstance(m, AIMessage))
+
+    if ai_turns == 0:
+        calls = []
+        customer_id = _CUSTOMER_ID.search(prompt)
+        email = _EMAIL.search(prompt)
+        if customer_id:
+            calls.append(tool_call("get_user_by_id", user_id=customer_id.group(0)))
+        elif email:
+            calls.append(tool_call("get_user_by_email", user_email=email.group(0)))
+        calls.append(tool_call("retrieve_product_info", text=prompt))
+        return AIMessage(content="", tool_calls=calls)
+
+    user = None
+    for text in results.get("get_user_by_id", []) + results.get("get_user_by_email", []):
+        record = _parse_json(text)
+        if isinstance(record, dict) and "id" in record:
+            user = record
+    subscribed = bool(user and user.get("subscription_status") == "active")
+    product_text = "\n".join(results.get("retrieve_product_info", []))
+    codes = list(dict.fromkeys(_PRODUCT_CODE.findall(product_text)))[:1]
+
+    if ai_turns == 1:
+        calls = [tool_call("get_inventory", product_code=code) for code in codes]
+        if subscribed and _PET_CARE_WORDS & set(_tokens(prompt)):
+            calls.append(tool_call("retrieve_pet_care", text=prompt))
+        if calls:
+            return AIMessage(content="", tool_calls=calls)
+
+    return AIMessage(content=json.dumps(_final_answer(prompt, user, subscribed, codes, product_text, results), indent=4))
+
+
+def _quantity(prompt: str) -> int:
+    return 2 if re.search(r"\b(two|2)\b", prompt.lower()) else 1
+
+
+def _extraction_answer(prompt: str) -> AIMessage:
+    request, _, product_text = prompt.partition("\n\nProduct information:\n")
+    codes = list(dict.fromkeys(_PRODUCT_CODE.findall(product_text)))[:1]
+    prices = _PRICE.findall(product_text)
+    items = [{"productId": code, "price": float(prices[0]) if prices else None, "quantity": _quantity(request)} for code in codes]
+    question = request if _PET_CARE_WORDS & set(_tokens(request)) else ""
+    return AIMessage(content=json.dumps({"items": items, "petCareQuestion": question}))
+
+
+def _synthesis_answer(prompt: str) -> AIMessage:
+    facts = json.loads(prompt.split(FACTS_HEADER, 1)[1])
+    customer = facts["customer"]
+    name = customer.get("firstName") or "Customer"
+    order = facts["order"]
+    if not facts["requestedItems"]:
+        answer = {"status": "Reject", "message": f"We are sorry {name}, we could not find the product you asked about."}
+    elif "error" in facts["inventory"] or "lookupError" in customer:
+        answer = {"status": "Error", "message": "We are sorry for the technical difficulties we are currently facing."}
+    elif order is None:
+        answer = {"status": "Reject", "message": f"We are sorry {name}, this product is currently unavailable."}
+    else:
+        answer = {
+            "status": "Accept",
+            "message": f"Hi {name}, thank you for your interest! The item you asked about is available.",
+            "customerType": customer["customerType"],
+            "items": order["items"],
+            "shippingCost": order["shippingCost"],
+            "petAdvice": "Please see our pet care guidance." if facts["petCare"] else "",
+            "subtotal": order["subtotal"],
+            "additionalDiscount": order["additionalDiscount"],
+            "total": order["total"],
+        }
+    return AIMessage(content=json.dumps(answer, indent=4))
+
+
+def _final_answer(prompt, user, subscribed, codes, product_text, results) -> Dict[str, Any]:
+    name = user["name"].split()[0] if user else "Customer"
+    if not codes:
+        return {"status": "Reject", "message": f"We are sorry {name}, we could not find the product you asked about."}
+
+    code = codes[0]
+    inventory = next((r for r in map(_parse_json, results.get("get_inventory", [])) if isinstance(r, dict) and r.get("product_code") == code), None)
+    if inventory is None:
+        return {"status": "Error", "message": "We are sorry for the technical difficulties we are currently facing."}
+    if inventory.get("quantity", 0) <= 0:
+        return {"status": "Reject", "message": f"We are sorry {name}, this product is currently unavailable."}
+
+    prices = _PRICE.findall(product_text)
+    quantity = _quantity(prompt)
+    order = price_order([{
+        "productId": code,
+        "price": float(prices[0]) if prices else 0.0,
+        "quantity": quantity,
+        "inventoryQuantity": inventory["quantity"],
+        "reorderLevel": inventory["reorder_level"],
+    }])
+    return {
+        "status": "Accept",
+        "message": f"Hi {name}, thank you for your interest! The item you asked about is available.",
+        "customerType": "Subscribed" if subscribed else "Guest",
+        "items": order["items"],
+        "shippingCost": order["shippingCost"],
+        "petAdvice": "Please see our pet care guidance." if results.get("retrieve_pet_care") else "",
+        "subtotal": order["subtotal"],
+        "additionalDiscount": order["additionalDiscount"],
+        "total": order["total"],
+    }
+
+
+_prompt_cache = set()
+_prompt_cache_lock = threading.Lock()
+
+
+def message_text(message: BaseMessage) -> str:
+    """Return the text of a message, ignoring non-text content blocks."""
+    if isinstance(message.content, str):
+        return message.content
+    return "".join(
+        block if isinstance(block, str) else block.get("text", "")
+        for block in message.content
+        if isinstance(block, (str, dict))
+    )
+
+
+def estimate_tokens(message: BaseMessage) -> int:
+    """Estimate tokens at four characters per token."""
+    return len(message_text(message)) // 4
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Fake chat model that answers with a deterministic policy after an injected delay.
+
+    The policy receives the full message list (system prompt included) and returns
+    the next AIMessage. Usage metadata is estimated at four characters per token;
+    content before a cachePoint block is reported as a cache write the first time
+    it is seen in this process and as a cache read afterwards.
+    """
+
+    policy: Callable[[List[BaseMessage]], AIMessage] = plan_policy
+    latency: float = 0.0
+    jitter: float = 0.0
+    tool_tokens: int = 0
+    # Shared with copies made by bind_tools, so counts cover every bound variant
+    stats: Counter = Field(default_factory=Counter)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        # Tool definitions are sent with every request, so count them as input
+        schemas = [convert_to_openai_tool(tool) for tool in tools]
+        return self.model_copy(update={"tool_tokens": len(json.dumps(schemas)) // 4})
+
+    def _respond(self, messages: List[BaseMessage]) -> ChatResult:
+        message = self.policy(messages)
+        self.stats["model_calls"] += 1
+        self.stats["tool_calls"] += len(message.tool_calls)
+        input_tokens = self.tool_tokens + sum(estimate_tokens(m) for m in messages)
+        output_tokens = estimate_tokens(message) + len(json.dumps(message.tool_calls)) // 4
+        usage = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        cached = self._cache_usage(messages)
+        if cached:
+            usage["input_token_details"] = cached
+        message.usage_metadata = usage
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _cache_usage(self, messages: List[BaseMessage]) -> Dict[str, int]:
+        """Simulate Bedrock prompt caching for content up to a cachePoint block."""
+        prefix = []
+        for m in messages:
+            blocks = m.content if isinstance(m.content, list) else [m.content]
+            for block in blocks:
+                if isinstance(block, dict) and "cachePoint" in block:
+                    key = hash("".join(prefix))
+                    tokens = len("".join(prefix)) // 4
+                    with _prompt_cache_lock:
+                        seen = key in _prompt_cache
+                        _prompt_cache.add(key)
+                    return {"cache_read": tokens} if seen else {"cache_creation": tokens}
+                prefix.append(block if isinstance(block, str) else block.get("text", "") if isinstance(block, dict) else "")
+        return {}
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency + (random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self._delay())
+        return self._respond(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self._delay())
+        return self._respond(messages)
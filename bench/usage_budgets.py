@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Per-request usage and the usage budgets (pet_store_agent/usage.py) with runaway loops.
+
+Replays the prompts from a JSONL file through handle_request with the scripted
+fake chat model. For a share of the requests the model runs away: it keeps
+retrieving product information for a number of extra turns before answering.
+The replay runs once without turn and tool call budgets (only the time budget
+and the default recursion limit apply) and once with the given budgets, and
+reports model turns, tokens and estimated cost per request from the "usage"
+metadata, the total cost, the response statuses and what stopped requests.
+
+Usage:
+    python bench/usage_budgets.py --repeat 3 --runaway-share 0.2 --runaway-turns 12 --max-turns 4 --max-tokens 20000
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import statistics
+from collections import Counter
+
+import stubs
+from langchain_core.messages import AIMessage
+from telemetry import percentile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_prompts(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["prompt"] for line in f if line.strip()]
+
+
+def runaway_policy(runaway, turns):
+    """plan_policy, except that for prompts in runaway the model retrieves product information again for turns extra turns."""
+    def policy(messages):
+        prompt, turn = stubs._conversation(messages)
+        ai_turns = sum(1 for m in turn if isinstance(m, AIMessage))
+        if prompt in runaway and 1 <= ai_turns <= turns:
+            return AIMessage(content="", tool_calls=[stubs.tool_call("retrieve_product_info", text=f"{prompt} (attempt {ai_turns})")])
+        return stubs.plan_policy(messages)
+    return policy
+
+
+def _distribution(values):
+    return {"mean": round(statistics.fmean(values), 6), "p50": percentile(values, 50, 6), "p95": percentile(values, 95, 6), "max": max(values)}
+
+
+def run(pet_store_agent, prompts, policy, model_latency):
+    pet_store_agent.set_agent(pet_store_agent.create_agent(model=stubs.ScriptedChatModel(latency=model_latency, policy=policy)))
+    turns, tokens, costs = [], [], []
+    statuses, stopped = Counter(), Counter()
+    for prompt in prompts:
+        result = pet_store_agent.handle_request(prompt)
+        usage = result["metadata"]["usage"]
+        turns.append(usage["model_turns"])
+        tokens.append(usage["tokens"]["total"])
+        costs.append(usage["cost_usd"])
+        statuses[json.loads(result["response"]).get("status")] += 1
+        stopped[result["metadata"]["deadline"]["stopped"] or "none"] += 1
+    return {
+        "model_turns": _distribution(turns),
+        "tokens": _distribution(tokens),
+        "cost_usd": _distribution(costs),
+        "total_cost_usd": round(sum(costs), 6),
+        "statuses": dict(statuses),
+        "stopped": dict(stopped),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", default=os.path.join(BENCH_DIR, "prompts.jsonl"), help="JSONL file of {\"prompt\": ...} lines")
+    parser.add_argument("--repeat", type=int, default=3, help="times to replay the prompts")
+    parser.add_argument("--runaway-share", type=float, default=0.2, help="share of distinct prompts on which the model runs away")
+    parser.add_argument("--runaway-turns", type=int, default=12, help="extra model turns of a runaway request")
+    parser.add_argument("--max-turns", type=int, default=4, help="model turn budget of the budgeted run")
+    parser.add_argument("--max-tool-calls", type=int, default=8, help="tool call budget of the budgeted run")
+    parser.add_argument("--max-tokens", type=int, default=0, help="token budget of the budgeted run (0 for none)")
+    parser.add_argument("--max-cost", type=float, default=0.0, help="cost budget in USD of the budgeted run (0 for none)")
+    parser.add_argument("--model-latency", type=float, default=0.01, help="seconds per model call")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    stubs.install_stand_ins()
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    os.environ["MODEL_ROUTER_ENABLED"] = "false"
+    import logging
+    import pet_store_agent
+
+    logging.getLogger().setLevel(logging.ERROR)
+    distinct = load_prompts(args.requests)
+    runaway = set(random.Random(args.seed).sample(distinct, max(1, round(len(distinct) * args.runaway_share))))
+    prompts = distinct * args.repeat
+    policy = runaway_policy(runaway, args.runaway_turns)
+
+    report = {"requests": len(prompts), "runaway_requests": sum(prompt in runaway for prompt in prompts)}
+
+    os.environ["REQUEST_MAX_MODEL_TURNS"] = "0"
+    os.environ["REQUEST_MAX_TOOL_CALLS"] = "0"
+    os.environ["REQUEST_MAX_TOKENS"] = "0"
+    os.environ["REQUEST_MAX_COST_USD"] = "0"
+    report["no_budgets"] = run(pet_store_agent, prompts, policy, args.model_latency)
+
+    os.environ["REQUEST_MAX_MODEL_TURNS"] = str(args.max_turns)
+    os.environ["REQUEST_MAX_TOOL_CALLS"] = str(args.max_tool_calls)
+    os.environ["REQUEST_MAX_TOKENS"] = str(args.max_tokens)
+    os.environ["REQUEST_MAX_COST_USD"] = str(args.max_cost)
+    report["budgets"] = run(pet_store_agent, prompts, policy, args.model_latency)
+
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+User lookups through the user cache (pet_store_agent/user_cache.py).
+
+Replays conversations through process_request in which each customer is named
+by id on some turns and by email on others, mixed with customers the user
+management function does not know, once with the user cache off and once with
+it on. Reports user-management Lambda calls, user lookup latency percentiles
+(from the get_user_by_* tool spans) and the cache counters.
+
+Usage:
+    python bench/user_lookups.py --conversations 20 --turns 4 --unknown-share 0.2 --lambda-latency 0.03
+"""
+import os
+import sys
+import json
+import random
+import argparse
+
+import stubs
+from telemetry import percentile
+
+REQUESTS = [
+    "How much are two Doggy Delights bags?",
+    "Is the Bark Park Buddy bottle in stock?",
+    "Do you have the Purrfect Tower cat tree?",
+    "What about the Snuggle Bed Grande for a large dog?",
+]
+
+
+def conversations(count, turns, unknown_share, seed):
+    """Each conversation names one customer, by id or by email on each turn."""
+    rng = random.Random(seed)
+    prompts = []
+    for i in range(count):
+        if rng.random() < unknown_share:
+            user = {"id": f"usr_9{i:02d}", "email": f"visitor{i}@example.com"}
+        else:
+            user = rng.choice(stubs.USERS)
+        for turn in range(turns):
+            customer = f"CustomerId: {user['id']}" if rng.random() < 0.5 else f"CustomerEmail: {user['email']}"
+            prompts.append(f"{customer}\nCustomerRequest: {REQUESTS[turn % len(REQUESTS)]}")
+    return prompts
+
+
+def run(pet_store_agent, telemetry, lambda_client, prompts):
+    calls_before = lambda_client.calls["getUserById"] + lambda_client.calls["getUserByEmail"]
+    with telemetry.capture() as exporter:
+        for prompt in prompts:
+            pet_store_agent.process_request(prompt)
+    durations = [record["duration_ms"] for record in exporter.by_kind("tool") if record["name"].startswith("get_user_by_")]
+    return {
+        "user_lambda_calls": lambda_client.calls["getUserById"] + lambda_client.calls["getUserByEmail"] - calls_before,
+        "user_lookups": len(durations),
+        "lookup_latency_ms": {"p50": percentile(durations, 50, 2), "p95": percentile(durations, 95, 2)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=20, help="conversations to replay")
+    parser.add_argument("--turns", type=int, default=4, help="turns per conversation")
+    parser.add_argument("--unknown-share", type=float, default=0.2, help="share of conversations with an unknown customer")
+    parser.add_argument("--lambda-latency", type=float, default=0.03, help="seconds per Lambda invocation")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    lambda_client, _ = stubs.install_stand_ins(args.lambda_latency)
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    import logging
+    import pet_store_agent
+    import telemetry
+    import user_cache
+
+    pet_store_agent.set_agent(pet_store_agent.create_agent(model=stubs.ScriptedChatModel()))
+    logging.getLogger().setLevel(logging.WARNING)
+    prompts = conversations(args.conversations, args.turns, args.unknown_share, args.seed)
+
+    os.environ["USER_CACHE_ENABLED"] = "false"
+    uncached = run(pet_store_agent, telemetry, lambda_client, prompts)
+
+    os.environ["USER_CACHE_ENABLED"] = "true"
+    user_cache.reset_user_cache()
+    cached = run(pet_store_agent, telemetry, lambda_client, prompts)
+    cached.update(user_cache.user_cache_stats())
+
+    report = {
+        "requests": len(prompts),
+        "distinct_customers": len(set(prompt.splitlines()[0] for prompt in prompts)),
+        "cache_off": uncached,
+        "cache_on": cached,
+    }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,46 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: MIT-0
 
-from bedrock_agentcore.runtime import BedrockAgentCoreApp
+import asyncio
+import threading
+
+from bedrock_agentcore.runtime import BedrockAgentCoreApp, PingStatus
 import pet_store_agent
 
 app = BedrockAgentCoreApp()
 
+# Build the agent once per process in the background, so the server starts and
+# answers health checks while LangGraph, the model and the AWS clients load
+_warm_up = threading.Thread(target=pet_store_agent.warm_up, name="agent-warm-up", daemon=True)
+_warm_up.start()
+
+@app.ping
+def ping():
+    """Report busy until warm-up has finished, then fall back to the automatic status."""
+    return PingStatus.HEALTHY_BUSY if _warm_up.is_alive() else None
+
 @app.entrypoint
-def handler(payload):
-    """AgentCore handler function"""
+async def handler(payload):
+    """
+    AgentCore handler function. Set "stream": true in the payload to receive progress events,
+    "session_id" to continue an earlier conversation and "deadline_ms" to bound the request
+    time. With "metadata": true the response is {"response": ..., "metadata": ...}, and with
+    "cache": false a guest request is not answered from the response cache.
+    """
+    # Requests that arrive during warm-up wait for it without blocking the event loop
+    if _warm_up.is_alive():
+        await asyncio.to_thread(_warm_up.join)
+    
     prompt = payload.get('prompt', 'A new user is asking about the price of Doggy Delights?')
-    return pet_store_agent.process_request(prompt)
+    session_id = payload.get('session_id')
+    deadline_ms = payload.get('deadline_ms')
+    use_cache = payload.get('cache', True) is not False
+    if payload.get('stream'):
+        # Returning an async generator makes AgentCore respond with server-sent events
+        return pet_store_agent.astream_request(prompt, session_id, deadline_ms, use_cache)
+    if payload.get('metadata'):
+        return await pet_store_agent.ahandle_request(prompt, session_id, deadline_ms, use_cache)
+    return await pet_store_agent.aprocess_request(prompt, session_id, deadline_ms, use_cache)
 
 if __name__ == "__main__":
     app.run()
\ No newline at end of file
@@ -0,0 +1,171 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Shared AWS client registry used by all agent tools.
+
+Clients are created lazily, once per (service, region), from a single boto3
+session and reused for the lifetime of the process, so credentials are resolved
+once and HTTP connections are kept alive between tool calls. boto3 clients are
+thread-safe; the session is not, so creation is serialised behind a lock.
+
+Connection settings are read from the environment:
+    AWS_CLIENT_MAX_POOL_CONNECTIONS  connections per endpoint pool (default 50)
+    AWS_CLIENT_CONNECT_TIMEOUT       connect timeout in seconds (default 5)
+    AWS_CLIENT_READ_TIMEOUT          read timeout in seconds (default 60)
+    AWS_CLIENT_TCP_KEEPALIVE         enable TCP keep-alive (default true)
+    AWS_CLIENT_MAX_ATTEMPTS          botocore retry attempts (default 3)
+
+The Lambda client makes a single attempt per call: retries, hedging and circuit
+breaking for the system functions are done by system_functions. Its read timeout
+is capped at the time allowed per system function call (LAMBDA_TIMEOUT_SECONDS,
+default 10), so an attempt the caller has given up on does not keep its worker
+thread waiting on the socket.
+
+boto3 is imported when the first client is created (or by warm_up()), not when
+this module is imported.
+"""
+
+import os
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from config import env_flag, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+_session = None
+_clients: Dict[Tuple[str, Optional[str]], Any] = {}
+_created = 0
+_lock = threading.Lock()
+
+
+def lambda_call_timeout() -> float:
+    """Overall time allowed per system function call, in seconds."""
+    return env_float('LAMBDA_TIMEOUT_SECONDS', 10)
+
+
+def client_config(max_attempts: Optional[int] = None, max_read_timeout: Optional[float] = None) -> Any:
+    """Build the botocore configuration shared by all registry clients, optionally with its own retry attempts and a lower read timeout."""
+    from botocore.config import Config
+
+    read_timeout = env_float('AWS_CLIENT_READ_TIMEOUT', 60)
+    if max_read_timeout:
+        read_timeout = min(read_timeout, max_read_timeout)
+    return Config(
+        max_pool_connections=env_int('AWS_CLIENT_MAX_POOL_CONNECTIONS', 50),
+        connect_timeout=env_float('AWS_CLIENT_CONNECT_TIMEOUT', 5),
+        read_timeout=read_timeout,
+        tcp_keepalive=env_flag('AWS_CLIENT_TCP_KEEPALIVE', True),
+        retries={"max_attempts": max_attempts or env_int('AWS_CLIENT_MAX_ATTEMPTS', 3), "mode": "standard"},
+    )
+
+
+def get_client(service_name: str, region_name: Optional[str] = None, max_attempts: Optional[int] = None, max_read_timeout: Optional[float] = None) -> Any:
+    """
+    Return the shared client for a service, creating it on first use.
+
+    Args:
+        service_name: AWS service name, e.g. "lambda" or "bedrock-agent-runtime".
+        region_name: Optional region. Without region_name the session default is used.
+        max_attempts: Optional botocore retry attempts for the client when it is created. Without max_attempts: AWS_CLIENT_MAX_ATTEMPTS is used.
+        max_read_timeout: Optional cap on the read timeout of the client when it is created. Without max_read_timeout: AWS_CLIENT_READ_TIMEOUT is used.
+
+    Returns:
+        A boto3 client shared by all callers with the same service and region.
+    """
+    global _session, _created
+
+    key = (service_name, region_name)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            if _session is None:
+                import boto3
+                _session = boto3.session.Session()
+            logger.info(f"Creating shared {service_name} client (region={region_name})")
+            client = _session.client(service_name, region_name=region_name, config=client_config(max_attempts, max_read_timeout))
+            _clients[key] = client
+            _created += 1
+        return client
+
+
+def get_lambda_client() -> Any:
+    """Return the shared Lambda client. It does not retry, system_functions does, and it stops reading after the call timeout."""
+    return get_client('lambda', max_attempts=1, max_read_timeout=lambda_call_timeout())
+
+
+def get_bedrock_agent_runtime_client(region_name: Optional[str] = None) -> Any:
+    """Return the shared Bedrock Agent Runtime client."""
+    return get_client('bedrock-agent-runtime', region_name or os.environ.get('AWS_REGION', 'us-west-2'))
+
+
+def warm_up() -> None:
+    """Create the Lambda and Bedrock Agent Runtime clients ahead of the first tool call."""
+    get_lambda_client()
+    get_bedrock_agent_runtime_client()
+
+
+def set_client(service_name: str, client: Any, region_name: Optional[str] = None) -> None:
+    """Install a client for a service, e.g. a local stand-in used by the benchmarks."""
+    with _lock:
+        _clients[(service_name, region_name)] = client
+
+
+def reset_clients() -> None:
+    """Close and drop all shared clients, e.g. after a credential or configuration change."""
+    global _session
+
+    with _lock:
+        for client in _clients.values():
+            try:
+                client.close()
+            except Exception as e:
+                logger.warning(f"Error closing client: {str(e)}")
+        _clients.clear()
+        _session = None
+
+
+def pool_stats() -> Dict[str, Any]:
+    """
+    Report connection pool statistics for every shared client.
+
+    Returns:
+        Dictionary with the number of clients created so far and, per client, the
+        configured pool size plus per-host connection and request counters.
+    """
+    with _lock:
+        clients = dict(_clients)
+        created = _created
+
+    stats = {"clients_created": created, "clients": {}}
+    for (service_name, region_name), client in clients.items():
+        endpoint = getattr(client, '_endpoint', None)
+        if endpoint is None:
+            # Not a botocore client (e.g. a local stand-in)
+            continue
+        http_session = endpoint.http_session
+        hosts = {}
+        manager = getattr(http_session, '_manager', None)
+        if manager is not None:
+            for pool_key in manager.pools.keys():
+                pool = manager.pools.get(pool_key)
+                if pool is None:
+                    continue
+                # Free slots in the pool queue are None placeholders
+                idle = sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool is not None else 0
+                hosts[f"{pool.host}:{pool.port}"] = {
+                    "connections_opened": pool.num_connections,
+                    "requests": pool.num_requests,
+                    "idle_connections": idle,
+                }
+        stats["clients"][f"{service_name}/{region_name or 'default'}"] = {
+            "max_pool_connections": http_session._max_pool_connections,
+            "hosts": hosts,
+        }
+    return stats
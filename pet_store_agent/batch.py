@@ -0,0 +1,247 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Batch processing of requests from a JSONL file.
+
+Prompts are streamed from the input file and run through the shared agent on the
+async path, with at most --concurrency requests in flight and at most --rate
+requests started per second. Each result is appended to the output JSONL file as
+soon as it is ready, so an interrupted run can be resumed with --resume: requests
+whose id is already in the output are skipped (with --retry-errors, only those
+that succeeded). An existing output file is only replaced with --overwrite. A
+summary with throughput, error rate and latency percentiles is printed as JSON
+when the run ends.
+
+Requests are answered by the agent, not the guest response cache, so an evaluation
+run sees fresh model output; --use-cache lets cached answers through.
+
+Each output line holds the request id, the response, its status ("Accept",
+"Reject", "Error" or null when the response is not JSON), latency_ms, the deadline
+metadata and, for requests that raised, the error.
+
+Usage:
+    python pet_store_agent/batch.py requests.jsonl results.jsonl --concurrency 8 --rate 5
+    python pet_store_agent/batch.py requests.jsonl results.jsonl --id-field request_id --prompt-field body --resume
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+
+import pet_store_agent
+from telemetry import percentile
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Async token bucket: at most rate acquisitions per second, with bursts of up to burst."""
+
+    def __init__(self, rate: float, burst: Optional[int] = None, clock=time.monotonic):
+        self.rate = rate
+        self.burst = max(1, burst if burst is not None else int(rate) or 1)
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = self._clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def read_requests(path: str, id_field: str, prompt_field: str) -> Iterator[Tuple[str, str]]:
+    """Yield (id, prompt) pairs from a JSONL file; lines without an id are numbered from 1."""
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            yield str(record.get(id_field) or line_number), record[prompt_field]
+
+
+def completed_ids(path: str, retry_errors: bool = False) -> Set[str]:
+    """Return the ids already in an output file; with retry_errors, only those that did not fail."""
+    status: Dict[str, bool] = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut short by an interrupted run
+                    continue
+                status[record["id"]] = not _failed(record)
+    except FileNotFoundError:
+        pass
+    return {request_id for request_id, ok in status.items() if ok or not retry_errors}
+
+
+def response_status(response: Any) -> Optional[str]:
+    try:
+        return json.loads(response).get("status")
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def _failed(record: Dict[str, Any]) -> bool:
+    return bool(record.get("error")) or record.get("status") == "Error"
+
+
+async def _process(request_id: str, prompt: str, deadline_ms: Optional[int], use_cache: bool) -> Dict[str, Any]:
+    started = time.perf_counter()
+    record: Dict[str, Any] = {"id": request_id}
+    try:
+        result = await pet_store_agent.ahandle_request(prompt, deadline_ms=deadline_ms, use_cache=use_cache)
+        record.update(response=result["response"], status=response_status(result["response"]), metadata=result["metadata"])
+    except Exception as e:
+        logger.error(f"Request {request_id} failed: {str(e)}")
+        record.update(response=None, status=None, error=str(e))
+    record["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return record
+
+
+async def run_batch(
+    input_path: str,
+    output_path: str,
+    concurrency: int = 8,
+    rate: float = 0.0,
+    id_field: str = "id",
+    prompt_field: str = "prompt",
+    resume: bool = False,
+    retry_errors: bool = False,
+    deadline_ms: Optional[int] = None,
+    use_cache: bool = False,
+    overwrite: bool = False,
+) -> Dict[str, Any]:
+    """
+    Run every request in input_path through the shared agent and append the results to output_path.
+
+    Args:
+        input_path: JSONL file of request objects.
+        output_path: JSONL file the results are appended to.
+        concurrency: Maximum number of requests in flight.
+        rate: Maximum requests started per second; 0 for no limit.
+        id_field: Request field holding the request id.
+        prompt_field: Request field holding the prompt.
+        resume: Skip requests whose id is already in output_path.
+        retry_errors: With resume, run failed requests again.
+        deadline_ms: Optional per-request time budget.
+        use_cache: Whether guest requests may be answered from the response cache.
+        overwrite: Without resume, replace an existing output_path instead of refusing to.
+
+    Returns:
+        Summary with counts, error rate, throughput and latency percentiles.
+
+    Raises:
+        FileExistsError: output_path exists and neither resume nor overwrite is set.
+    """
+    if not resume and not overwrite and os.path.exists(output_path):
+        raise FileExistsError(f"{output_path} already exists; use resume to continue it or overwrite to replace it")
+    skip = completed_ids(output_path, retry_errors) if resume else set()
+    limiter = RateLimiter(rate)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    latencies = []
+    counts = {"processed": 0, "errors": 0, "skipped": 0}
+
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as output:
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                await limiter.acquire()
+                record = await _process(*item, deadline_ms, use_cache)
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+                latencies.append(record["latency_ms"])
+                counts["processed"] += 1
+                counts["errors"] += _failed(record)
+                if counts["processed"] % 100 == 0:
+                    logger.warning(f"Processed {counts['processed']} requests")
+
+        started = time.perf_counter()
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+        # The input is read lazily; the bounded queue keeps at most a few requests ahead of the workers
+        for request_id, prompt in read_requests(input_path, id_field, prompt_field):
+            if request_id in skip:
+                counts["skipped"] += 1
+                continue
+            await queue.put((request_id, prompt))
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+        wall_s = time.perf_counter() - started
+
+    summary = {
+        **counts,
+        "error_rate": round(counts["errors"] / counts["processed"], 4) if counts["processed"] else 0.0,
+        "wall_s": round(wall_s, 3),
+        "throughput_rps": round(counts["processed"] / wall_s, 3) if wall_s > 0 else None,
+    }
+    if latencies:
+        summary["latency_ms"] = {
+            "mean": round(sum(latencies) / len(latencies), 1),
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies),
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL file of requests")
+    parser.add_argument("output", help="JSONL file the results are written to")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight (default 8)")
+    parser.add_argument("--rate", type=float, default=0.0, help="requests started per second, 0 for no limit (default 0)")
+    parser.add_argument("--id-field", default="id", help="request id field (default id; line number when missing)")
+    parser.add_argument("--prompt-field", default="prompt", help="prompt field (default prompt)")
+    parser.add_argument("--resume", action="store_true", help="skip requests already in the output file")
+    parser.add_argument("--retry-errors", action="store_true", help="with --resume, run failed requests again")
+    parser.add_argument("--overwrite", action="store_true", help="replace an existing output file")
+    parser.add_argument("--deadline-ms", type=int, help="per-request time budget")
+    parser.add_argument("--use-cache", action="store_true", help="let the guest response cache answer requests")
+    parser.add_argument("--log-level", default="WARNING", help="log level while the batch runs (default WARNING)")
+    args = parser.parse_args()
+
+    if not args.resume and not args.overwrite and os.path.exists(args.output):
+        parser.error(f"{args.output} already exists; use --resume to continue it or --overwrite to replace it")
+
+    logging.getLogger().setLevel(args.log_level)
+    pet_store_agent.warm_up()
+    summary = asyncio.run(run_batch(
+        args.input,
+        args.output,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        id_field=args.id_field,
+        prompt_field=args.prompt_field,
+        resume=args.resume,
+        retry_errors=args.retry_errors,
+        deadline_ms=args.deadline_ms,
+        use_cache=args.use_cache,
+        overwrite=args.overwrite,
+    ))
+    json.dump(summary, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Parsing of settings from the environment.
+
+Every module reads its settings through these helpers when they are used, not
+when it is imported, so a changed variable takes effect without a restart. Shared
+objects built from settings (the caches, the AWS clients) read them when they are
+first created and keep them until they are reset. A value that does not parse
+falls back to the default.
+"""
+
+import os
+
+TRUE_VALUES = ("1", "true", "yes", "on")
+
+
+def env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def env_flag(name: str, default: bool = True) -> bool:
+    """Return whether a flag is on: one of 1, true, yes or on, in any case; default when it is not set."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in TRUE_VALUES
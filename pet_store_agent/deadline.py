@@ -0,0 +1,299 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Per-request deadlines and budget accounting.
+
+A Deadline is created when a request arrives, from the time budget in the payload
+(or the Lambda's remaining time), and is made current for the request with
+deadline_scope(). From there it bounds:
+- Tool calls: system function and knowledge base calls read current_deadline()
+  and fail fast with DeadlineExceeded once it has passed.
+- Model turns: before each model turn the request loop checks that the remaining
+  time covers the expected model call (the recent p95 of model call durations)
+  plus a margin for answering, and stops otherwise. Until enough model calls were
+  seen there is no expected duration (unless DEADLINE_MODEL_TURN_MS sets one), and
+  a model turn may start as long as time is left before the margin.
+- The graph recursion limit, derived from how many model turns fit in the budget
+  and in the model turn budget. Without an expected duration only the turn budget
+  bounds it, and the checks between steps enforce the time budget.
+
+The usage budgets (usage.py) on model turns, tool calls, tokens and cost stop the
+request loop the same way; stop_reason() tells which limit, if any, leaves no room
+for another model turn.
+
+DeadlineCallbackHandler records where the time went (prefetch, model calls, tool
+calls and the rest) and the model tokens used by model, for the response metadata.
+
+Configuration is read from the environment:
+    REQUEST_DEADLINE_SECONDS  budget for requests that do not bring one (default 55)
+    DEADLINE_MARGIN_MS        time kept back to produce the response (default 500)
+    DEADLINE_MODEL_TURN_MS    expected model call duration until enough calls were seen (default: none)
+"""
+
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from config import env_float
+from telemetry import percentile
+from usage import UsageBudget
+
+# Model call samples needed before the expected duration follows the observed p95
+MIN_MODEL_SAMPLES = 5
+DEFAULT_RECURSION_LIMIT = 25
+
+_current = contextvars.ContextVar("pet_store_agent_deadline", default=None)
+_model_durations = deque(maxlen=200)
+_model_durations_lock = threading.Lock()
+
+
+class DeadlineExceeded(Exception):
+    """Raised by tool calls started after the request deadline."""
+
+    def __init__(self):
+        super().__init__("Request deadline exceeded")
+
+
+class Deadline:
+    """A request's time budget and how it has been spent."""
+
+    def __init__(self, budget_seconds: float, clock=time.monotonic, usage_budget: Optional[UsageBudget] = None):
+        self._clock = clock
+        self.budget = budget_seconds
+        self.started_at = clock()
+        self.expires_at = self.started_at + budget_seconds
+        self.spent: Dict[str, float] = {"prefetch": 0.0, "model": 0.0}
+        self.tool_intervals: List[Tuple[float, float]] = []
+        self.model_turns = 0
+        self.tokens: Dict[str, int] = {"input": 0, "output": 0, "cache_read": 0, "cache_write": 0}
+        self.usage_budget = usage_budget or UsageBudget.from_env()
+        self._tokens_by_model: Dict[str, Dict[str, int]] = {}
+        self._last_turn: Dict[str, Any] = {"model": None, "input": 0, "output": 0, "cache_read": 0}
+        self.stopped: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_budget_ms(cls, budget_ms: Any = None) -> "Deadline":
+        """Create a deadline from a millisecond budget, or REQUEST_DEADLINE_SECONDS without a usable one."""
+        try:
+            seconds = float(budget_ms) / 1000
+        except (TypeError, ValueError):
+            seconds = 0
+        if seconds <= 0:
+            seconds = env_float('REQUEST_DEADLINE_SECONDS', 55)
+        return cls(seconds)
+
+    def remaining(self) -> float:
+        return self.expires_at - self._clock()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def margin(self) -> float:
+        return env_float('DEADLINE_MARGIN_MS', 500) / 1000
+
+    def answer_by(self) -> float:
+        """Seconds left before the request loop must stop to answer in time."""
+        return self.remaining() - self.margin()
+
+    def can_start_model_turn(self) -> bool:
+        estimate = model_turn_estimate()
+        if estimate is None:
+            return self.answer_by() > 0
+        return self.answer_by() >= estimate
+
+    def stop_reason(self) -> Optional[str]:
+        """Why no further model turn may start: "deadline", a spent usage budget (e.g. "turn_budget"), or None."""
+        if not self.can_start_model_turn():
+            return "deadline"
+        return self.usage_budget.exceeded(self)
+
+    def recursion_limit(self) -> int:
+        """Graph steps allowed: three per model turn that fits in the time and turn budgets (hook, model, tools), plus one."""
+        estimate = model_turn_estimate()
+        turns = DEFAULT_RECURSION_LIMIT if estimate is None else max(1, int(self.answer_by() / estimate))
+        if self.usage_budget.max_model_turns:
+            turns = min(turns, max(1, self.usage_budget.max_model_turns - self.model_turns))
+        return min(DEFAULT_RECURSION_LIMIT, 3 * turns + 1)
+
+    def add_model_turn(self) -> None:
+        with self._lock:
+            self.model_turns += 1
+
+    def add(self, kind: str, seconds: float) -> None:
+        with self._lock:
+            self.spent[kind] = self.spent.get(kind, 0.0) + seconds
+
+    def add_tokens(self, input_tokens: int, output_tokens: int, model: Optional[str] = None, cache_read: int = 0, cache_write: int = 0) -> None:
+        """Charge one model call's tokens; input_tokens includes the prompt cache reads and writes."""
+        turn = {"input": input_tokens, "output": output_tokens, "cache_read": cache_read}
+        with self._lock:
+            self.tokens["input"] += input_tokens
+            self.tokens["output"] += output_tokens
+            self.tokens["cache_read"] += cache_read
+            self.tokens["cache_write"] += cache_write
+            counts = self._tokens_by_model.setdefault(model or "unknown", {"input": 0, "output": 0, "cache_read": 0})
+            for kind, count in turn.items():
+                counts[kind] += count
+            self._last_turn = {"model": model or "unknown", **turn}
+
+    def tokens_by_model(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {model: dict(counts) for model, counts in self._tokens_by_model.items()}
+
+    def last_turn_tokens(self) -> Dict[str, Any]:
+        """Tokens of the most recent model call, the estimate for the next one."""
+        with self._lock:
+            return dict(self._last_turn)
+
+    @property
+    def tool_calls(self) -> int:
+        return len(self.tool_intervals)
+
+    def add_tool_interval(self, start: float, end: float) -> None:
+        with self._lock:
+            self.tool_intervals.append((start, end))
+
+    def _tool_wall_time(self) -> float:
+        """Wall-clock time with at least one tool call running; concurrent calls are counted once."""
+        total = 0.0
+        current_start, current_end = None, None
+        for start, end in sorted(self.tool_intervals):
+            if current_end is None or start > current_end:
+                if current_end is not None:
+                    total += current_end - current_start
+                current_start, current_end = start, end
+            else:
+                current_end = max(current_end, end)
+        if current_end is not None:
+            total += current_end - current_start
+        return total
+
+    def metadata(self) -> Dict[str, Any]:
+        """Summarize the budget: total, elapsed, remaining and where the time went, in milliseconds."""
+        with self._lock:
+            elapsed = self._clock() - self.started_at
+            tools = self._tool_wall_time()
+            spent = {kind: round(seconds * 1000, 1) for kind, seconds in self.spent.items()}
+            spent["tools"] = round(tools * 1000, 1)
+            spent["other"] = round(max(0.0, elapsed - sum(self.spent.values()) - tools) * 1000, 1)
+            return {
+                "budget_ms": round(self.budget * 1000),
+                "elapsed_ms": round(elapsed * 1000, 1),
+                "remaining_ms": round(max(0.0, self.expires_at - self._clock()) * 1000, 1),
+                "spent_ms": spent,
+                "model_turns": self.model_turns,
+                "tokens": dict(self.tokens),
+                "tool_calls": len(self.tool_intervals),
+                "stopped": self.stopped,
+            }
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Return the deadline of the request being processed, if any."""
+    return _current.get()
+
+
+def check_deadline() -> None:
+    """Raise DeadlineExceeded if the current request's deadline has passed."""
+    deadline = _current.get()
+    if deadline is not None and deadline.expired():
+        raise DeadlineExceeded()
+
+
+@contextmanager
+def deadline_scope(deadline: Deadline):
+    """Make deadline current for the enclosed block and the threads and tasks it starts with a copied context."""
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def record_model_duration(seconds: float) -> None:
+    with _model_durations_lock:
+        _model_durations.append(seconds)
+
+
+def model_turn_estimate() -> Optional[float]:
+    """
+    Expected duration of the next model call: the recent p95. Until enough calls were
+    seen: DEADLINE_MODEL_TURN_MS when set, otherwise None (no estimate).
+    """
+    with _model_durations_lock:
+        samples = list(_model_durations)
+    if len(samples) < MIN_MODEL_SAMPLES:
+        seed = env_float('DEADLINE_MODEL_TURN_MS', 0)
+        return seed / 1000 if seed > 0 else None
+    return percentile(samples, 95)
+
+
+class DeadlineCallbackHandler(BaseCallbackHandler):
+    """LangChain callback handler that charges model and tool time to a request's deadline."""
+
+    def __init__(self, deadline: Deadline):
+        self.deadline = deadline
+        self._starts: Dict[Any, float] = {}
+        self._models: Dict[Any, str] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id) -> None:
+        with self._lock:
+            self._starts[run_id] = time.monotonic()
+
+    def _stop(self, run_id) -> Optional[Tuple[float, float]]:
+        with self._lock:
+            start = self._starts.pop(run_id, None)
+        return None if start is None else (start, time.monotonic())
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        self.deadline.add_model_turn()
+        model = (kwargs.get("metadata") or {}).get("ls_model_name")
+        if model:
+            with self._lock:
+                self._models[run_id] = model
+        self._start(run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        interval = self._stop(run_id)
+        if interval is not None:
+            self.deadline.add("model", interval[1] - interval[0])
+            record_model_duration(interval[1] - interval[0])
+        with self._lock:
+            model = self._models.pop(run_id, None)
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                details = usage.get("input_token_details") or {}
+                self.deadline.add_tokens(
+                    usage.get("input_tokens") or 0,
+                    usage.get("output_tokens") or 0,
+                    model,
+                    details.get("cache_read") or 0,
+                    details.get("cache_creation") or 0
+                )
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        with self._lock:
+            self._models.pop(run_id, None)
+        interval = self._stop(run_id)
+        if interval is not None:
+            self.deadline.add("model", interval[1] - interval[0])
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs) -> None:
+        self._start(run_id)
+
+    def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+        interval = self._stop(run_id)
+        if interval is not None:
+            self.deadline.add_tool_interval(*interval)
+
+    def on_tool_error(self, error, *, run_id, **kwargs) -> None:
+        self.on_tool_end(None, run_id=run_id)
@@ -3,11 +3,28 @@
 
 import os
 import json
-import boto3
+import asyncio
 import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import env_int
+from system_functions import invoke_system_function
+from telemetry import traced_tool
 
 logger = logging.getLogger(__name__)
 
+# Status of each product as last read, and a version bumped whenever a read finds it
+# has crossed a status threshold. Cached responses record the versions they depended on.
+_statuses: Dict[str, Tuple[Tuple[Any, ...], int]] = {}
+_statuses_lock = threading.Lock()
+_status_listeners: List[Callable[[str], None]] = []
+_reads = contextvars.ContextVar("pet_store_agent_inventory_reads", default=None)
+
+@traced_tool
 def get_inventory(product_code: str = None) -> str:
     """
     Get inventory information for products.
@@ -41,28 +58,8 @@ def get_inventory(product_code: str = None) -> str:
     """
     logger.info(f"get_inventory called with input: product_code={product_code}")
     
-    lambda_client = boto3.client('lambda')
-    
-    payload = {
-        "function": "getInventory",
-        "parameters": []
-    }
-    
-    if product_code:
-        payload["parameters"].append({
-            "name": "product_code",
-            "value": product_code
-        })
-    
     try:
-        response = lambda_client.invoke(
-            FunctionName=os.environ.get('SYSTEM_FUNCTION_1_NAME'),
-            Payload=json.dumps(payload)
-        )
-        
-        lambda_response = json.loads(response['Payload'].read())
-        # Extract the actual data from the nested response structure
-        actual_data = json.loads(lambda_response['response']['functionResponse']['responseBody']['TEXT']['body'])
+        actual_data = _fetch_inventory(product_code)
         
         result = json.dumps(actual_data)
         logger.info(f"get_inventory returning result: {result}")
@@ -72,4 +69,193 @@ def get_inventory(product_code: str = None) -> str:
         
         result = f"Failed to get inventory: {str(e)}"
         logger.info(f"get_inventory returning result: {result}")
-        return result
\ No newline at end of file
+        return result
+
+def _fetch_inventory(product_code: str = None):
+    """Invoke the getInventory system function and return the decoded response body."""
+    parameters = {"product_code": product_code} if product_code else {}
+    data = invoke_system_function(os.environ.get('SYSTEM_FUNCTION_1_NAME'), "getInventory", parameters)
+    records = [data] if product_code else _full_inventory_records(data)
+    if records is None:
+        shape = f"object with keys {sorted(data)[:10]}" if isinstance(data, dict) else type(data).__name__
+        logger.warning(f"Unrecognized full inventory response: {shape}")
+    _observe(records or [])
+    return data
+
+def status_bucket(record: Dict[str, Any]) -> Tuple[Any, ...]:
+    """The thresholds a product's answer depends on: its status, whether it is out of stock and whether it needs replenishing."""
+    quantity = record.get("quantity")
+    reorder_level = record.get("reorder_level")
+    return (
+        record.get("status"),
+        isinstance(quantity, (int, float)) and quantity <= 0,
+        isinstance(quantity, (int, float)) and isinstance(reorder_level, (int, float)) and quantity <= reorder_level,
+    )
+
+def _observe(records: List[Any]) -> None:
+    """Update product status versions from inventory records and note them as read by the current request."""
+    changed = []
+    reads = _reads.get()
+    with _statuses_lock:
+        for record in records:
+            if not isinstance(record, dict) or "error" in record or not record.get("product_code"):
+                continue
+            code = record["product_code"]
+            bucket = status_bucket(record)
+            previous = _statuses.get(code)
+            version = previous[1] if previous else 0
+            if previous is not None and previous[0] != bucket:
+                version += 1
+                changed.append(code)
+            _statuses[code] = (bucket, version)
+            if reads is not None:
+                reads[code] = version
+    for code in changed:
+        logger.info(f"Inventory status of {code} changed")
+        for listener in list(_status_listeners):
+            listener(code)
+
+def status_version(product_code: str) -> Optional[int]:
+    """Return the status version of a product, or None if it has not been read yet."""
+    with _statuses_lock:
+        entry = _statuses.get(product_code)
+    return entry[1] if entry else None
+
+def on_status_change(listener: Callable[[str], None]) -> None:
+    """Call listener with the product code whenever a read finds a product crossed a status threshold."""
+    _status_listeners.append(listener)
+
+@contextmanager
+def track_inventory_reads():
+    """Collect the products whose inventory is read in the enclosed block (and the tool calls it starts), with their status versions."""
+    reads: Dict[str, int] = {}
+    token = _reads.set(reads)
+    try:
+        yield reads
+    finally:
+        _reads.reset(token)
+
+def refresh_inventory(product_codes: List[str]) -> bool:
+    """Read the inventory of products again to update their status versions; False if any read failed."""
+    codes = _unique_codes(product_codes)
+    if not codes:
+        return True
+    try:
+        return not any("error" in record for record in _fetch_batch(codes).values())
+    except Exception as e:
+        logger.error(f"refresh_inventory() error: {str(e)}")
+        return False
+
+async def aget_inventory(product_code: str = None) -> str:
+    """
+    Async variant of get_inventory.
+
+    The Lambda invocation runs in a worker thread on the shared client, so several
+    tool calls from the same model turn can be in flight at once.
+    """
+    return await asyncio.to_thread(get_inventory, product_code)
+
+# Inventory fields kept in the compact batch result
+BATCH_FIELDS = ("quantity", "status", "reorder_level")
+# Keys a full-inventory response may hold its product records under
+FULL_INVENTORY_KEYS = ("products", "items", "inventory")
+
+def _batch_full_fetch_threshold() -> int:
+    """Number of distinct codes from which one full-inventory fetch replaces per-code calls."""
+    return env_int('INVENTORY_BATCH_FULL_FETCH_THRESHOLD', 4)
+
+def _unique_codes(product_codes: List[str]) -> List[str]:
+    """Strip, drop empty and remove duplicate product codes, keeping the first occurrence order."""
+    return list(dict.fromkeys(code.strip() for code in product_codes if code and code.strip()))
+
+def _compact(record: Any) -> Dict[str, Any]:
+    """Reduce an inventory record to the fields the agent needs."""
+    if not isinstance(record, dict):
+        return {"error": "Unexpected inventory response"}
+    if "error" in record:
+        return {"error": str(record["error"])}
+    compact = {field: record[field] for field in BATCH_FIELDS if field in record}
+    if "name" in record:
+        compact["name"] = record["name"]
+    return compact
+
+def _full_inventory_records(data: Any) -> Optional[List[Dict[str, Any]]]:
+    """
+    Return the product records of a full-inventory response.
+
+    The records are either the response itself or a list under one of
+    FULL_INVENTORY_KEYS; for any other shape None is returned.
+    """
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        for key in FULL_INVENTORY_KEYS:
+            if isinstance(data.get(key), list):
+                return data[key]
+    return None
+
+def _fetch_one(code: str) -> Dict[str, Any]:
+    try:
+        return _compact(_fetch_inventory(code))
+    except Exception as e:
+        logger.error(f"get_inventory_batch() error for {code}: {str(e)}")
+        return {"error": f"Failed to get inventory: {str(e)}"}
+
+def _fetch_batch(codes: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Fetch inventory for distinct codes, using one full fetch when that takes fewer calls."""
+    if len(codes) >= _batch_full_fetch_threshold():
+        records = _full_inventory_records(_fetch_inventory())
+        if records is not None:
+            by_code = {record.get("product_code"): record for record in records if isinstance(record, dict)}
+            return {
+                code: _compact(by_code[code]) if code in by_code else {"error": f"Product {code} not found"}
+                for code in codes
+            }
+        # Without the records, "not found" cannot be told apart from a shape we do not know
+        logger.warning(f"Falling back to per-product inventory lookups for {len(codes)} products")
+
+    if len(codes) == 1:
+        return {codes[0]: _fetch_one(codes[0])}
+
+    with ThreadPoolExecutor(max_workers=len(codes)) as executor:
+        # Each fetch runs in a copy of the caller's context, so it sees the request deadline and read tracking
+        futures = [executor.submit(contextvars.copy_context().run, _fetch_one, code) for code in codes]
+        return dict(zip(codes, (future.result() for future in futures)))
+
+@traced_tool
+def get_inventory_batch(product_codes: List[str]) -> str:
+    """
+    Get inventory information for several products in one call.
+    
+    Args:
+        product_codes: List of product codes to check. Duplicates are ignored.
+    
+    Returns:
+        JSON string keyed by product code with quantity, status, reorder_level and name, or an error entry per product
+        
+    Sample Response Body:
+    {
+        "CM001": {"quantity": 150, "status": "in_stock", "reorder_level": 50, "name": "Meow Munchies"},
+        "DD006": {"error": "Product DD006 not found"}
+    }
+    """
+    codes = _unique_codes(product_codes or [])
+    logger.info(f"get_inventory_batch called with input: product_codes={codes}")
+    
+    if not codes:
+        return json.dumps({})
+    
+    try:
+        result = json.dumps(_fetch_batch(codes))
+        logger.info(f"get_inventory_batch returning {len(codes)} products")
+        return result
+    except Exception as e:
+        logger.error(f"get_inventory_batch() error: {str(e)}")
+        
+        result = f"Failed to get inventory: {str(e)}"
+        logger.info(f"get_inventory_batch returning result: {result}")
+        return result
+
+async def aget_inventory_batch(product_codes: List[str]) -> str:
+    """Async variant of get_inventory_batch that runs the Lambda invocations in a worker thread."""
+    return await asyncio.to_thread(get_inventory_batch, product_codes)
@@ -3,7 +3,16 @@
 
 import pet_store_agent
 
+# Build the agent during the Lambda init phase, before the first request arrives
+pet_store_agent.warm_up()
+
+# Time kept back from the Lambda timeout to return the response
+LAMBDA_RESPONSE_MARGIN_MS = 1000
+
 def handler(event, context):
     """Lambda handler function"""
     prompt = event.get('prompt', 'A new user is asking about the price of Doggy Delights?')
-    return pet_store_agent.process_request(prompt)
\ No newline at end of file
+    deadline_ms = event.get('deadline_ms')
+    if deadline_ms is None and context is not None:
+        deadline_ms = context.get_remaining_time_in_millis() - LAMBDA_RESPONSE_MARGIN_MS
+    return pet_store_agent.process_request(prompt, event.get('session_id'), deadline_ms, event.get('cache', True) is not False)
\ No newline at end of file
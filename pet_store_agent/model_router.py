@@ -0,0 +1,155 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Routing of requests between a fast and a strong model tier.
+
+Each request is classified from local features of its text before the first
+model turn:
+- identified: a customer id or email is present (subscription rules, pet advice)
+- session: the request continues a conversation
+- products: products mentioned, counted from Title Case names and from quantities
+  placed before a product name or unit ("2 bags", "three Doggy Delights")
+- pet_care: the request asks for pet care advice
+- words: length of the request text
+Guest questions about at most one product, without pet care intent and short
+enough, go to the fast tier; everything else goes to the strong tier. A fast-tier
+answer that still fails schema validation after local repair is not re-asked:
+the request is run again on the strong tier (an escalation).
+
+Per-tier request counts, latency percentiles, token usage and the escalation rate
+are kept in process and returned by router_stats().
+
+Configuration is read from the environment:
+    MODEL_ROUTER_ENABLED     route requests between tiers (default true); off sends everything to the strong tier
+    MODEL_ID_FAST            Bedrock model id of the fast tier (default us.amazon.nova-lite-v1:0)
+    MODEL_ROUTER_MAX_WORDS   longest request, in words, the fast tier takes (default 40)
+"""
+
+import os
+import re
+import threading
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+from config import env_flag, env_int
+from prefetch import extract_identifiers
+from telemetry import percentile
+
+FAST = "fast"
+STRONG = "strong"
+TIERS = (FAST, STRONG)
+
+DEFAULT_FAST_MODEL_ID = "us.amazon.nova-lite-v1:0"
+
+_PRODUCT_NAME = re.compile(r"\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)+\b")
+_QUANTITY_UNITS = r"units?|items?|pieces?|bags?|cans?|box(?:es)?|packs?|packages?|bottles?|jars?|bowls?|toys?|treats?|collars?|leash(?:es)?|beds?"
+# A quantity directly before a product name or unit noun; prices, decimals and years are not quantities
+_QUANTITY = re.compile(
+    r"(?<![\w$.,])(?:\d{1,3}|(?i:two|three|four|five|six|seven|eight|nine|ten|a pair of|a couple of))"
+    r"\s+(?:of\s+)?(?:the\s+)?(?:[A-Z][a-z]+|(?i:" + _QUANTITY_UNITS + r")\b)"
+)
+_PET_CARE = re.compile(
+    r"\b(?:bath(?:e|ing)?|groom(?:ing)?|feed(?:ing)?|diet|health(?:y)?|safe|suitable|advice|recommend\w*|"
+    r"care|clean(?:ing)?|train(?:ing)?|puppy|kitten|how (?:should|often|do) i)\b",
+    re.IGNORECASE,
+)
+_WORD = re.compile(r"\S+")
+
+_stats: Dict[str, Dict[str, Any]] = {}
+_stats_lock = threading.Lock()
+
+
+def router_enabled() -> bool:
+    return env_flag('MODEL_ROUTER_ENABLED')
+
+
+def fast_model_id() -> str:
+    return os.environ.get('MODEL_ID_FAST', DEFAULT_FAST_MODEL_ID)
+
+
+def request_features(prompt: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+    """Extract the local features requests are routed on."""
+    identifiers = extract_identifiers(prompt)
+    text = identifiers["query"] or ""
+    names = set(name.lower() for name in _PRODUCT_NAME.findall(text))
+    return {
+        "identified": bool(identifiers["user_id"] or identifiers["user_email"]),
+        "session": session_id is not None,
+        "products": max(len(names), len(_QUANTITY.findall(text))),
+        "pet_care": bool(_PET_CARE.search(text)),
+        "words": len(_WORD.findall(text)),
+    }
+
+
+def route(prompt: str, session_id: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Choose the model tier for a request.
+
+    Returns:
+        Tuple of (tier, features), tier being FAST or STRONG.
+    """
+    features = request_features(prompt, session_id)
+    fast = (
+        router_enabled()
+        and not features["identified"]
+        and not features["session"]
+        and features["products"] <= 1
+        and not features["pet_care"]
+        and features["words"] <= env_int('MODEL_ROUTER_MAX_WORDS', 40)
+    )
+    return (FAST if fast else STRONG), features
+
+
+def _tier_stats(tier: str) -> Dict[str, Any]:
+    return _stats.setdefault(tier, {
+        "requests": 0,
+        "escalations": 0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "latencies": deque(maxlen=1000),
+    })
+
+
+def record_run(tier: str, seconds: float, input_tokens: int = 0, output_tokens: int = 0) -> None:
+    """Record one agent run on a tier: its duration and the tokens it used."""
+    with _stats_lock:
+        stats = _tier_stats(tier)
+        stats["requests"] += 1
+        stats["input_tokens"] += input_tokens
+        stats["output_tokens"] += output_tokens
+        stats["latencies"].append(seconds)
+
+
+def record_escalation() -> None:
+    """Record a fast-tier answer escalated to the strong tier."""
+    with _stats_lock:
+        _tier_stats(FAST)["escalations"] += 1
+
+
+def router_stats() -> Dict[str, Any]:
+    """Return per-tier runs, latency percentiles (ms), mean tokens per run and the fast tier's escalation rate."""
+    with _stats_lock:
+        report = {}
+        for tier, stats in _stats.items():
+            latencies = [seconds * 1000 for seconds in stats["latencies"]]
+            runs = stats["requests"]
+            report[tier] = {
+                "requests": runs,
+                "latency_ms": {
+                    "p50": percentile(latencies, 50, 1),
+                    "p95": percentile(latencies, 95, 1),
+                } if latencies else None,
+                "mean_input_tokens": round(stats["input_tokens"] / runs, 1) if runs else 0.0,
+                "mean_output_tokens": round(stats["output_tokens"] / runs, 1) if runs else 0.0,
+            }
+        if FAST in _stats:
+            fast = _stats[FAST]
+            report[FAST]["escalations"] = fast["escalations"]
+            report[FAST]["escalation_rate"] = round(fast["escalations"] / fast["requests"], 4) if fast["requests"] else 0.0
+        return report
+
+
+def reset_router_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
@@ -2,20 +2,29 @@
 # SPDX-License-Identifier: MIT-0
 
 import os
-import json
 import logging
-from typing import Dict, List, Any
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.tools import StructuredTool
-from langgraph.prebuilt import create_react_agent
-from langgraph.checkpoint.memory import MemorySaver
-from langchain.chat_models import init_chat_model
-
-from retrieve_product_info import retrieve_product_info
-from retrieve_pet_care import retrieve_pet_care
-from inventory_management import get_inventory
-from user_management import get_user_by_id, get_user_by_email
+import time
+import asyncio
+import threading
+from langchain_core.messages import HumanMessage, AIMessage
+
+from aws_clients import warm_up as warm_up_clients
+from product_index import get_index
+from retrieve_product_info import retrieve_product_info, aretrieve_product_info
+from retrieve_pet_care import retrieve_pet_care, aretrieve_pet_care
+from inventory_management import get_inventory, aget_inventory, get_inventory_batch, aget_inventory_batch
+from user_management import get_user_by_id, get_user_by_email, aget_user_by_id, aget_user_by_email
+from pricing import calculate_order
+from prompts import system_message
+from telemetry import TelemetryCallbackHandler, record_usage
+from deadline import Deadline, DeadlineCallbackHandler, deadline_scope
+from prefetch import prefetch_messages, aprefetch_messages
+from inventory_management import track_inventory_reads
+from response_cache import cacheable, lookup_response, alookup_response, store_response
+from session_store import SESSION_CONTEXT_KEY, get_checkpointer, sessions_enabled, trim_history, validate_session_id, with_session_context
+from response_validation import ERROR_RESPONSE, set_reask_model, validated_response, avalidated_response
+from model_router import FAST, STRONG, TIERS, fast_model_id, record_escalation, record_run, route, router_enabled
+from usage import usage_report
 
 logger = logging.getLogger(__name__)
 
@@ -25,171 +34,42 @@ logging.getLogger().setLevel(logging.INFO)
 #Model id for the FM in Bedrock. Select a model that supports tools
 MODEL_ID = "us.amazon.nova-pro-v1:0"
 
-# System prompt for the agent
-SYSTEM_PROMPT = '''
-You are an online pet store assistant for staff. Your job is to analyze customer inputs, use the provided external tools and data sources as required, and then respond in json-only format following the schema below. Always maintain a warm and friendly tone in user message and pet advice fields.
-
-# Execution Plan:
-1. Analyze customer input and execute the next two steps (2 and 3) in parallel.
-2-a. Use the get_user_by_id or get_user_by_email tools to identify user details and check if user is a subscribed customer.
-2-b. If the user is a subscribed customer, use the retrieve_pet_care tool if required to find pet caring details.
-3-a. Use the retrieve_product_info tool to identify if we have any related product.
-3-b. For identified products, use the get_inventory tool to find product inventory details.
-4. Generate final response in JSON based on all compiled information.
-
-# Business Rules:
-Don't ask for further information. You always need to generate a final response only. 
-Product identifiers are for internal use and must not appear in customer facing response messages.
-When preparing a customer response, use the customer's first name instead of user id or email address when possible.
-Return Error status with a user-friendly message starting with "We are sorry..." when encountering internal issues - such as system errors or missing data.
-Return Reject status with a user-friendly message starting with "We are sorry..." when requested products are unavailable.
-Return Accept status with appropriate customer message when requested product is available.
-Always avoid revealing technical system details in customer-facing message field when status is Accept, Error, or Reject.
-When an order can cause the remaining inventory to fall below or equal to the reorder level, flag that product for replenishment.
-Orders over $300 qualify for a 15% total discount. In addition, when buying multiple quantities of the same item, customers get 10% off on each additional unit (first item at regular price).
-Shipping charges are determined by order total and item quantity. Orders $75 or above: receive free shipping. Orders under $75 with 2 items or fewer: incur $14.95 flat rate. Orders under $75 with 3 items or more: incur $19.95 flat rate.
-Designate the customer type as Subscribed only when the user exists and maintains an active subscription. For all other cases, assume the customer type as Guest.
-Free pet care advice should only be provided when required to customers with active subscriptions in the allocated field for pet advice.
-For each item included in an order, determine whether to trigger the inventory replenishment flag based on the projected inventory quantities that will remain after the current order is fulfilled.
-
-# Sample 1 Input:
-A new user is asking about the price of Doggy Delights?
-
-# Sample 1 Response:
-{
-    "status": "Accept",
-    "message": "Dear Customer! We offer our 30lb bag of Doggy Delights for just $54.99. This premium grain-free dry dog food features real meat as the first ingredient, ensuring quality nutrition for your furry friend.",
-    "customerType": "Guest",
-    "items": [
-        {
-        "productId": "DD006",
-        "price": 54.99,
-        "quantity": 1,
-        "bundleDiscount": 0,
-        "total": 54.99,
-        "replenishInventory": false
-        }
-    ],
-    "shippingCost": 14.95,
-    "petAdvice": "",
-    "subtotal": 69.94,
-    "additionalDiscount": 0,
-    "total": 69.94
-}
-
-# Sample 2 Input:             
-CustomerId: usr_001
-CustomerRequest: I'm interested in purchasing two water bottles under your bundle deal. Would these bottles also be suitable for bathing my Chihuahua?
-    
-# Sample 2 Response:
-{
-    "status": "Accept",
-    "message": "Hi John, Thank you for your interest! Our Bark Park Buddy bottles are designed for hydration only, not for bathing. For your two-bottle bundle, you'll receive our 10% multi-unit discount as a valued subscriber.",
-    "customerType": "Subscribed",
-    "items": [
-        {
-        "productId": "BP010",
-        "price": 16.99,
-        "quantity": 2,
-        "bundleDiscount": 0.10,
-        "total": 32.28,
-        "replenishInventory": false
-        }
-    ],
-    "shippingCost": 14.95,
-    "petAdvice": "While these bottles are perfect for keeping your Chihuahua hydrated during walks with their convenient fold-out bowls, we recommend using a proper pet bath or sink with appropriate dog shampoo for bathing. The bottles are specifically designed for drinking purposes only.",
-    "subtotal": 32.28,
-    "additionalDiscount": 0,
-    "total": 47.23
-}
-
-# Response Schema:
-{
-  "$schema": "http://json-schema.org/draft-07/schema#",
-  "type": "object",
-  "required": [
-    "status",
-    "message"
-  ],
-  "properties": {
-    "status": {
-      "type": "string",
-      "enum": [
-        "Accept",
-        "Reject",
-        "Error"
-      ]
-    },
-    "message": {
-      "type": "string",
-      "maxLength": 250
-    },
-    "customerType": {
-      "type": "string",
-      "enum": [
-        "Guest",
-        "Subscribed"
-      ]
-    },
-    "items": {
-      "type": "array",
-      "minItems": 1,
-      "items": {
-        "type": "object",
-        "properties": {
-          "productId": {
-            "type": "string"
-          },
-          "price": {
-            "type": "number",
-            "minimum": 0
-          },
-          "quantity": {
-            "type": "integer",
-            "minimum": 1
-          },
-          "bundleDiscount": {
-            "type": "number",
-            "minimum": 0,
-            "maximum": 1
-          },
-          "total": {
-            "type": "number",
-            "minimum": 0
-          },
-          "replenishInventory": {
-            "type": "boolean"
-          }
-        }
-      }
-    },
-    "shippingCost": {
-      "type": "number",
-      "minimum": 0
-    },
-    "petAdvice": {
-      "type": "string",
-      "maxLength": 500
-    },
-    "subtotal": {
-      "type": "number",
-      "minimum": 0
-    },
-    "additionalDiscount": {
-      "type": "number",
-      "minimum": 0,
-      "maximum": 1
-    },
-    "total": {
-      "type": "number",
-      "minimum": 0
-    }
-  }
-}
-'''
+def _bedrock_model(model_id):
+    """Create the Bedrock chat model for a model id."""
+    from langchain_aws import ChatBedrockConverse
+    return ChatBedrockConverse(
+        model=model_id, 
+        region_name = os.environ.get('AWS_REGION', 'us-west-2'),
+        max_tokens = 4096
+    )
+
+def create_agent(model=None, prompt_mode=None, prompt_cache=None, checkpointer=None, model_id=None, mode=None):
+    """
+    Create the agent: the ReAct agent from LangGraph's create_react_agent or, in
+    plan mode, the plan-and-execute graph with the ReAct agent as its fallback.
 
-def create_agent():
-    """Create the ReAct agent using LangGraph's create_react_agent."""
+    Args:
+        model: Optional chat model. Without model: the Bedrock model identified by model_id is used.
+        prompt_mode: Optional system prompt mode, "full" or "compact". Without prompt_mode: PROMPT_MODE is used.
+        prompt_cache: Optional flag to add a Bedrock cache point after the system prompt. Without prompt_cache: PROMPT_CACHE_ENABLED is used.
+        checkpointer: Optional checkpointer persisting conversations by thread_id. Without checkpointer: nothing is persisted.
+            With checkpointer: the agent trims the message window before each model call and shows the
+            prefetched lookups of a run to the model without saving them (see session_store).
+        model_id: Optional Bedrock model id. Without model_id: MODEL_ID is used.
+        mode: Optional agent mode, "react" or "plan". Without mode: AGENT_MODE is used.
+    """
+    # LangGraph, the prompt and tool classes and the Bedrock model load here rather than
+    # at import time, so the process starts quickly and pays for them during warm-up
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    from langchain_core.runnables import RunnableLambda
+    from langchain_core.tools import StructuredTool
+    from langgraph.prebuilt import create_react_agent
+    from plan_execute import AGENT_MODES, agent_mode, create_plan_agent
+    
+    mode = mode or agent_mode()
+    if mode not in AGENT_MODES:
+        raise ValueError(f"Unknown agent mode {mode}; expected one of {', '.join(AGENT_MODES)}")
+    
     # Get environment variables
     product_info_kb_id = os.environ.get('KNOWLEDGE_BASE_1_ID')
     pet_care_kb_id = os.environ.get('KNOWLEDGE_BASE_2_ID')
@@ -203,66 +83,564 @@ def create_agent():
         raise ValueError("Required environment variables SYSTEM_FUNCTION_1_NAME and SYSTEM_FUNCTION_2_NAME must be set")
     
     # Set up the model
-    model = init_chat_model(
-        MODEL_ID, 
-        model_provider="bedrock-converse", 
-        region_name = os.environ.get('AWS_REGION', 'us-west-2'),
-        max_tokens = 4096
-    )
+    if model is None:
+        model = _bedrock_model(model_id or MODEL_ID)
                     
-    # Create the prompt
+    # Create the prompt. With caching on, the system prompt ends in a cache point so
+    # every model turn after the first reads it from the Bedrock prompt cache.
     prompt = ChatPromptTemplate.from_messages([
-        SystemMessage(content = SYSTEM_PROMPT),
+        system_message(prompt_mode, prompt_cache),
         MessagesPlaceholder(variable_name="messages")
     ])
+    if checkpointer is not None:
+        prompt = RunnableLambda(with_session_context) | prompt
     
-    # Define the tools
+    # Define the tools. The coroutine variants are used on the ainvoke path, where
+    # the tool node runs all tool calls from one model turn concurrently.
     tools = [
-        StructuredTool.from_function(func=retrieve_product_info),
-        StructuredTool.from_function(func=retrieve_pet_care),
-        StructuredTool.from_function(func=get_inventory),
-        StructuredTool.from_function(func=get_user_by_id),
-        StructuredTool.from_function(func=get_user_by_email)
+        StructuredTool.from_function(func=retrieve_product_info, coroutine=aretrieve_product_info),
+        StructuredTool.from_function(func=retrieve_pet_care, coroutine=aretrieve_pet_care),
+        StructuredTool.from_function(func=get_inventory, coroutine=aget_inventory),
+        StructuredTool.from_function(func=get_inventory_batch, coroutine=aget_inventory_batch),
+        StructuredTool.from_function(func=get_user_by_id, coroutine=aget_user_by_id),
+        StructuredTool.from_function(func=get_user_by_email, coroutine=aget_user_by_email),
+        StructuredTool.from_function(func=calculate_order)
     ]
     
-    # Create the ReAct agent
+    # Create the ReAct agent. With a checkpointer, the message window of a resumed
+    # conversation is trimmed to its most recent turns before each model call.
     agent_executor = create_react_agent(
         model, 
         tools, 
-        prompt=prompt
+        prompt=prompt,
+        pre_model_hook=trim_history if checkpointer is not None else None,
+        checkpointer=None if mode == "plan" else checkpointer
     )
     
+    # In plan mode the ReAct agent runs as a node of the plan-and-execute graph, which holds the checkpointer
+    if mode == "plan":
+        return create_plan_agent(model, agent_executor, prompt_mode, prompt_cache, checkpointer)
+    
     return agent_executor
 
-def process_request(prompt):
-    """Process a request using the LangGraph agent"""
+# Process-wide compiled agents, one per model tier, shared by all sessions. The
+# compiled graph holds no per-request state (each invocation gets its own
+# thread_id), so it is safe to invoke concurrently once built. Requests with a
+# session id use a strong agent of their own, built with the session checkpointer.
+_agents = {}
+_session_agent = None
+_agent_lock = threading.Lock()
+
+def _tier_model_id(tier):
+    """Return the Bedrock model id of a model tier."""
+    return fast_model_id() if tier == FAST else MODEL_ID
+
+def _agent_config_key(tier=STRONG):
+    """Return the configuration a tier's shared agent is built from."""
+    return (
+        _tier_model_id(tier),
+        os.environ.get('AWS_REGION', 'us-west-2'),
+        os.environ.get('KNOWLEDGE_BASE_1_ID'),
+        os.environ.get('KNOWLEDGE_BASE_2_ID'),
+        os.environ.get('SYSTEM_FUNCTION_1_NAME'),
+        os.environ.get('SYSTEM_FUNCTION_2_NAME'),
+        os.environ.get('PROMPT_MODE'),
+        os.environ.get('PROMPT_CACHE_ENABLED'),
+        os.environ.get('SESSIONS_ENABLED'),
+        os.environ.get('AGENT_MODE'),
+    )
+
+def get_agent(tier=STRONG):
+    """Return the shared agent of a model tier, building it on first use or when the configuration has changed."""
+    config = _agent_config_key(tier)
+    entry = _agents.get(tier)
+    if entry is not None and entry[0] == config:
+        return entry[1]
+
+    with _agent_lock:
+        entry = _agents.get(tier)
+        if entry is None or entry[0] != config:
+            logger.info(f"Building shared {tier} agent")
+            model = _bedrock_model(_tier_model_id(tier))
+            if tier == STRONG:
+                # Final responses that fail schema validation and local repair are re-asked to the strong model
+                set_reask_model(model)
+            entry = (config, create_agent(model=model))
+            _agents[tier] = entry
+        return entry[1]
+
+def get_session_agent():
+    """Return the shared strong agent of session requests, built with the session checkpointer on first use or when the configuration has changed."""
+    global _session_agent
+
+    config = _agent_config_key()
+    entry = _session_agent
+    if entry is not None and entry[0] == config:
+        return entry[1]
+
+    with _agent_lock:
+        if _session_agent is None or _session_agent[0] != config:
+            logger.info("Building shared session agent")
+            model = _bedrock_model(MODEL_ID)
+            set_reask_model(model)
+            _session_agent = (config, create_agent(model=model, checkpointer=get_checkpointer()))
+        return _session_agent[1]
+
+def set_agent(agent, tier=None):
+    """Install a prebuilt agent (e.g. one with a stand-in model) as the shared agent of a tier. Without tier: of every tier."""
+    with _agent_lock:
+        for name in ([tier] if tier else TIERS):
+            _agents[name] = (_agent_config_key(name), agent)
+
+def set_session_agent(agent):
+    """Install a prebuilt agent as the agent of session requests; build it with checkpointer=get_checkpointer()."""
+    global _session_agent
+
+    with _agent_lock:
+        _session_agent = (_agent_config_key(), agent)
+
+def reset_agent():
+    """Drop the shared agents so that the next request rebuilds them."""
+    global _session_agent
+
+    with _agent_lock:
+        _agents.clear()
+        _session_agent = None
+
+def warm_up():
+    """
+    Build the shared agents and the AWS clients ahead of the first request.
+
+    LangGraph, the Bedrock model, boto3 and the product index are loaded here rather
+    than on import, so entrypoints decide when that cost is paid.
+    """
     try:
-        # Create the agent
-        agent = create_agent()
-        
-        # Initialize with the user's message
-        messages = [HumanMessage(content=prompt)]
-        
-        # Generate a unique thread ID for this conversation
-        thread_id = f"thread-{os.urandom(8).hex()}"
-        
-        # Invoke the agent
-        response = agent.invoke(
-            {"messages": messages},
-            {"configurable": {"thread_id": thread_id}}
-        )
-        
-        # Extract the final AI message
-        ai_messages = [msg for msg in response["messages"] if isinstance(msg, AIMessage)]
-        final_response = ai_messages[-1].content if ai_messages else "No response generated."
-        
-        return final_response
-        
+        started = time.monotonic()
+        get_agent()
+        if router_enabled():
+            get_agent(FAST)
+        if sessions_enabled():
+            get_session_agent()
+        warm_up_clients()
+        get_index()
+        logger.info(f"Agent warm-up done in {(time.monotonic() - started) * 1000:.0f} ms")
+        return True
     except Exception as e:
-        error_message = str(e)
-        logger.error(f"Error processing request: {error_message}")
-        
-        return json.dumps({
-            "status": "Error",
-            "message": "We are sorry for the technical difficulties we are currently facing. We will get back to you with an update once the issue is resolved."
-        })
\ No newline at end of file
+        logger.error(f"Agent warm-up failed: {str(e)}")
+        return False
+
+def _new_thread_config(thread_id=None):
+    """Build the run config for a conversation, with model and node instrumentation. Without thread_id: a unique one is generated."""
+    thread_id = thread_id or f"thread-{os.urandom(8).hex()}"
+    return {"configurable": {"thread_id": thread_id}, "callbacks": [TelemetryCallbackHandler()]}
+
+def _agent_for(session_id, tier=STRONG):
+    """
+    Return the agent, run config and run options for a request on a model tier.
+
+    With a session id (and sessions enabled), the conversation stored under it is
+    resumed on the strong tier and the state is saved once when the run ends.
+    """
+    if session_id is None or not sessions_enabled():
+        return get_agent(tier), _new_thread_config(), {}
+    thread_id = f"session-{validate_session_id(session_id)}"
+    config = _new_thread_config(thread_id)
+    config["configurable"][SESSION_CONTEXT_KEY] = []
+    return get_session_agent(), config, {"durability": "exit"}
+
+def _run_input(messages, config):
+    """
+    Return the graph input of a run. A session run starts from the request alone:
+    its prefetched lookups go in the run config, so they are not saved in the session.
+    """
+    if SESSION_CONTEXT_KEY in config["configurable"]:
+        config["configurable"][SESSION_CONTEXT_KEY] = messages[1:]
+        return {"messages": messages[:1]}
+    return {"messages": messages}
+
+def _final_response(response):
+    """Extract the final AI message content from an agent response."""
+    ai_messages = [msg for msg in response["messages"] if isinstance(msg, AIMessage)]
+    return ai_messages[-1].content if ai_messages else "No response generated."
+
+# Answer create_react_agent gives when the recursion limit is reached before the model is done
+_OUT_OF_STEPS = "Sorry, need more steps"
+
+def _with_deadline(config, deadline):
+    """Charge model and tool time to the deadline and limit graph steps to the model turns that fit in it."""
+    config["callbacks"].append(DeadlineCallbackHandler(deadline))
+    config["recursion_limit"] = deadline.recursion_limit()
+    return config
+
+def _answer(update, deadline):
+    """Return the final answer carried by a graph update, or None if the agent is not done."""
+    for node_update in (update or {}).values():
+        messages = node_update.get("messages", []) if isinstance(node_update, dict) else []
+        msg = next((msg for msg in reversed(messages) if isinstance(msg, AIMessage)), None)
+        if msg is None or msg.tool_calls:
+            continue
+        if isinstance(msg.content, str) and msg.content.startswith(_OUT_OF_STEPS):
+            deadline.stopped = "recursion_limit"
+            return None
+        return msg.content
+    return None
+
+def _best_response(answer, deadline):
+    """The agent's answer, or the schema-valid Error response when it was stopped before answering."""
+    if answer is not None:
+        return answer
+    if deadline.stopped:
+        logger.warning(f"Request stopped ({deadline.stopped}) with {deadline.remaining() * 1000:.0f} ms left")
+        return ERROR_RESPONSE
+    return "No response generated."
+
+def _recursion_limit_reached(error, deadline, answer):
+    """Whether error is a graph running out of steps; without an answer yet, the request stops as on recursion_limit."""
+    # LangGraph has been loaded by the time an agent runs
+    from langgraph.errors import GraphRecursionError
+    if not isinstance(error, GraphRecursionError):
+        return False
+    if answer is None:
+        deadline.stopped = "recursion_limit"
+    return True
+
+def _reask_allowed(answer, deadline):
+    """Re-ask the model for a valid response only for a real answer, with time and usage budget left for one more model call."""
+    return answer is not None and not deadline.stopped and deadline.stop_reason() is None
+
+async def _bounded(events, deadline):
+    """Yield from an async iterator until the deadline leaves only the answer margin."""
+    iterator = events.__aiter__()
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(iterator.__anext__(), timeout=max(0.0, deadline.answer_by()))
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                deadline.stopped = "deadline"
+                return
+            yield item
+    finally:
+        await iterator.aclose()
+
+def _run(agent, messages, config, options, deadline):
+    """Run the agent step by step, stopping before a model turn the time or usage budgets cannot cover. Returns the final answer, or None."""
+    answer = None
+    deadline.stopped = deadline.stop_reason()
+    if deadline.stopped:
+        return None
+    try:
+        for update in agent.stream(
+            _run_input(messages, config),
+            _with_deadline(config, deadline),
+            stream_mode="updates",
+            **options
+        ):
+            answer = _answer(update, deadline) or answer
+            if answer is None and not deadline.stopped:
+                deadline.stopped = deadline.stop_reason()
+                if deadline.stopped:
+                    break
+    except Exception as e:
+        if not _recursion_limit_reached(e, deadline, answer):
+            raise
+    return answer
+
+async def _arun(agent, messages, config, options, deadline):
+    """Async variant of _run; tool calls from the same model turn run concurrently."""
+    answer = None
+    deadline.stopped = deadline.stop_reason()
+    if deadline.stopped:
+        return None
+    updates = agent.astream(
+        _run_input(messages, config),
+        _with_deadline(config, deadline),
+        stream_mode="updates",
+        **options
+    )
+    try:
+        async for update in _bounded(updates, deadline):
+            answer = _answer(update, deadline) or answer
+            if answer is None and not deadline.stopped:
+                deadline.stopped = deadline.stop_reason()
+                if deadline.stopped:
+                    break
+    except Exception as e:
+        if not _recursion_limit_reached(e, deadline, answer):
+            raise
+    return answer
+
+def _record_tier_run(tier, deadline, started, tokens):
+    """Record an agent run in the router metrics: its duration and the tokens used since tokens was taken."""
+    record_run(
+        tier,
+        time.monotonic() - started,
+        deadline.tokens["input"] - tokens["input"],
+        deadline.tokens["output"] - tokens["output"]
+    )
+
+def _escalate(tier, validation, deadline):
+    """Whether to run the request again on the strong tier: a fast-tier answer failed validation and a model turn still fits."""
+    if tier != FAST or validation["outcome"] != "failed" or deadline.stop_reason() is not None:
+        return False
+    logger.info("Escalating request to the strong model tier")
+    record_escalation()
+    return True
+
+def _request_metadata(deadline, validation, cache, tier, features, escalated):
+    """Build the request metadata and emit the request's usage as metrics."""
+    budget = deadline.metadata()
+    usage = usage_report(deadline)
+    record_usage(usage, budget["elapsed_ms"], tier=tier, cache=cache, stopped=deadline.stopped)
+    return {
+        "deadline": budget,
+        "validation": validation,
+        "cache": cache,
+        "route": {"tier": tier, "features": features, "escalated": escalated},
+        "usage": usage,
+    }
+
+def handle_request(prompt, session_id=None, deadline_ms=None, use_cache=True):
+    """
+    Process a request using the LangGraph agent within a deadline.
+
+    Args:
+        prompt: The customer request.
+        session_id: Optional session id whose conversation is continued.
+        deadline_ms: Optional time budget in milliseconds. Without deadline_ms: REQUEST_DEADLINE_SECONDS is used.
+        use_cache: Whether a guest request may be answered from the response cache.
+
+    Returns:
+        Dictionary with "response" (the same string process_request returns) and
+        "metadata" with the budget report under "deadline", the response schema
+        check (outcome, repairs) under "validation", the response cache outcome
+        ("hit", "miss", "stale" or "bypass") under "cache", the model tier the
+        request was routed to (tier, features, escalated) under "route" and the
+        model turns, tool calls, tokens and estimated cost under "usage".
+
+    Model turns stop when the remaining time or a usage budget (model turns, tool
+    calls, tokens, cost) no longer covers one, and the agent then answers with the
+    schema-valid Error response. A fast-tier answer that fails
+    validation is escalated: the request runs again on the strong tier.
+    """
+    deadline = Deadline.from_budget_ms(deadline_ms)
+    tier, features = route(prompt, session_id)
+    escalated = False
+    with deadline_scope(deadline), track_inventory_reads() as inventory_reads:
+        validation = None
+        cache_key, cache, response = None, "bypass", None
+        try:
+            # Get the shared agent of the routed tier
+            agent, config, options = _agent_for(session_id, tier)
+            
+            # Initialize with the user's message and the prefetched user and product lookups
+            started = time.monotonic()
+            messages = [HumanMessage(content=prompt)] + prefetch_messages(prompt)
+            deadline.add("prefetch", time.monotonic() - started)
+            
+            # Answer repeated guest questions from the response cache
+            if cacheable(prompt, session_id, use_cache):
+                cache_key, cache, response = lookup_response(prompt, messages)
+            
+            while response is None:
+                # Run the agent step by step, stopping before a model turn the budget cannot cover
+                started, tokens = time.monotonic(), dict(deadline.tokens)
+                answer = _run(agent, messages, config, options, deadline)
+                _record_tier_run(tier, deadline, started, tokens)
+                
+                # Validate the answer against the response schema, repairing it if needed.
+                # Only the strong tier is re-asked; the fast tier escalates instead.
+                response, validation = validated_response(_best_response(answer, deadline), tier == STRONG and _reask_allowed(answer, deadline))
+                if _escalate(tier, validation, deadline):
+                    tier, escalated, response = STRONG, True, None
+                    agent, config, options = _agent_for(session_id, tier)
+                else:
+                    store_response(cache_key, response, inventory_reads)
+            
+        except Exception as e:
+            error_message = str(e)
+            logger.error(f"Error processing request: {error_message}")
+            
+            response = ERROR_RESPONSE
+    
+    return {"response": response, "metadata": _request_metadata(deadline, validation, cache, tier, features, escalated)}
+
+async def ahandle_request(prompt, session_id=None, deadline_ms=None, use_cache=True):
+    """
+    Async variant of handle_request. The deadline also bounds the model call in
+    flight: the run is cancelled when only the answer margin is left.
+    """
+    deadline = Deadline.from_budget_ms(deadline_ms)
+    tier, features = route(prompt, session_id)
+    escalated = False
+    with deadline_scope(deadline), track_inventory_reads() as inventory_reads:
+        validation = None
+        cache_key, cache, response = None, "bypass", None
+        try:
+            # Get the shared agent of the routed tier
+            agent, config, options = _agent_for(session_id, tier)
+            
+            # Initialize with the user's message and the prefetched user and product lookups
+            started = time.monotonic()
+            messages = [HumanMessage(content=prompt)] + await aprefetch_messages(prompt)
+            deadline.add("prefetch", time.monotonic() - started)
+            
+            # Answer repeated guest questions from the response cache
+            if cacheable(prompt, session_id, use_cache):
+                cache_key, cache, response = await alookup_response(prompt, messages)
+            
+            while response is None:
+                # Run the agent step by step; tool calls from the same model turn run concurrently
+                started, tokens = time.monotonic(), dict(deadline.tokens)
+                answer = await _arun(agent, messages, config, options, deadline)
+                _record_tier_run(tier, deadline, started, tokens)
+                
+                # Validate the answer against the response schema, repairing it if needed.
+                # Only the strong tier is re-asked; the fast tier escalates instead.
+                response, validation = await avalidated_response(_best_response(answer, deadline), tier == STRONG and _reask_allowed(answer, deadline))
+                if _escalate(tier, validation, deadline):
+                    tier, escalated, response = STRONG, True, None
+                    agent, config, options = _agent_for(session_id, tier)
+                else:
+                    store_response(cache_key, response, inventory_reads)
+            
+        except Exception as e:
+            error_message = str(e)
+            logger.error(f"Error processing request: {error_message}")
+            
+            response = ERROR_RESPONSE
+    
+    return {"response": response, "metadata": _request_metadata(deadline, validation, cache, tier, features, escalated)}
+
+def process_request(prompt, session_id=None, deadline_ms=None, use_cache=True):
+    """Process a request using the LangGraph agent, continuing session_id's conversation when given"""
+    return handle_request(prompt, session_id, deadline_ms, use_cache)["response"]
+
+async def aprocess_request(prompt, session_id=None, deadline_ms=None, use_cache=True):
+    """Process a request using the LangGraph agent on the async path, continuing session_id's conversation when given"""
+    return (await ahandle_request(prompt, session_id, deadline_ms, use_cache))["response"]
+
+def _text_delta(chunk):
+    """Return the text carried by a streamed model chunk."""
+    content = getattr(chunk, "content", "")
+    if isinstance(content, str):
+        return content
+    return "".join(
+        block.get("text", "") for block in content
+        if isinstance(block, dict) and block.get("type", "text") == "text"
+    )
+
+async def _astream_run(agent, messages, config, options, deadline, run):
+    """Run the agent and yield its progress events; the final answer, or None, is left in run["answer"]."""
+    tool_starts = {}
+    turn = 0
+    answer = None
+    
+    events = agent.astream_events(
+        _run_input(messages, config),
+        _with_deadline(config, deadline),
+        version="v2",
+        **options
+    )
+    try:
+        async for event in _bounded(events, deadline):
+            kind = event["event"]
+            if kind == "on_chat_model_start":
+                # Stop before a model turn the remaining budget cannot cover
+                if not deadline.can_start_model_turn():
+                    deadline.stopped = "deadline"
+                    break
+                turn += 1
+            elif kind == "on_chat_model_stream" and "nostream" not in event.get("tags", []):
+                text = _text_delta(event["data"].get("chunk"))
+                if text:
+                    yield {"event": "model_delta", "turn": turn, "text": text}
+            elif kind == "on_tool_start":
+                tool_starts[event["run_id"]] = time.perf_counter()
+                yield {"event": "tool_start", "tool": event["name"], "input": event["data"].get("input")}
+            elif kind == "on_tool_end":
+                started = tool_starts.pop(event["run_id"], None)
+                duration_ms = round((time.perf_counter() - started) * 1000, 1) if started else None
+                yield {"event": "tool_end", "tool": event["name"], "duration_ms": duration_ms}
+            elif kind == "on_chain_end" and len(event.get("parent_ids", [])) <= 1:
+                # Output of the graph or one of its nodes; the last final AI message is the answer
+                output = event["data"].get("output")
+                if isinstance(output, dict):
+                    answer = _answer({event["name"]: output}, deadline) or answer
+                # Stop between steps once a usage budget leaves no room for another model turn
+                if answer is None and not deadline.stopped:
+                    deadline.stopped = deadline.usage_budget.exceeded(deadline)
+                    if deadline.stopped:
+                        break
+    except Exception as e:
+        if not _recursion_limit_reached(e, deadline, answer):
+            raise
+    
+    run["answer"] = answer
+
+async def astream_request(prompt, session_id=None, deadline_ms=None, use_cache=True):
+    """
+    Process a request using the LangGraph agent and stream progress events,
+    continuing session_id's conversation when given.
+
+    Yields dictionaries in order:
+        {"event": "start"}
+        {"event": "prefetch", "tools": [...]}                (lookups run before the first model turn)
+        {"event": "tool_start", "tool": name, "input": {...}}
+        {"event": "tool_end", "tool": name, "duration_ms": ...}
+        {"event": "model_delta", "turn": n, "text": "..."}   (model text as it is generated)
+        {"event": "escalate", "tier": "strong"}              (the fast tier's answer failed validation; the run starts over)
+        {"event": "final", "response": "...", "metadata": {...}}  (the same as handle_request returns)
+
+    Text from a turn that ends in tool calls, or from a run that was escalated, is
+    not part of the final response. A guest request answered from the response
+    cache goes straight to "final".
+    """
+    yield {"event": "start"}
+    
+    deadline = Deadline.from_budget_ms(deadline_ms)
+    tier, features = route(prompt, session_id)
+    escalated = False
+    validation = None
+    cache_key, cache, final_response = None, "bypass", None
+    with deadline_scope(deadline), track_inventory_reads() as inventory_reads:
+        try:
+            # Get the shared agent of the routed tier
+            agent, config, options = _agent_for(session_id, tier)
+            
+            # Initialize with the user's message and the prefetched user and product lookups
+            started = time.monotonic()
+            messages = [HumanMessage(content=prompt)] + await aprefetch_messages(prompt)
+            deadline.add("prefetch", time.monotonic() - started)
+            prefetched = [call["name"] for msg in messages if isinstance(msg, AIMessage) for call in msg.tool_calls]
+            if prefetched:
+                yield {"event": "prefetch", "tools": prefetched}
+            
+            # Answer repeated guest questions from the response cache
+            if cacheable(prompt, session_id, use_cache):
+                cache_key, cache, final_response = await alookup_response(prompt, messages)
+            
+            while final_response is None:
+                run = {}
+                started, tokens = time.monotonic(), dict(deadline.tokens)
+                async for event in _astream_run(agent, messages, config, options, deadline, run):
+                    yield event
+                _record_tier_run(tier, deadline, started, tokens)
+                
+                answer = run.get("answer")
+                final_response, validation = await avalidated_response(_best_response(answer, deadline), tier == STRONG and _reask_allowed(answer, deadline))
+                if _escalate(tier, validation, deadline):
+                    tier, escalated, final_response = STRONG, True, None
+                    agent, config, options = _agent_for(session_id, tier)
+                    yield {"event": "escalate", "tier": tier}
+                else:
+                    store_response(cache_key, final_response, inventory_reads)
+            
+        except Exception as e:
+            error_message = str(e)
+            logger.error(f"Error processing request: {error_message}")
+            
+            final_response = ERROR_RESPONSE
+    
+    yield {"event": "final", "response": final_response, "metadata": _request_metadata(deadline, validation, cache, tier, features, escalated)}
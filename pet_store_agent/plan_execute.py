@@ -0,0 +1,330 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Plan-and-execute agent: the execution plan from SYSTEM_PROMPT as an explicit graph.
+
+The ReAct agent pays a model round trip for every tool hop, although the plan is
+fixed. This graph runs the plan's lookups as deterministic nodes and calls the
+model twice, once to extract the order and once to write the response:
+
+    START -> user, products                 (parallel; prefetched results are reused)
+          -> extract                        (model call: products, quantities, pet care question)
+          -> inventory, pet_care            (parallel; pet care only for subscribed customers)
+          -> synthesize                     (order priced with pricing.price_order, model call writes the JSON response)
+
+When the extraction answer cannot be parsed, the request is handed to the ReAct
+agent, which runs as the graph's fallback node from the messages so far.
+
+Configuration is read from the environment:
+    AGENT_MODE  "react" (default) or "plan"
+"""
+
+import os
+import re
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from typing_extensions import Annotated, TypedDict
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import END, START, StateGraph, add_messages
+
+from inventory_management import get_inventory_batch
+from prefetch import extract_identifiers
+from pricing import price_order
+from prompts import system_message
+from retrieve_pet_care import retrieve_pet_care
+from retrieve_product_info import retrieve_product_info
+from session_store import SESSION_CONTEXT_KEY, trim_history
+from telemetry import is_tool_error
+from user_management import get_user_by_id, get_user_by_email
+
+logger = logging.getLogger(__name__)
+
+AGENT_MODES = ("react", "plan")
+
+# Instructions for the extraction model call
+EXTRACTION_PROMPT = '''
+You extract order details for an online pet store. From the customer request and the product information found for it, identify the products the customer asks about and respond in json-only format:
+{"items": [{"productId": "...", "name": "...", "price": 0.0, "quantity": 1}], "petCareQuestion": "..."}
+
+# Rules:
+Only include products from the product information, with their product identifier and unit price as listed there.
+quantity is the number of units the customer asks for, 1 when not stated.
+items is empty when no listed product matches the request.
+petCareQuestion is the customer's question about caring for their pet, or "" when there is none.
+'''
+
+# Header of the lookup results appended to the request for the synthesis model call
+FACTS_HEADER = "# Lookup Results:"
+
+SYNTHESIS_INSTRUCTIONS = (
+    "The lookups of the execution plan are done and their results follow. Do not call tools. "
+    "Generate the final response in JSON from them, following the business rules, and copy the "
+    "order figures into the response exactly."
+)
+
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+_USER_TOOLS = ("get_user_by_id", "get_user_by_email")
+
+
+class PlanState(TypedDict, total=False):
+    """Graph state: the conversation, plus the lookups of the request being answered."""
+    messages: Annotated[List[BaseMessage], add_messages]
+    user: Optional[str]
+    product_info: str
+    entities: Optional[Dict[str, Any]]
+    inventory: Dict[str, Any]
+    pet_care: str
+
+
+def agent_mode() -> str:
+    """Return the configured agent mode."""
+    mode = os.environ.get('AGENT_MODE', 'react').strip().lower()
+    return mode if mode in AGENT_MODES else "react"
+
+
+def _split(messages: List[BaseMessage]):
+    """Split the conversation into the messages before the latest request, the request text and the messages after it."""
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            content = messages[i].content
+            return messages[:i], content if isinstance(content, str) else str(content), messages[i + 1:]
+    return [], "", list(messages)
+
+
+def _current_turn(state: PlanState, config) -> Tuple[str, List[BaseMessage]]:
+    """Return the request text and the messages of its turn, with the lookups prefetched for a session run."""
+    _, request, turn = _split(state["messages"])
+    context = ((config or {}).get("configurable") or {}).get(SESSION_CONTEXT_KEY) or []
+    return request, list(context) + turn
+
+
+def _prefetched(turn: List[BaseMessage], names) -> Optional[str]:
+    """Return the result of a lookup already run for the request (see prefetch.py), if any."""
+    return next((msg.content for msg in turn if isinstance(msg, ToolMessage) and msg.name in names), None)
+
+
+def _parse_json(text: Any) -> Any:
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def _failed(result: Any) -> bool:
+    return not isinstance(result, str) or is_tool_error(result)
+
+
+def lookup_user(state: PlanState, config) -> Dict[str, Any]:
+    """Step 2-a: look up the customer named in the request; None for guests."""
+    request, turn = _current_turn(state, config)
+    user = _prefetched(turn, _USER_TOOLS)
+    if user is None:
+        identifiers = extract_identifiers(request)
+        if identifiers["user_id"]:
+            user = get_user_by_id(identifiers["user_id"])
+        elif identifiers["user_email"]:
+            user = get_user_by_email(identifiers["user_email"])
+    return {"user": user}
+
+
+def lookup_products(state: PlanState, config) -> Dict[str, Any]:
+    """Step 3-a: search the product catalog for the request."""
+    request, turn = _current_turn(state, config)
+    products = _prefetched(turn, ("retrieve_product_info",))
+    if products is None:
+        query = extract_identifiers(request)["query"]
+        products = retrieve_product_info(query) if query else ""
+    return {"product_info": products}
+
+
+def _extraction_messages(state: PlanState) -> List[BaseMessage]:
+    _, request, _ = _split(state["messages"])
+    product_info = state.get("product_info") or "No products found."
+    return [
+        SystemMessage(content=EXTRACTION_PROMPT),
+        HumanMessage(content=f"Customer request:\n{request}\n\nProduct information:\n{product_info}"),
+    ]
+
+
+def parse_entities(message: BaseMessage) -> Optional[Dict[str, Any]]:
+    """
+    Parse the extraction model's answer.
+
+    Returns:
+        Dictionary with items (productId, name, price, quantity) and petCareQuestion,
+        or None when the answer is not the expected JSON.
+    """
+    content = message.content if isinstance(message.content, str) else "".join(
+        block.get("text", "") for block in message.content if isinstance(block, dict)
+    )
+    match = _JSON_OBJECT.search(content)
+    data = _parse_json(match.group(0)) if match else None
+    if not isinstance(data, dict) or not isinstance(data.get("items"), list):
+        return None
+
+    items = []
+    for item in data["items"]:
+        if not isinstance(item, dict) or not item.get("productId"):
+            continue
+        try:
+            price = float(item["price"]) if item.get("price") is not None else None
+            quantity = max(1, int(item.get("quantity") or 1))
+        except (TypeError, ValueError):
+            return None
+        items.append({"productId": str(item["productId"]), "name": item.get("name"), "price": price, "quantity": quantity})
+    question = data.get("petCareQuestion")
+    return {"items": items, "petCareQuestion": question.strip() if isinstance(question, str) else ""}
+
+
+def _after_extract(state: PlanState):
+    """Continue the plan, or fall back to the ReAct agent when the extraction failed."""
+    if state.get("entities") is None:
+        logger.warning("Entity extraction failed, falling back to the ReAct agent")
+        return "react"
+    return ["inventory", "pet_care"]
+
+
+def _subscribed(user: Optional[str]) -> bool:
+    record = None if _failed(user) else _parse_json(user)
+    return isinstance(record, dict) and record.get("subscription_status") == "active"
+
+
+def check_inventory(state: PlanState) -> Dict[str, Any]:
+    """Step 3-b: read the inventory of the extracted products in one batch."""
+    codes = [item["productId"] for item in state["entities"]["items"]]
+    if not codes:
+        return {"inventory": {}}
+    result = get_inventory_batch(codes)
+    inventory = None if _failed(result) else _parse_json(result)
+    return {"inventory": inventory if isinstance(inventory, dict) else {"error": result}}
+
+
+def find_pet_care(state: PlanState) -> Dict[str, Any]:
+    """Step 2-b: retrieve pet care advice for subscribed customers who asked for it."""
+    question = state["entities"]["petCareQuestion"]
+    if not question or not _subscribed(state.get("user")):
+        return {"pet_care": ""}
+    return {"pet_care": retrieve_pet_care(question)}
+
+
+def _order(entities: Dict[str, Any], inventory: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Step 4: price the extracted products that are in stock."""
+    items = []
+    for item in entities["items"]:
+        record = inventory.get(item["productId"])
+        if item["price"] is None or not isinstance(record, dict) or "error" in record:
+            continue
+        if not isinstance(record.get("quantity"), (int, float)) or record["quantity"] <= 0:
+            continue
+        items.append({
+            "productId": item["productId"],
+            "price": item["price"],
+            "quantity": item["quantity"],
+            "inventoryQuantity": record["quantity"],
+            "reorderLevel": record.get("reorder_level"),
+        })
+    return price_order(items) if items else None
+
+
+def _customer(user: Optional[str]) -> Dict[str, Any]:
+    if user is None:
+        return {"customerType": "Guest"}
+    record = None if _failed(user) else _parse_json(user)
+    if not isinstance(record, dict):
+        return {"customerType": "Guest", "lookupError": user}
+    if "error" in record:
+        # Unknown customers are served as guests
+        return {"customerType": "Guest", "found": False}
+    first_name = (record.get("name") or "").split()
+    return {
+        "customerType": "Subscribed" if _subscribed(user) else "Guest",
+        "firstName": first_name[0] if first_name else None,
+    }
+
+
+def lookup_facts(state: PlanState) -> Dict[str, Any]:
+    """Compile the lookup results the response is written from."""
+    entities = state["entities"]
+    inventory = state.get("inventory") or {}
+    return {
+        "customer": _customer(state.get("user")),
+        "productInfo": state.get("product_info") or "",
+        "requestedItems": entities["items"],
+        "inventory": inventory,
+        "order": _order(entities, inventory),
+        "petCare": state.get("pet_care") or "",
+    }
+
+
+def _synthesis_messages(state: PlanState, prompt_mode, prompt_cache, trim: bool):
+    """
+    Build the synthesis model input and, with trim, the state update that trims a session's history.
+
+    Earlier turns are passed as their requests and answers only: without tools
+    bound, the model input cannot carry tool calls.
+    """
+    trimmed = trim_history(state).get("messages", []) if trim else []
+    history, request, _ = _split(trimmed[1:] if trimmed else state["messages"])
+    history = [
+        msg for msg in history
+        if isinstance(msg, HumanMessage) or (isinstance(msg, AIMessage) and not msg.tool_calls and msg.content)
+    ]
+    facts = json.dumps(lookup_facts(state), indent=1)
+    messages = [system_message(prompt_mode, prompt_cache)] + history + [
+        HumanMessage(content=f"{request}\n\n{SYNTHESIS_INSTRUCTIONS}\n\n{FACTS_HEADER}\n{facts}")
+    ]
+    return messages, trimmed
+
+
+def create_plan_agent(model, react_agent, prompt_mode=None, prompt_cache=None, checkpointer=None):
+    """
+    Create the plan-and-execute agent.
+
+    Args:
+        model: Chat model for the extraction and synthesis calls.
+        react_agent: Compiled ReAct agent used as the fallback node.
+        prompt_mode: Optional system prompt mode for the synthesis call. Without prompt_mode: PROMPT_MODE is used.
+        prompt_cache: Optional flag to add a Bedrock cache point after the system prompt. Without prompt_cache: PROMPT_CACHE_ENABLED is used.
+        checkpointer: Optional checkpointer persisting conversations by thread_id. Without checkpointer: nothing is persisted.
+            With checkpointer: the synthesis step trims the message window of the conversation.
+    """
+    trim = checkpointer is not None
+    # The extraction answer is internal, so it is kept out of streamed model text
+    extractor = model.with_config(tags=["nostream"])
+
+    def extract(state: PlanState, config) -> Dict[str, Any]:
+        return {"entities": parse_entities(extractor.invoke(_extraction_messages(state), config))}
+
+    async def aextract(state: PlanState, config) -> Dict[str, Any]:
+        return {"entities": parse_entities(await extractor.ainvoke(_extraction_messages(state), config))}
+
+    def synthesize(state: PlanState, config) -> Dict[str, Any]:
+        messages, trimmed = _synthesis_messages(state, prompt_mode, prompt_cache, trim)
+        return {"messages": trimmed + [model.invoke(messages, config)]}
+
+    async def asynthesize(state: PlanState, config) -> Dict[str, Any]:
+        messages, trimmed = _synthesis_messages(state, prompt_mode, prompt_cache, trim)
+        return {"messages": trimmed + [await model.ainvoke(messages, config)]}
+
+    graph = StateGraph(PlanState)
+    graph.add_node("user", lookup_user)
+    graph.add_node("products", lookup_products)
+    graph.add_node("extract", RunnableLambda(extract, afunc=aextract, name="extract"))
+    graph.add_node("inventory", check_inventory)
+    graph.add_node("pet_care", find_pet_care)
+    graph.add_node("synthesize", RunnableLambda(synthesize, afunc=asynthesize, name="synthesize"))
+    graph.add_node("react", react_agent)
+
+    graph.add_edge(START, "user")
+    graph.add_edge(START, "products")
+    graph.add_edge(["user", "products"], "extract")
+    graph.add_conditional_edges("extract", _after_extract, ["inventory", "pet_care", "react"])
+    graph.add_edge(["inventory", "pet_care"], "synthesize")
+    graph.add_edge("synthesize", END)
+    graph.add_edge("react", END)
+
+    return graph.compile(checkpointer=checkpointer)
@@ -0,0 +1,123 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Speculative prefetch of user and product context before the first model turn.
+
+Step 2-a and 3-a of the execution plan are almost always the same: look up the
+customer named in the request and search the product catalog for the request
+text. This stage extracts the customer id or email with cheap parsers, runs those
+lookups concurrently, and returns them as a pre-seeded tool-call turn, so the
+model starts from step 2-b/3-b instead of spending a round trip deciding on them.
+
+Configuration is read from the environment:
+    PREFETCH_ENABLED  run the prefetch stage (default true)
+"""
+
+import os
+import re
+import asyncio
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+
+from config import env_flag
+from retrieve_product_info import retrieve_product_info
+from user_management import get_user_by_id, get_user_by_email
+
+logger = logging.getLogger(__name__)
+
+_CUSTOMER_ID = re.compile(r"\b(usr_[A-Za-z0-9]+)\b")
+_EMAIL = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
+_CUSTOMER_REQUEST = re.compile(r"CustomerRequest:\s*(.+)", re.DOTALL | re.IGNORECASE)
+
+_TOOLS = {
+    "get_user_by_id": get_user_by_id,
+    "get_user_by_email": get_user_by_email,
+    "retrieve_product_info": retrieve_product_info,
+}
+
+
+def prefetch_enabled() -> bool:
+    return env_flag('PREFETCH_ENABLED')
+
+
+def extract_identifiers(prompt: str) -> Dict[str, Optional[str]]:
+    """Return the customer id, customer email and product query found in a request."""
+    customer_id = _CUSTOMER_ID.search(prompt)
+    email = _EMAIL.search(prompt)
+    request = _CUSTOMER_REQUEST.search(prompt)
+    return {
+        "user_id": customer_id.group(1) if customer_id else None,
+        "user_email": email.group(0) if email else None,
+        "query": (request.group(1) if request else prompt).strip() or None,
+    }
+
+
+def plan_prefetch(prompt: str) -> List[Dict[str, Any]]:
+    """Build the tool calls to run before the first model turn."""
+    identifiers = extract_identifiers(prompt)
+    calls = []
+    if identifiers["user_id"]:
+        calls.append({"name": "get_user_by_id", "args": {"user_id": identifiers["user_id"]}})
+    elif identifiers["user_email"]:
+        calls.append({"name": "get_user_by_email", "args": {"user_email": identifiers["user_email"]}})
+    if identifiers["query"]:
+        calls.append({"name": "retrieve_product_info", "args": {"text": identifiers["query"]}})
+
+    for i, call in enumerate(calls):
+        call["id"] = f"prefetch_{os.urandom(4).hex()}_{i}"
+        call["type"] = "tool_call"
+    return calls
+
+
+def _as_messages(calls: List[Dict[str, Any]], results: List[str]) -> List[BaseMessage]:
+    """Render prefetched calls as the assistant tool-call turn and its tool results."""
+    messages: List[BaseMessage] = [AIMessage(content="", tool_calls=calls)]
+    for call, result in zip(calls, results):
+        messages.append(ToolMessage(content=result, tool_call_id=call["id"], name=call["name"]))
+    return messages
+
+
+def prefetch_messages(prompt: str) -> List[BaseMessage]:
+    """
+    Run the prefetch lookups concurrently.
+
+    Returns:
+        Messages to append after the user's message: one AIMessage with the tool
+        calls followed by one ToolMessage per call, or [] when prefetch is disabled
+        or there is nothing to look up.
+    """
+    if not prefetch_enabled():
+        return []
+    calls = plan_prefetch(prompt)
+    if not calls:
+        return []
+
+    logger.info(f"Prefetching {[call['name'] for call in calls]}")
+    with ThreadPoolExecutor(max_workers=len(calls)) as executor:
+        # Each lookup runs in a copy of the caller's context, so it sees the request deadline
+        futures = [
+            executor.submit(contextvars.copy_context().run, _TOOLS[call["name"]], **call["args"])
+            for call in calls
+        ]
+        results = [future.result() for future in futures]
+    return _as_messages(calls, results)
+
+
+async def aprefetch_messages(prompt: str) -> List[BaseMessage]:
+    """Async variant of prefetch_messages."""
+    if not prefetch_enabled():
+        return []
+    calls = plan_prefetch(prompt)
+    if not calls:
+        return []
+
+    logger.info(f"Prefetching {[call['name'] for call in calls]}")
+    results = await asyncio.gather(*(
+        asyncio.to_thread(_TOOLS[call["name"]], **call["args"]) for call in calls
+    ))
+    return _as_messages(calls, list(results))
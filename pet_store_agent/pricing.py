@@ -0,0 +1,154 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Deterministic pricing, shipping and replenishment rules for pet store orders.
+
+Implements the business rules from SYSTEM_PROMPT so the model copies exact figures
+instead of doing the arithmetic itself:
+- Each additional unit of the same item is 10% off (first unit at regular price).
+- Orders over $300 get a 15% discount on the order.
+- Orders of $75 or above ship free; below that, 2 items or fewer ship for $14.95
+  and 3 items or more for $19.95. An empty order is not shipped.
+- An item is flagged for replenishment when the inventory remaining after the order
+  is at or below its reorder level.
+"""
+
+import json
+import logging
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, List, Optional
+from typing_extensions import NotRequired, TypedDict
+
+from telemetry import traced_tool
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_DISCOUNT = Decimal("0.10")
+ORDER_DISCOUNT = Decimal("0.15")
+ORDER_DISCOUNT_THRESHOLD = Decimal("300")
+FREE_SHIPPING_THRESHOLD = Decimal("75")
+SMALL_ORDER_SHIPPING = Decimal("14.95")
+LARGE_ORDER_SHIPPING = Decimal("19.95")
+LARGE_ORDER_ITEMS = 3
+
+CENT = Decimal("0.01")
+
+
+class OrderItem(TypedDict):
+    """An ordered product with its unit price and, when known, its inventory levels."""
+    productId: str
+    price: float
+    quantity: int
+    inventoryQuantity: NotRequired[Optional[int]]
+    reorderLevel: NotRequired[Optional[int]]
+
+
+def _money(value: Decimal) -> Decimal:
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def item_total(price: Decimal, quantity: int) -> Decimal:
+    """Total for one line: first unit at full price, each additional unit with the bundle discount."""
+    if quantity <= 0:
+        return Decimal("0")
+    return _money(price + price * (quantity - 1) * (1 - BUNDLE_DISCOUNT))
+
+
+def shipping_cost(order_amount: Decimal, item_count: int) -> Decimal:
+    """Shipping charge for an order amount (after discounts) and total number of units."""
+    if item_count <= 0 or order_amount >= FREE_SHIPPING_THRESHOLD:
+        return Decimal("0")
+    if item_count >= LARGE_ORDER_ITEMS:
+        return LARGE_ORDER_SHIPPING
+    return SMALL_ORDER_SHIPPING
+
+
+def needs_replenishment(inventory_quantity: Optional[int], reorder_level: Optional[int], quantity: int) -> bool:
+    """True when the stock projected after the order is at or below the reorder level."""
+    if inventory_quantity is None or reorder_level is None:
+        return False
+    return inventory_quantity - quantity <= reorder_level
+
+
+def price_order(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Price an order.
+
+    Args:
+        items: List of OrderItem dictionaries.
+
+    Returns:
+        Dictionary with the response schema fields items, subtotal, shippingCost,
+        additionalDiscount and total, plus unavailableProducts listing product ids
+        whose known inventory cannot cover the ordered quantity.
+
+    Raises:
+        ValueError: An item's quantity is below 1.
+    """
+    priced = []
+    unavailable = []
+    subtotal = Decimal("0")
+    item_count = 0
+
+    for item in items:
+        price = Decimal(str(item["price"]))
+        quantity = int(item["quantity"])
+        if quantity < 1:
+            raise ValueError(f"Quantity of {item['productId']} must be at least 1, got {quantity}")
+        inventory_quantity = item.get("inventoryQuantity")
+        reorder_level = item.get("reorderLevel")
+
+        total = item_total(price, quantity)
+        subtotal += total
+        item_count += quantity
+        if inventory_quantity is not None and quantity > inventory_quantity:
+            unavailable.append(item["productId"])
+
+        priced.append({
+            "productId": item["productId"],
+            "price": float(price),
+            "quantity": quantity,
+            "bundleDiscount": float(BUNDLE_DISCOUNT) if quantity > 1 else 0,
+            "total": float(total),
+            "replenishInventory": needs_replenishment(inventory_quantity, reorder_level, quantity),
+        })
+
+    discount = ORDER_DISCOUNT if subtotal > ORDER_DISCOUNT_THRESHOLD else Decimal("0")
+    discounted = _money(subtotal * (1 - discount))
+    shipping = shipping_cost(discounted, item_count)
+
+    return {
+        "items": priced,
+        "subtotal": float(_money(subtotal)),
+        "shippingCost": float(shipping),
+        "additionalDiscount": float(discount),
+        "total": float(_money(discounted + shipping)),
+        "unavailableProducts": unavailable,
+    }
+
+
+@traced_tool
+def calculate_order(items: List[OrderItem]) -> str:
+    """
+    Calculate exact item totals, discounts, shipping and replenishment flags for an order.
+    Use the returned figures as-is in the final response instead of calculating them.
+
+    Args:
+        items: Ordered products. For each: productId, unit price, quantity and, from get_inventory, inventoryQuantity (current quantity) and reorderLevel (reorder_level).
+
+    Returns:
+        JSON string with items (price, quantity, bundleDiscount, total, replenishInventory), subtotal, shippingCost, additionalDiscount, total and unavailableProducts
+    """
+    logger.info(f"calculate_order called with input: items={items}")
+
+    try:
+        result = json.dumps(price_order(items))
+        logger.info(f"calculate_order returning result: {result}")
+        return result
+    except Exception as e:
+        logger.error(f"calculate_order() error: {str(e)}")
+
+        result = f"Failed to calculate order: {str(e)}"
+        logger.info(f"calculate_order returning result: {result}")
+        return result
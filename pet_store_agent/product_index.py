@@ -0,0 +1,219 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Optional in-process BM25 index over a snapshot of the product catalog.
+
+When PRODUCT_INDEX_PATH points to a snapshot built with this module, product
+retrievals are answered locally in the same result shape as Bedrock's
+retrievalResults. Queries the index is not confident about fall back to the
+knowledge base.
+
+Configuration is read from the environment:
+    PRODUCT_INDEX_PATH            path to the .npz snapshot (unset disables the index)
+    PRODUCT_INDEX_MIN_CONFIDENCE  minimum normalized top score to answer locally (default 0.6)
+    PRODUCT_INDEX_MIN_COVERAGE    minimum share of query terms known to the index (default 0.5)
+
+Build a snapshot from a directory of catalog documents (one document per file) or
+a JSONL file of {"id": ..., "text": ...} records:
+    python product_index.py <source> <output.npz>
+"""
+
+import os
+import re
+import sys
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from config import env_float
+
+logger = logging.getLogger(__name__)
+
+K1 = 1.2
+B = 0.75
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do for from has have how i in is it its me my of on or our "
+    "the this to us we what when which who will with would you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case alphanumeric tokens without stopwords."""
+    return [token for token in _TOKEN.findall((text or "").lower()) if token not in _STOPWORDS]
+
+
+class ProductIndex:
+    """BM25 term weights for a fixed document set, stored as a dense NumPy matrix."""
+
+    def __init__(self, doc_ids, doc_texts, vocabulary, weights):
+        self.doc_ids = [str(doc_id) for doc_id in doc_ids]
+        self.doc_texts = [str(text) for text in doc_texts]
+        self.vocabulary = {str(term): i for i, term in enumerate(vocabulary)}
+        self.weights = weights
+        # Best possible contribution of each term, used to normalize scores to [0, 1]
+        self._max_weights = weights.max(axis=0) if weights.size else weights.sum(axis=0)
+
+    @classmethod
+    def build(cls, documents: List[Dict[str, str]]) -> "ProductIndex":
+        """Build the index from a list of {"id": ..., "text": ...} documents."""
+        import numpy as np
+
+        tokenized = [tokenize(doc["text"]) for doc in documents]
+        vocabulary = sorted({token for tokens in tokenized for token in tokens})
+        columns = {term: i for i, term in enumerate(vocabulary)}
+
+        tf = np.zeros((len(documents), len(vocabulary)), dtype=np.float32)
+        for row, tokens in enumerate(tokenized):
+            for token in tokens:
+                tf[row, columns[token]] += 1
+
+        doc_lengths = tf.sum(axis=1, keepdims=True)
+        avg_length = float(doc_lengths.mean()) if len(documents) else 0.0
+        df = (tf > 0).sum(axis=0)
+        idf = np.log(1 + (len(documents) - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = K1 * (1 - B + B * doc_lengths / max(avg_length, 1e-9))
+        weights = (idf * tf * (K1 + 1) / (tf + norm)).astype(np.float32)
+
+        return cls([doc["id"] for doc in documents], [doc["text"] for doc in documents], vocabulary, weights)
+
+    def save(self, path: str) -> None:
+        """Write the snapshot as a compressed .npz file."""
+        import numpy as np
+
+        vocabulary = sorted(self.vocabulary, key=self.vocabulary.get)
+        np.savez_compressed(
+            path,
+            doc_ids=np.array(self.doc_ids, dtype=str),
+            doc_texts=np.array(self.doc_texts, dtype=str),
+            vocabulary=np.array(vocabulary, dtype=str),
+            weights=self.weights,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "ProductIndex":
+        """Read a snapshot written by save()."""
+        import numpy as np
+
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["doc_ids"].tolist(), data["doc_texts"].tolist(), data["vocabulary"].tolist(), data["weights"])
+
+    def search(self, text: str, number_of_results: int = 10):
+        """
+        Score all documents against a query.
+
+        Returns:
+            Tuple of (results, coverage): results in Bedrock retrievalResults shape with
+            scores normalized to [0, 1], and the share of query terms known to the index.
+        """
+        import numpy as np
+
+        terms = tokenize(text)
+        columns = [self.vocabulary[term] for term in terms if term in self.vocabulary]
+        coverage = len(columns) / len(terms) if terms else 0.0
+        if not columns:
+            return [], coverage
+
+        scores = self.weights[:, columns].sum(axis=1)
+        best_possible = float(self._max_weights[columns].sum())
+        if best_possible <= 0:
+            return [], coverage
+        scores = scores / best_possible
+
+        limit = min(number_of_results, len(scores))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        results = [
+            {
+                "content": {"text": self.doc_texts[i]},
+                "location": {"type": "CUSTOM", "customDocumentLocation": {"id": self.doc_ids[i]}},
+                "score": float(scores[i]),
+            }
+            for i in top
+            if scores[i] > 0
+        ]
+        return results, coverage
+
+
+_index: Optional[ProductIndex] = None
+_index_path: Optional[str] = None
+_stats = {"local": 0, "fallback": 0}
+_lock = threading.Lock()
+
+
+def get_index() -> Optional[ProductIndex]:
+    """Return the index configured by PRODUCT_INDEX_PATH, loading it on first use."""
+    global _index, _index_path
+
+    path = os.environ.get('PRODUCT_INDEX_PATH')
+    if not path:
+        return None
+    if _index is not None and _index_path == path:
+        return _index
+
+    with _lock:
+        if _index is None or _index_path != path:
+            try:
+                _index = ProductIndex.load(path)
+                logger.info(f"Loaded product index with {len(_index.doc_ids)} documents from {path}")
+            except Exception as e:
+                logger.error(f"Failed to load product index from {path}: {str(e)}")
+                _index = None
+            _index_path = path
+        return _index
+
+
+def local_retrieve(text: str, number_of_results: int = 10) -> Optional[List[Dict[str, Any]]]:
+    """
+    Answer a product retrieval from the local index when it is confident.
+
+    Returns:
+        Results in Bedrock retrievalResults shape, or None when the index is disabled
+        or not confident and the caller should query the knowledge base.
+    """
+    index = get_index()
+    if index is None:
+        return None
+
+    results, coverage = index.search(text, number_of_results)
+    min_confidence = env_float('PRODUCT_INDEX_MIN_CONFIDENCE', 0.6)
+    min_coverage = env_float('PRODUCT_INDEX_MIN_COVERAGE', 0.5)
+    confident = bool(results) and results[0]["score"] >= min_confidence and coverage >= min_coverage
+
+    with _lock:
+        _stats["local" if confident else "fallback"] += 1
+    return results if confident else None
+
+
+def index_stats() -> Dict[str, int]:
+    """Return how many retrievals were answered locally and how many fell back."""
+    with _lock:
+        return dict(_stats)
+
+
+def load_documents(source: str) -> List[Dict[str, str]]:
+    """Read catalog documents from a directory of text files or a JSONL file."""
+    if os.path.isdir(source):
+        documents = []
+        for name in sorted(os.listdir(source)):
+            path = os.path.join(source, name)
+            if os.path.isfile(path):
+                with open(path, encoding="utf-8") as f:
+                    documents.append({"id": name, "text": f.read()})
+        return documents
+
+    with open(source, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python product_index.py <documents-dir-or-jsonl> <output.npz>")
+        sys.exit(1)
+
+    documents = load_documents(sys.argv[1])
+    ProductIndex.build(documents).save(sys.argv[2])
+    print(f"Wrote product index with {len(documents)} documents to {sys.argv[2]}")
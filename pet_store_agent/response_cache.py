@@ -0,0 +1,257 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Bounded LRU+TTL cache of final responses to guest requests.
+
+Requests that name no customer (no customer id or email) and continue no session
+get the same answer for the same question as long as the catalog and inventory
+data behind it is the same. Entries are keyed on the normalized request text plus
+a fingerprint of the product retrieval prefetched for it, and remember the status
+version of every product whose inventory the agent read (see
+inventory_management.status_bucket). An entry is dropped as soon as any read
+finds one of those products crossed a status threshold, and on a hit the products'
+inventory is read again (one batched call) to confirm nothing moved before the
+cached response is returned. An Accept response that read no inventory is not
+cached, as nothing would invalidate it; a Reject response that read none depends
+only on the catalog data in its key and lives until its TTL.
+
+The cache is created from the settings below on first use; reset_response_cache()
+drops it so the next request creates it again.
+
+Hit, miss, stale and eviction counters are kept for the hit rate, and each lookup
+is measured as a "cache" operation with a cache="hit"|"miss"|"stale"|"bypass" attribute.
+
+Configuration is read from the environment:
+    RESPONSE_CACHE_ENABLED            enable the cache (default true)
+    RESPONSE_CACHE_MAX_ENTRIES        maximum number of cached responses (default 512)
+    RESPONSE_CACHE_TTL_SECONDS        entry time to live in seconds (default 300)
+    RESPONSE_CACHE_VERIFY_INVENTORY   re-read the products' inventory on a hit (default true)
+"""
+
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage, ToolMessage
+
+from config import env_flag, env_float, env_int
+from inventory_management import on_status_change, refresh_inventory, status_version
+from prefetch import extract_identifiers
+from retrieval_cache import normalize_query
+from retrieve_product_info import retrieve_product_info
+from telemetry import is_tool_error, operation
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str]
+
+# Response statuses worth caching; Error responses are retried on the next request
+CACHEABLE_STATUSES = ("Accept", "Reject")
+
+
+class ResponseCache:
+    """Thread-safe LRU+TTL cache of final responses, invalidated by inventory status changes."""
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        # key -> (expires_at, response, {product_code: status version})
+        self._entries: "OrderedDict[CacheKey, Tuple[float, str, Dict[str, int]]]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0, "invalidations": 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(prompt: str, catalog: str) -> CacheKey:
+        return (normalize_query(prompt), catalog)
+
+    def lookup(self, key: CacheKey, refresh: Optional[Callable[[List[str]], bool]] = None) -> Tuple[str, Optional[str]]:
+        """
+        Look up the response cached under key.
+
+        Args:
+            key: Cache key from make_key.
+            refresh: Optional function reading the inventory of the products the entry
+                depended on; returns False if it could not.
+
+        Returns:
+            Tuple of (outcome, response): ("hit", response), ("miss", None), or
+            ("stale", None) when a product the entry depended on crossed a status threshold.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self._clock():
+                del self._entries[key]
+                self._stats["evictions"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return "miss", None
+
+        _, response, dependencies = entry
+        confirmed = refresh is None or not dependencies or refresh(list(dependencies))
+        current = confirmed and all(status_version(code) == version for code, version in dependencies.items())
+
+        with self._lock:
+            if not current:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+                self._stats["stale"] += 1
+                return "stale", None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+        return "hit", response
+
+    def put(self, key: CacheKey, response: str, dependencies: Dict[str, int]) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_seconds, response, dict(dependencies))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, product_code: Optional[str] = None) -> None:
+        """Drop all entries, or only those that depended on one product's inventory."""
+        with self._lock:
+            if product_code is None:
+                self._entries.clear()
+                return
+            for key in [k for k, entry in self._entries.items() if product_code in entry[2]]:
+                del self._entries[key]
+                self._stats["invalidations"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the counters, the current number of entries and the hit rate of lookups."""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"] + self._stats["stale"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+
+def _new_cache() -> ResponseCache:
+    return ResponseCache(
+        max_entries=env_int('RESPONSE_CACHE_MAX_ENTRIES', 512),
+        ttl_seconds=env_float('RESPONSE_CACHE_TTL_SECONDS', 300),
+    )
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Return the shared response cache, creating it on first use."""
+    global _cache
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = _new_cache()
+    return _cache
+
+
+def reset_response_cache() -> None:
+    """Drop the shared response cache, e.g. after a configuration change."""
+    global _cache
+
+    with _cache_lock:
+        _cache = None
+
+
+def _invalidate(product_code: str) -> None:
+    cache = _cache
+    if cache is not None:
+        cache.invalidate(product_code)
+
+
+on_status_change(_invalidate)
+
+
+def cacheable(prompt: str, session_id: Optional[str] = None, use_cache: bool = True) -> bool:
+    """Whether a request may be answered from the cache: a guest request outside a session, with the cache on."""
+    if not use_cache or session_id is not None or not env_flag('RESPONSE_CACHE_ENABLED'):
+        return False
+    identifiers = extract_identifiers(prompt)
+    return not identifiers["user_id"] and not identifiers["user_email"]
+
+
+def catalog_fingerprint(prompt: str, messages: List[BaseMessage]) -> Optional[str]:
+    """
+    Fingerprint the catalog data a request is answered from: the product retrieval
+    for its text, taken from the prefetched messages or retrieved when prefetch is off.
+
+    Returns:
+        A hex digest, or None when the retrieval failed.
+    """
+    products = next((msg.content for msg in messages if isinstance(msg, ToolMessage) and msg.name == "retrieve_product_info"), None)
+    if products is None:
+        query = extract_identifiers(prompt)["query"]
+        products = retrieve_product_info(query) if query else ""
+    if not isinstance(products, str) or is_tool_error(products):
+        return None
+    return hashlib.sha256(products.encode("utf-8")).hexdigest()[:32]
+
+
+def lookup_response(prompt: str, messages: List[BaseMessage]) -> Tuple[Optional[CacheKey], str, Optional[str]]:
+    """
+    Look up the cached response to a guest request.
+
+    Args:
+        prompt: The customer request.
+        messages: The request's initial messages, with the prefetched lookups.
+
+    Returns:
+        Tuple of (cache key to store the response under, or None when the request
+        cannot be cached; outcome: "hit", "miss", "stale" or "bypass"; cached
+        response on a hit, else None).
+    """
+    with operation("cache", "response") as op:
+        catalog = catalog_fingerprint(prompt, messages)
+        if catalog is None:
+            op.set(cache="bypass")
+            return None, "bypass", None
+        key = ResponseCache.make_key(prompt, catalog)
+        verify = env_flag('RESPONSE_CACHE_VERIFY_INVENTORY')
+        outcome, response = get_response_cache().lookup(key, refresh_inventory if verify else None)
+        op.set(cache=outcome)
+        if outcome != "miss":
+            logger.info(f"Response cache {outcome}")
+        return key, outcome, response
+
+
+async def alookup_response(prompt: str, messages: List[BaseMessage]) -> Tuple[Optional[CacheKey], str, Optional[str]]:
+    """Async variant of lookup_response; the inventory reads run in a worker thread."""
+    return await asyncio.to_thread(lookup_response, prompt, messages)
+
+
+def store_response(key: Optional[CacheKey], response: str, dependencies: Dict[str, int]) -> bool:
+    """
+    Cache an Accept or Reject response under key, with the product status versions it depended on.
+
+    An Accept response is only cached when it read the inventory of some product.
+    """
+    if key is None:
+        return False
+    try:
+        status = json.loads(response).get("status")
+    except (TypeError, ValueError, AttributeError):
+        return False
+    if status not in CACHEABLE_STATUSES or (status == "Accept" and not dependencies):
+        return False
+    get_response_cache().put(key, response, dependencies)
+    return True
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Return the response cache counters and hit rate."""
+    return get_response_cache().stats()
@@ -0,0 +1,337 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Validation and repair of the agent's final response against RESPONSE_SCHEMA.
+
+The schema from SYSTEM_PROMPT is compiled once into a tree of checking functions.
+A final response that does not validate goes through a local repair pass:
+1. Code fences and text around the JSON object are stripped.
+2. Values are coerced to the schema: numeric strings to numbers, enum values
+   matched case-insensitively, optional fields that are null dropped.
+3. Strings longer than their maxLength are cut at a word boundary.
+4. In Accept responses, item totals, bundle discounts, subtotal, order discount,
+   shipping and total are recomputed with the pricing rules whenever the items
+   carry price and quantity, so arithmetic slips never reach the customer.
+   Reject and Error responses are not priced orders and are left as they are.
+Only when the repaired response still does not validate is the model re-asked,
+once, in a single tool-less call that sees just the schema, the errors and the
+invalid response. If that fails too, the schema-valid Error response is used.
+
+validation_stats() reports how often each path ran.
+"""
+
+import re
+import json
+import logging
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from pricing import price_order
+from deadline import DeadlineCallbackHandler, current_deadline
+from prompts import RESPONSE_SCHEMA
+
+logger = logging.getLogger(__name__)
+
+Validator = Callable[[Any, str], List[str]]
+
+ERROR_RESPONSE = json.dumps({
+    "status": "Error",
+    "message": "We are sorry for the technical difficulties we are currently facing. We will get back to you with an update once the issue is resolved."
+})
+
+REASK_INSTRUCTIONS = (
+    "You fix customer service responses. Rewrite the response you are given as a single JSON object "
+    "that is valid against the JSON schema below, keeping its meaning. Return only the JSON object.\n\n"
+    "Schema:\n"
+)
+
+_CODE_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+_TYPES = {
+    "string": lambda v: isinstance(v, str),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+}
+# Pricing fields compared after recomputing totals
+_MONEY_TOLERANCE = 0.005
+
+_stats = Counter()
+_repairs = Counter()
+_stats_lock = threading.Lock()
+_reask_model = None
+
+
+def compile_schema(schema: Dict[str, Any]) -> Validator:
+    """
+    Compile a JSON schema into a validator function.
+
+    Supports the keywords RESPONSE_SCHEMA uses: type, enum, required, properties,
+    items, minItems, minimum, maximum and maxLength. The validator takes a value
+    and its path and returns a list of error messages, empty when the value is valid.
+    """
+    checks: List[Validator] = []
+
+    if "type" in schema:
+        expected = schema["type"]
+        is_type = _TYPES[expected]
+        checks.append(lambda v, path: [] if is_type(v) else [f"{path}: expected {expected}"])
+    if "enum" in schema:
+        allowed = list(schema["enum"])
+        checks.append(lambda v, path: [] if v in allowed else [f"{path}: must be one of {allowed}"])
+    if "minimum" in schema:
+        low = schema["minimum"]
+        checks.append(lambda v, path: [f"{path}: below minimum {low}"] if _TYPES["number"](v) and v < low else [])
+    if "maximum" in schema:
+        high = schema["maximum"]
+        checks.append(lambda v, path: [f"{path}: above maximum {high}"] if _TYPES["number"](v) and v > high else [])
+    if "maxLength" in schema:
+        limit = schema["maxLength"]
+        checks.append(lambda v, path: [f"{path}: longer than {limit} characters"] if isinstance(v, str) and len(v) > limit else [])
+    if "required" in schema:
+        required = list(schema["required"])
+        checks.append(lambda v, path: [f"{path}.{key}: required" for key in required if key not in v] if isinstance(v, dict) else [])
+    if "properties" in schema:
+        properties = {key: compile_schema(sub) for key, sub in schema["properties"].items()}
+
+        def check_properties(v, path):
+            if not isinstance(v, dict):
+                return []
+            return [error for key, check in properties.items() if key in v for error in check(v[key], f"{path}.{key}")]
+        checks.append(check_properties)
+    if "minItems" in schema:
+        least = schema["minItems"]
+        checks.append(lambda v, path: [f"{path}: fewer than {least} items"] if isinstance(v, list) and len(v) < least else [])
+    if "items" in schema:
+        item_check = compile_schema(schema["items"])
+        checks.append(lambda v, path: [e for i, item in enumerate(v) for e in item_check(item, f"{path}[{i}]")] if isinstance(v, list) else [])
+
+    def validate(value: Any, path: str = "$") -> List[str]:
+        errors = []
+        for check in checks:
+            errors.extend(check(value, path))
+            # Further checks on a value of the wrong type only add noise
+            if errors and check is checks[0] and "type" in schema:
+                break
+        return errors
+    return validate
+
+
+validate_response: Validator = compile_schema(RESPONSE_SCHEMA)
+
+
+def _count(counter: str, repairs: Optional[List[str]] = None) -> None:
+    with _stats_lock:
+        _stats[counter] += 1
+        _repairs.update(repairs or [])
+
+
+def validation_stats() -> Dict[str, Any]:
+    """Return counters of responses by outcome (valid, repaired, reasked, failed) and of each repair."""
+    with _stats_lock:
+        return {**dict(_stats), "repairs": dict(_repairs)}
+
+
+def set_reask_model(model: Any) -> None:
+    """Set the chat model used for re-asks; create_agent installs the agent's model."""
+    global _reask_model
+    _reask_model = model
+
+
+def _extract_json(text: str, repairs: List[str]) -> Optional[Any]:
+    """Parse the JSON object in text, stripping code fences and surrounding text."""
+    fenced = _CODE_FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+        repairs.append("code_fence")
+    start = text.find("{")
+    if start < 0:
+        return None
+    try:
+        value, end = json.JSONDecoder().raw_decode(text, start)
+    except ValueError:
+        return None
+    if start > 0 or text[end:].strip():
+        repairs.append("surrounding_text")
+    return value
+
+
+def _coerce(value: Any, schema: Dict[str, Any], repairs: List[str]) -> Any:
+    """Coerce a value towards its schema: numbers, integers, enums, nulls and string lengths."""
+    expected = schema.get("type")
+    if expected in ("number", "integer") and isinstance(value, str):
+        try:
+            number = float(value.strip().lstrip("$").replace(",", ""))
+            value = int(number) if expected == "integer" and number.is_integer() else number
+            repairs.append("number")
+        except ValueError:
+            return value
+    if expected == "integer" and isinstance(value, float) and value.is_integer():
+        value = int(value)
+        repairs.append("number")
+    if expected == "boolean" and isinstance(value, str) and value.strip().lower() in ("true", "false"):
+        value = value.strip().lower() == "true"
+        repairs.append("boolean")
+    if "enum" in schema and isinstance(value, str) and value not in schema["enum"]:
+        match = next((option for option in schema["enum"] if option.lower() == value.strip().lower()), None)
+        if match is not None:
+            value = match
+            repairs.append("enum")
+    if "maxLength" in schema and isinstance(value, str) and len(value) > schema["maxLength"]:
+        limit = schema["maxLength"] - 3
+        cut = value.rfind(" ", 0, limit)
+        value = value[:cut if cut > 0 else limit].rstrip() + "..."
+        repairs.append("max_length")
+    if expected == "object" and isinstance(value, dict):
+        properties = schema.get("properties", {})
+        required = set(schema.get("required", []))
+        for key in list(value):
+            if value[key] is None and key not in required:
+                del value[key]
+                repairs.append("null_field")
+            elif key in properties:
+                value[key] = _coerce(value[key], properties[key], repairs)
+    if expected == "array" and isinstance(value, list) and "items" in schema:
+        value = [_coerce(item, schema["items"], repairs) for item in value]
+    return value
+
+
+def _differs(a: Any, b: Any) -> bool:
+    if _TYPES["number"](a) and _TYPES["number"](b):
+        return abs(a - b) > _MONEY_TOLERANCE
+    return a != b
+
+
+def _recompute_totals(response: Dict[str, Any], repairs: List[str]) -> None:
+    """Replace the order figures of an Accept response with the pricing rules' results when the items allow it."""
+    if response.get("status") != "Accept":
+        return
+    items = response.get("items")
+    if not isinstance(items, list) or not items:
+        return
+    if not all(isinstance(i, dict) and isinstance(i.get("productId"), str)
+               and _TYPES["number"](i.get("price")) and _TYPES["integer"](i.get("quantity")) and i["quantity"] >= 1 for i in items):
+        return
+    priced = price_order([{"productId": i["productId"], "price": i["price"], "quantity": i["quantity"]} for i in items])
+
+    changed = False
+    for item, computed in zip(items, priced["items"]):
+        for field in ("bundleDiscount", "total"):
+            if field not in item or _differs(item[field], computed[field]):
+                item[field] = computed[field]
+                changed = True
+    for field in ("subtotal", "additionalDiscount", "shippingCost", "total"):
+        if field not in response or _differs(response[field], priced[field]):
+            response[field] = priced[field]
+            changed = True
+    if changed:
+        repairs.append("totals")
+
+
+def repair_response(text: str) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """
+    Apply the local repair pass to a response.
+
+    Returns:
+        Tuple of (repaired response object or None when no JSON object was found,
+        names of the repairs applied).
+    """
+    repairs: List[str] = []
+    value = _extract_json(text if isinstance(text, str) else "", repairs)
+    if not isinstance(value, dict):
+        return None, repairs
+    value = _coerce(value, RESPONSE_SCHEMA, repairs)
+    _recompute_totals(value, repairs)
+    return value, repairs
+
+
+def _reask_messages(text: str, errors: List[str]) -> List[Any]:
+    return [
+        SystemMessage(content=REASK_INSTRUCTIONS + json.dumps(RESPONSE_SCHEMA, separators=(",", ":"))),
+        HumanMessage(content="Validation errors:\n" + "\n".join(errors[:10]) + "\n\nResponse:\n" + text),
+    ]
+
+
+def _reask_config() -> Optional[Dict[str, Any]]:
+    """Charge the re-ask to the current request's deadline, so it counts in its usage and budgets."""
+    deadline = current_deadline()
+    return {"callbacks": [DeadlineCallbackHandler(deadline)]} if deadline is not None else None
+
+
+def _check(text: str) -> Tuple[Optional[str], List[str], List[str]]:
+    """Return (valid response text or None, repairs applied, remaining errors)."""
+    try:
+        parsed = json.loads(text) if isinstance(text, str) else None
+    except ValueError:
+        parsed = None
+    if isinstance(parsed, dict):
+        repairs: List[str] = []
+        _recompute_totals(parsed, repairs)
+        if not repairs and not validate_response(parsed):
+            return text, [], []
+
+    repaired, repairs = repair_response(text)
+    if repaired is None:
+        return None, repairs, ["$: no JSON object found"]
+    errors = validate_response(repaired)
+    if errors:
+        return None, repairs, errors
+    return json.dumps(repaired, indent=4), repairs, []
+
+
+def _finish(outcome: str, response: str, repairs: List[str], errors: List[str]) -> Tuple[str, Dict[str, Any]]:
+    _count(outcome, repairs)
+    if outcome != "valid":
+        logger.info(f"Response {outcome}: repairs={sorted(set(repairs))} errors={errors[:3]}")
+    return response, {"outcome": outcome, "repairs": sorted(set(repairs)), "errors": errors[:10]}
+
+
+def validated_response(text: str, reask_allowed: bool = True) -> Tuple[str, Dict[str, Any]]:
+    """
+    Return a schema-valid final response for text.
+
+    Args:
+        text: The agent's final response.
+        reask_allowed: Whether the model may be re-asked when local repair fails (e.g. not when out of time).
+
+    Returns:
+        Tuple of (response, report) where report has the outcome ("valid",
+        "repaired", "reasked" or "failed"), the repairs applied and the errors left.
+    """
+    response, repairs, errors = _check(text)
+    if response is not None:
+        return _finish("repaired" if repairs else "valid", response, repairs, [])
+
+    if reask_allowed and _reask_model is not None and isinstance(text, str) and text.strip():
+        try:
+            answer = _reask_model.invoke(_reask_messages(text, errors), _reask_config())
+            response, reask_repairs, reask_errors = _check(answer.content)
+            if response is not None:
+                return _finish("reasked", response, repairs + reask_repairs, errors)
+            errors = reask_errors
+        except Exception as e:
+            logger.error(f"Response re-ask failed: {str(e)}")
+    return _finish("failed", ERROR_RESPONSE, repairs, errors)
+
+
+async def avalidated_response(text: str, reask_allowed: bool = True) -> Tuple[str, Dict[str, Any]]:
+    """Async variant of validated_response."""
+    response, repairs, errors = _check(text)
+    if response is not None:
+        return _finish("repaired" if repairs else "valid", response, repairs, [])
+
+    if reask_allowed and _reask_model is not None and isinstance(text, str) and text.strip():
+        try:
+            answer = await _reask_model.ainvoke(_reask_messages(text, errors), _reask_config())
+            response, reask_repairs, reask_errors = _check(answer.content)
+            if response is not None:
+                return _finish("reasked", response, repairs + reask_repairs, errors)
+            errors = reask_errors
+        except Exception as e:
+            logger.error(f"Response re-ask failed: {str(e)}")
+    return _finish("failed", ERROR_RESPONSE, repairs, errors)
@@ -0,0 +1,194 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Token-budgeted compaction of knowledge base retrieval results.
+
+Retrieval tool output stays in the message history and is re-sent on every later
+model turn, so it is compacted before formatting:
+1. Results are ordered by score, highest first.
+2. Chunks of the same document that contain or overlap each other are merged.
+3. Near-duplicate passages (word 3-gram Jaccard similarity at or above the
+   threshold) are dropped in favour of the higher-scoring one.
+4. Results are kept in score order until the tool's token budget is used; the
+   last one is cut at a word boundary when enough budget is left.
+
+Tokens are estimated at four characters per token.
+
+Configuration is read from the environment:
+    RETRIEVAL_COMPACTION_ENABLED     compact retrieval results (default true)
+    RETRIEVAL_TOKEN_BUDGET_<TOOL>    token budget per tool, e.g. RETRIEVAL_TOKEN_BUDGET_RETRIEVE_PET_CARE
+    RETRIEVAL_TOKEN_BUDGET           default budget for tools without their own (default 1000)
+    RETRIEVAL_DUPLICATE_THRESHOLD    near-duplicate similarity threshold (default 0.8)
+"""
+
+import copy
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from config import env_flag, env_float, env_int
+from telemetry import annotate
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+MIN_OVERLAP_CHARS = 40
+MIN_TRUNCATED_TOKENS = 32
+
+_stats: Dict[str, Dict[str, int]] = {}
+_stats_lock = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _enabled() -> bool:
+    return env_flag('RETRIEVAL_COMPACTION_ENABLED')
+
+
+def token_budget(tool_name: str) -> int:
+    """Return the token budget configured for a tool."""
+    return env_int(f"RETRIEVAL_TOKEN_BUDGET_{tool_name.upper()}", env_int('RETRIEVAL_TOKEN_BUDGET', 1000))
+
+
+def _text(result: Dict[str, Any]) -> str:
+    content = result.get("content") or {}
+    return content.get("text") if isinstance(content.get("text"), str) else ""
+
+
+def _doc_id(result: Dict[str, Any]) -> Optional[str]:
+    return ((result.get("location") or {}).get("customDocumentLocation") or {}).get("id")
+
+
+def _with_text(result: Dict[str, Any], text: str) -> Dict[str, Any]:
+    result = copy.copy(result)
+    result["content"] = {**(result.get("content") or {}), "text": text}
+    return result
+
+
+def _merge_overlap(first: str, second: str) -> Optional[str]:
+    """Merge two chunks when one contains the other or the end of one starts the other."""
+    if second in first:
+        return first
+    if first in second:
+        return second
+    for a, b in ((first, second), (second, first)):
+        if len(b) < MIN_OVERLAP_CHARS:
+            continue
+        # Candidate overlaps start where the head of b occurs in a
+        start = a.find(b[:MIN_OVERLAP_CHARS])
+        while start != -1:
+            if b.startswith(a[start:]):
+                return a[:start] + b
+            start = a.find(b[:MIN_OVERLAP_CHARS], start + 1)
+    return None
+
+
+def _shingles(text: str) -> Set[Tuple[str, ...]]:
+    words = text.lower().split()
+    if len(words) < 3:
+        return {tuple(words)}
+    return {tuple(words[i:i + 3]) for i in range(len(words) - 2)}
+
+
+def _similarity(a: Set[Tuple[str, ...]], b: Set[Tuple[str, ...]]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _truncate(text: str, tokens: int) -> str:
+    limit = tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit - 3)
+    return text[:cut if cut > 0 else limit - 3].rstrip() + "..."
+
+
+def merge_and_dedupe(results: List[Dict[str, Any]], threshold: float) -> List[Dict[str, Any]]:
+    """Merge overlapping chunks of the same document and drop near-duplicate passages."""
+    kept: List[Dict[str, Any]] = []
+    for result in sorted(results, key=lambda r: r.get("score", 0.0), reverse=True):
+        text = _text(result)
+        merged = False
+        for i, existing in enumerate(kept):
+            if _doc_id(existing) is not None and _doc_id(existing) == _doc_id(result):
+                combined = _merge_overlap(_text(existing), text)
+                if combined is not None:
+                    kept[i] = _with_text(existing, combined)
+                    merged = True
+                    break
+        if merged:
+            continue
+        shingles = _shingles(text)
+        if any(_similarity(shingles, _shingles(_text(existing))) >= threshold for existing in kept):
+            continue
+        kept.append(result)
+    return kept
+
+
+def fit_budget(results: List[Dict[str, Any]], budget: int, overhead: Callable[[Dict[str, Any]], int]) -> List[Dict[str, Any]]:
+    """Keep results in order until the token budget is used, truncating the last one if it fits partially."""
+    kept = []
+    remaining = budget
+    for result in results:
+        cost = overhead(result) + estimate_tokens(_text(result))
+        if cost <= remaining:
+            kept.append(result)
+            remaining -= cost
+            continue
+        room = remaining - overhead(result)
+        if room >= MIN_TRUNCATED_TOKENS:
+            kept.append(_with_text(result, _truncate(_text(result), room)))
+        break
+    return kept
+
+
+def compact_results(
+    results: List[Dict[str, Any]],
+    tool_name: str,
+    formatter: Callable[[List[Dict[str, Any]]], str],
+) -> List[Dict[str, Any]]:
+    """
+    Compact retrieval results for a tool and record how many tokens were saved.
+
+    Args:
+        results: Score-filtered retrievalResults.
+        tool_name: Tool name, used to look up the token budget and for statistics.
+        formatter: The tool's result formatter, used to measure tokens before and after.
+
+    Returns:
+        The compacted results, highest score first.
+    """
+    if not _enabled() or not results:
+        return results
+
+    threshold = env_float('RETRIEVAL_DUPLICATE_THRESHOLD', 0.8)
+    budget = token_budget(tool_name)
+
+    def overhead(result):
+        # Tokens the formatter spends on the score and document id lines
+        return estimate_tokens(formatter([_with_text(result, "")]))
+
+    compacted = fit_budget(merge_and_dedupe(results, threshold), budget, overhead)
+
+    tokens_before = estimate_tokens(formatter(results))
+    tokens_after = estimate_tokens(formatter(compacted))
+    saved = max(0, tokens_before - tokens_after)
+    with _stats_lock:
+        stats = _stats.setdefault(tool_name, {"calls": 0, "tokens_before": 0, "tokens_after": 0, "results_dropped": 0})
+        stats["calls"] += 1
+        stats["tokens_before"] += tokens_before
+        stats["tokens_after"] += tokens_after
+        stats["results_dropped"] += len(results) - len(compacted)
+    annotate(tokens_saved=saved)
+    logger.info(f"{tool_name} compaction kept {len(compacted)}/{len(results)} results, saved {saved} tokens")
+    return compacted
+
+
+def compaction_stats() -> Dict[str, Dict[str, int]]:
+    """Return per-tool totals of tokens before and after compaction and results dropped."""
+    with _stats_lock:
+        return {tool: {**stats, "tokens_saved": stats["tokens_before"] - stats["tokens_after"]} for tool, stats in _stats.items()}
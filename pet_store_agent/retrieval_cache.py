@@ -0,0 +1,241 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Bounded LRU+TTL cache for Bedrock Knowledge Base retrievals, with single-flight.
+
+Entries are keyed on knowledge base id, normalized query text, numberOfResults and
+score, and hold the raw retrievalResults so callers can still filter them by score.
+Concurrent identical queries wait for one in-flight retrieval instead of issuing
+their own. The wait is bounded by RETRIEVAL_CACHE_WAIT_SECONDS and by half the
+remaining time of the request, after which the waiting caller retrieves directly.
+Hit/miss/eviction counters are kept per knowledge base.
+
+The cache is created from the settings below on first use; reset_retrieval_cache()
+drops it so the next retrieval creates it again.
+
+Configuration is read from the environment:
+    RETRIEVAL_CACHE_ENABLED       enable the cache (default true)
+    RETRIEVAL_CACHE_MAX_ENTRIES   maximum number of cached queries (default 1024)
+    RETRIEVAL_CACHE_TTL_SECONDS   entry time to live in seconds (default 300)
+    RETRIEVAL_CACHE_WAIT_SECONDS  longest wait for an identical in-flight retrieval (default 10)
+"""
+
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import env_flag, env_float, env_int
+from deadline import check_deadline, current_deadline
+from telemetry import annotate
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, int, float]
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Lower-case the query and collapse whitespace and trailing punctuation."""
+    return _WHITESPACE.sub(" ", (text or "").strip().lower()).rstrip("?.! ")
+
+
+class _InFlight:
+    """A retrieval that other callers with the same key can wait for."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.results: Optional[List[Dict[str, Any]]] = None
+        self.error: Optional[BaseException] = None
+
+
+class RetrievalCache:
+    """Thread-safe LRU+TTL cache of raw retrieval results with single-flight loading."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[CacheKey, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._in_flight: Dict[CacheKey, _InFlight] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(kb_id: str, text: str, number_of_results: int, score: float) -> CacheKey:
+        return (kb_id, normalize_query(text), int(number_of_results), float(score))
+
+    def _count(self, kb_id: str, counter: str, amount: int = 1) -> None:
+        stats = self._stats.setdefault(kb_id, {"hits": 0, "misses": 0, "evictions": 0, "coalesced": 0, "wait_timeouts": 0})
+        stats[counter] += amount
+
+    def get_or_load(
+        self,
+        key: CacheKey,
+        loader: Callable[[], List[Dict[str, Any]]],
+        wait_timeout: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Return cached results for key, or load them once for all concurrent callers.
+
+        Args:
+            key: Cache key from make_key.
+            loader: Function performing the retrieval and returning raw retrievalResults.
+            wait_timeout: Longest wait in seconds for an identical in-flight retrieval before
+                calling loader directly; None waits for it to finish.
+
+        Returns:
+            The raw retrievalResults list. Loader errors are raised to every waiting caller and not cached.
+        """
+        kb_id = key[0]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, results = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self._count(kb_id, "hits")
+                    annotate(cache="hit")
+                    return results
+                del self._entries[key]
+                self._count(kb_id, "evictions")
+
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _InFlight()
+                self._in_flight[key] = flight
+                self._count(kb_id, "misses")
+            else:
+                self._count(kb_id, "coalesced")
+
+        annotate(cache="miss" if leader else "coalesced")
+        if not leader:
+            if not flight.event.wait(wait_timeout):
+                # The in-flight retrieval is stuck or slow; its result is still cached when it lands
+                logger.warning(f"Retrieval from {kb_id} still in flight after {wait_timeout:.2f} s, retrieving directly")
+                with self._lock:
+                    self._count(kb_id, "wait_timeouts")
+                annotate(cache="wait_timeout")
+                return loader()
+            if flight.error is not None:
+                raise flight.error
+            return flight.results
+
+        try:
+            flight.results = loader()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+                if flight.error is None:
+                    self._store(key, flight.results)
+            flight.event.set()
+        return flight.results
+
+    def _store(self, key: CacheKey, results: List[Dict[str, Any]]) -> None:
+        self._entries[key] = (self._clock() + self.ttl_seconds, results)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted_key, _ = self._entries.popitem(last=False)
+            self._count(evicted_key[0], "evictions")
+
+    def invalidate(self, kb_id: Optional[str] = None) -> None:
+        """Drop all entries, or only those of one knowledge base."""
+        with self._lock:
+            if kb_id is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == kb_id]:
+                    del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-knowledge-base counters and the current number of entries."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "knowledge_bases": {kb_id: dict(counters) for kb_id, counters in self._stats.items()},
+            }
+
+
+def _enabled() -> bool:
+    return env_flag('RETRIEVAL_CACHE_ENABLED')
+
+
+def _new_cache() -> RetrievalCache:
+    return RetrievalCache(
+        max_entries=env_int('RETRIEVAL_CACHE_MAX_ENTRIES', 1024),
+        ttl_seconds=env_float('RETRIEVAL_CACHE_TTL_SECONDS', 300),
+    )
+
+
+_cache: Optional[RetrievalCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_retrieval_cache() -> RetrievalCache:
+    """Return the shared retrieval cache, creating it on first use."""
+    global _cache
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = _new_cache()
+    return _cache
+
+
+def reset_retrieval_cache() -> None:
+    """Drop the shared retrieval cache, e.g. after a configuration change."""
+    global _cache
+
+    with _cache_lock:
+        _cache = None
+
+
+def _wait_timeout() -> float:
+    """Longest wait for an identical in-flight retrieval, leaving half the request's remaining time for a direct one."""
+    timeout = env_float('RETRIEVAL_CACHE_WAIT_SECONDS', 10)
+    deadline = current_deadline()
+    if deadline is not None:
+        timeout = min(timeout, max(0.0, deadline.remaining() / 2))
+    return timeout
+
+
+def cached_retrieve(client: Any, kb_id: str, text: str, number_of_results: int, score: float) -> List[Dict[str, Any]]:
+    """
+    Retrieve raw results from a knowledge base through the shared cache.
+
+    Args:
+        client: Bedrock Agent Runtime client.
+        kb_id: Knowledge base id.
+        text: Query text.
+        number_of_results: Maximum number of results requested from the knowledge base.
+        score: Score threshold the caller will apply; part of the cache key.
+
+    Returns:
+        The raw retrievalResults list.
+
+    Raises:
+        DeadlineExceeded: The request deadline passed before a retrieval was needed.
+    """
+    def load():
+        check_deadline()
+        response = client.retrieve(
+            retrievalQuery={"text": text},
+            knowledgeBaseId=kb_id,
+            retrievalConfiguration={
+                "vectorSearchConfiguration": {"numberOfResults": number_of_results},
+            },
+        )
+        annotate(retries=response.get("ResponseMetadata", {}).get("RetryAttempts"))
+        return response.get("retrievalResults", [])
+
+    if not _enabled():
+        return load()
+    return get_retrieval_cache().get_or_load(RetrievalCache.make_key(kb_id, text, number_of_results, score), load, _wait_timeout())
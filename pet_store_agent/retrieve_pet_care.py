@@ -6,12 +6,18 @@ Amazon Bedrock Knowledge Base retrieval tool for pet care information using Lang
 """
 
 import os
-import boto3
+import asyncio
 import logging
 from typing import Any, Dict, List, Optional
 
+from aws_clients import get_bedrock_agent_runtime_client
+from retrieval_cache import cached_retrieve
+from result_compaction import compact_results
+from telemetry import traced_tool
+
 logger = logging.getLogger(__name__)
 
+@traced_tool
 def retrieve_pet_care(
     text: str, 
     numberOfResults: int = 10, 
@@ -36,22 +42,18 @@ def retrieve_pet_care(
         return "Error: PET_CARE_KB_ID environment variable not set"
 
     try:
-        # Create a new client for each invocation
-        bedrock_agent_runtime_client = boto3.client("bedrock-agent-runtime", region_name=region_name)
-
-        # Perform retrieval
-        response = bedrock_agent_runtime_client.retrieve(
-            retrievalQuery={"text": text},
-            knowledgeBaseId=kb_id,
-            retrievalConfiguration={
-                "vectorSearchConfiguration": {"numberOfResults": numberOfResults},
-            },
-        )
-
-        # Get and filter results
-        all_results = response.get("retrievalResults", [])
+        # Reuse the shared client and its connection pool
+        bedrock_agent_runtime_client = get_bedrock_agent_runtime_client(region_name)
+
+        # Perform retrieval, served from the query cache when possible
+        all_results = cached_retrieve(bedrock_agent_runtime_client, kb_id, text, numberOfResults, score)
+
+        # Filter results
         filtered_results = filter_results_by_score(all_results, score)
 
+        # Merge overlapping chunks, drop near-duplicates and fit the token budget
+        filtered_results = compact_results(filtered_results, "retrieve_pet_care", format_results_for_display)
+
         # Format results for display
         formatted_results = format_results_for_display(filtered_results)
 
@@ -62,6 +64,20 @@ def retrieve_pet_care(
         return f"Error retrieving pet care information: {str(e)}"
 
 
+async def aretrieve_pet_care(
+    text: str, 
+    numberOfResults: int = 10, 
+    score: float = 0.25
+) -> str:
+    """
+    Async variant of retrieve_pet_care.
+
+    The knowledge base retrieval runs in a worker thread on the shared client, so it
+    can overlap with other tool calls from the same model turn.
+    """
+    return await asyncio.to_thread(retrieve_pet_care, text, numberOfResults, score)
+
+
 def filter_results_by_score(results: List[Dict[str, Any]], min_score: float) -> List[Dict[str, Any]]:
     """Filter results based on minimum score threshold."""
     return [result for result in results if result.get("score", 0.0) >= min_score]
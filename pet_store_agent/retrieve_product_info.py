@@ -6,12 +6,19 @@ Amazon Bedrock Knowledge Base retrieval tool for product information using LangC
 """
 
 import os
-import boto3
+import asyncio
 import logging
 from typing import Any, Dict, List, Optional
 
+from aws_clients import get_bedrock_agent_runtime_client
+from retrieval_cache import cached_retrieve
+from result_compaction import compact_results
+from product_index import local_retrieve
+from telemetry import annotate, traced_tool
+
 logger = logging.getLogger(__name__)
 
+@traced_tool
 def retrieve_product_info(
     text: str, 
     numberOfResults: int = 10, 
@@ -36,22 +43,24 @@ def retrieve_product_info(
         return "Error: PRODUCT_INFO_KB_ID environment variable not set"
 
     try:
-        # Create a new client for each invocation
-        bedrock_agent_runtime_client = boto3.client("bedrock-agent-runtime", region_name=region_name)
-
-        # Perform retrieval
-        response = bedrock_agent_runtime_client.retrieve(
-            retrievalQuery={"text": text},
-            knowledgeBaseId=kb_id,
-            retrievalConfiguration={
-                "vectorSearchConfiguration": {"numberOfResults": numberOfResults},
-            },
-        )
-
-        # Get and filter results
-        all_results = response.get("retrievalResults", [])
+        # Answer from the local catalog index when it is confident
+        all_results = local_retrieve(text, numberOfResults)
+
+        if all_results is not None:
+            annotate(cache="local_index")
+        else:
+            # Reuse the shared client and its connection pool
+            bedrock_agent_runtime_client = get_bedrock_agent_runtime_client(region_name)
+
+            # Perform retrieval, served from the query cache when possible
+            all_results = cached_retrieve(bedrock_agent_runtime_client, kb_id, text, numberOfResults, score)
+
+        # Filter results
         filtered_results = filter_results_by_score(all_results, score)
 
+        # Merge overlapping chunks, drop near-duplicates and fit the token budget
+        filtered_results = compact_results(filtered_results, "retrieve_product_info", format_results_for_display)
+
         # Format results for display
         formatted_results = format_results_for_display(filtered_results)
 
@@ -62,6 +71,20 @@ def retrieve_product_info(
         return f"Error retrieving product information: {str(e)}"
 
 
+async def aretrieve_product_info(
+    text: str, 
+    numberOfResults: int = 10, 
+    score: float = 0.25
+) -> str:
+    """
+    Async variant of retrieve_product_info.
+
+    The knowledge base retrieval runs in a worker thread on the shared client, so it
+    can overlap with other tool calls from the same model turn.
+    """
+    return await asyncio.to_thread(retrieve_product_info, text, numberOfResults, score)
+
+
 def filter_results_by_score(results: List[Dict[str, Any]], min_score: float) -> List[Dict[str, Any]]:
     """Filter results based on minimum score threshold."""
     return [result for result in results if result.get("score", 0.0) >= min_score]
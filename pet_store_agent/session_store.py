@@ -0,0 +1,319 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Bounded SQLite checkpointer for multi-turn sessions.
+
+Requests that carry a session id resume the conversation stored under that id in
+a local SQLite file. The store is kept bounded in three ways:
+- Only the newest checkpoints of each session are kept; older ones and their
+  pending writes are deleted when a new checkpoint is written.
+- Sessions idle for longer than the TTL are evicted, and when the store grows
+  beyond its size limit or session limit the least recently used sessions go
+  first. Eviction runs on the write path at most once per eviction interval.
+- trim_history, installed as the session agent's pre-model hook, keeps the
+  message window to the most recent user turns, so a long session does not grow
+  without bound.
+- The lookups prefetched for a request are not saved with the conversation: a
+  session run passes them in its config under SESSION_CONTEXT_KEY, and
+  with_session_context places them after the request in the model's input.
+
+Checkpoint reads and writes are recorded as "checkpoint" operations in telemetry.
+
+Configuration is read from the environment:
+    SESSIONS_ENABLED                   persist sessions that carry a session id (default true)
+    SESSION_STORE_PATH                 SQLite file (default /tmp/pet_store_sessions.sqlite)
+    SESSION_TTL_SECONDS                idle time before a session is evicted (default 3600)
+    SESSION_STORE_MAX_BYTES            checkpoint bytes kept across all sessions (default 67108864)
+    SESSION_STORE_MAX_SESSIONS         sessions kept (default 10000)
+    SESSION_MAX_CHECKPOINTS            checkpoints kept per session (default 2)
+    SESSION_HISTORY_TURNS              user turns kept in the message window (default 5)
+    SESSION_EVICTION_INTERVAL_SECONDS  minimum time between eviction passes (default 30)
+"""
+
+import os
+import re
+import time
+import asyncio
+import logging
+import functools
+import sqlite3
+import threading
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Tuple
+
+from langchain_core.messages import HumanMessage, RemoveMessage
+
+from config import env_flag, env_int
+from telemetry import operation
+
+logger = logging.getLogger(__name__)
+
+# Run config key (under "configurable") holding the prefetched messages of a session run
+SESSION_CONTEXT_KEY = "session_context"
+
+_SESSION_ID = re.compile(r"^[A-Za-z0-9._:@-]{1,128}$")
+
+_checkpointer = None
+_checkpointer_lock = threading.Lock()
+
+
+def sessions_enabled() -> bool:
+    return env_flag('SESSIONS_ENABLED')
+
+
+def validate_session_id(session_id: Any) -> str:
+    """Return session_id if it is a usable session id, otherwise raise ValueError."""
+    if not isinstance(session_id, str) or not _SESSION_ID.match(session_id):
+        raise ValueError("session_id must be 1-128 characters of letters, digits and . _ : @ -")
+    return session_id
+
+
+def trim_history(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pre-model hook that keeps the message window to the most recent user turns.
+
+    A turn starts at a HumanMessage, so the tool calls and tool results of kept
+    turns stay paired. The current turn is always kept.
+    """
+    # Imported here: the graph running this hook has already loaded langgraph.graph
+    from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+    messages = state["messages"]
+    turns = max(1, env_int('SESSION_HISTORY_TURNS', 5))
+    starts = [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+    if len(starts) <= turns:
+        return {}
+    kept = messages[starts[-turns]:]
+    logger.info(f"Trimming session history from {len(messages)} to {len(kept)} messages")
+    return {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES)] + kept}
+
+
+def with_session_context(state: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Prompt input of the session agent: the state with the run's prefetched messages
+    placed after the latest request. They reach the model without entering the
+    state, so they are not saved in the session's checkpoints.
+    """
+    context = (config.get("configurable") or {}).get(SESSION_CONTEXT_KEY)
+    messages = state["messages"]
+    starts = [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+    if not context or not starts:
+        return state
+    return {**state, "messages": messages[:starts[-1] + 1] + list(context) + messages[starts[-1] + 1:]}
+
+
+@functools.lru_cache(maxsize=None)
+def session_checkpointer_class() -> type:
+    """
+    Return the SessionCheckpointer class. It subclasses LangGraph's SqliteSaver, so it
+    is defined on first use, when the checkpointer is built during warm-up, rather
+    than when this module is imported.
+    """
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    class SessionCheckpointer(SqliteSaver):
+        """SqliteSaver that prunes old checkpoints and evicts idle or excess sessions."""
+
+        def __init__(
+            self,
+            conn: sqlite3.Connection,
+            ttl_seconds: float = 3600.0,
+            max_bytes: int = 64 * 1024 * 1024,
+            max_sessions: int = 10000,
+            max_checkpoints: int = 2,
+            eviction_interval: float = 30.0,
+            clock=time.time,
+        ):
+            super().__init__(conn)
+            self.ttl_seconds = ttl_seconds
+            self.max_bytes = max_bytes
+            self.max_sessions = max_sessions
+            self.max_checkpoints = max(1, max_checkpoints)
+            self.eviction_interval = eviction_interval
+            self._clock = clock
+            self._last_eviction = 0.0
+            self._evicted = 0
+
+        @classmethod
+        def from_path(cls, path: str, **kwargs) -> "SessionCheckpointer":
+            """Open (or create) the store at path; ":memory:" keeps it in memory."""
+            if path != ":memory:" and os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            return cls(sqlite3.connect(path, check_same_thread=False), **kwargs)
+
+        def setup(self) -> None:
+            if self.is_setup:
+                return
+            # Must precede table creation to take effect; lets evictions give pages back to the file system
+            self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            super().setup()
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "thread_id TEXT PRIMARY KEY, updated_at REAL NOT NULL, bytes INTEGER NOT NULL DEFAULT 0)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+            self.conn.commit()
+
+        def get_tuple(self, config):
+            with operation("checkpoint", "get") as op:
+                checkpoint = super().get_tuple(config)
+                op.set(cache="hit" if checkpoint is not None else "miss")
+                return checkpoint
+
+        def put(self, config, checkpoint, metadata, new_versions):
+            with operation("checkpoint", "put") as op:
+                saved = super().put(config, checkpoint, metadata, new_versions)
+                thread_id = str(config["configurable"]["thread_id"])
+                with self.cursor() as cur:
+                    self._prune(cur, thread_id, config["configurable"].get("checkpoint_ns", ""))
+                    size = self._session_bytes(cur, thread_id)
+                    cur.execute(
+                        "INSERT OR REPLACE INTO sessions (thread_id, updated_at, bytes) VALUES (?, ?, ?)",
+                        (thread_id, self._clock(), size),
+                    )
+                op.set(payload_bytes=size)
+                self._maybe_evict()
+                return saved
+
+        def delete_thread(self, thread_id: str) -> None:
+            super().delete_thread(thread_id)
+            with self.cursor() as cur:
+                cur.execute("DELETE FROM sessions WHERE thread_id = ?", (str(thread_id),))
+
+        def _prune(self, cur: sqlite3.Cursor, thread_id: str, checkpoint_ns: str) -> None:
+            """Delete all but the newest max_checkpoints checkpoints of a thread, with their writes."""
+            cur.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+                (thread_id, checkpoint_ns, self.max_checkpoints),
+            )
+            stale = [(thread_id, checkpoint_ns, row[0]) for row in cur.fetchall()]
+            if stale:
+                cur.executemany("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", stale)
+                cur.executemany("DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", stale)
+
+        @staticmethod
+        def _session_bytes(cur: sqlite3.Cursor, thread_id: str) -> int:
+            cur.execute(
+                "SELECT COALESCE(SUM(LENGTH(checkpoint) + LENGTH(metadata)), 0) FROM checkpoints WHERE thread_id = ?",
+                (thread_id,),
+            )
+            size = cur.fetchone()[0]
+            cur.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM writes WHERE thread_id = ?", (thread_id,))
+            return size + cur.fetchone()[0]
+
+        def _maybe_evict(self) -> None:
+            now = self._clock()
+            if now - self._last_eviction < self.eviction_interval:
+                return
+            self._last_eviction = now
+            self.evict(now)
+
+        def evict(self, now: Optional[float] = None) -> int:
+            """
+            Evict expired sessions, then the least recently used ones while the store is over its limits.
+
+            Returns:
+                The number of sessions evicted.
+            """
+            now = self._clock() if now is None else now
+            with self.cursor() as cur:
+                cur.execute("SELECT thread_id FROM sessions WHERE updated_at < ?", (now - self.ttl_seconds,))
+                victims = [row[0] for row in cur.fetchall()]
+
+                cur.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM sessions WHERE updated_at >= ?", (now - self.ttl_seconds,))
+                count, total = cur.fetchone()
+                if count > self.max_sessions or total > self.max_bytes:
+                    cur.execute("SELECT thread_id, bytes FROM sessions WHERE updated_at >= ? ORDER BY updated_at", (now - self.ttl_seconds,))
+                    for thread_id, size in cur.fetchall():
+                        if count <= self.max_sessions and total <= self.max_bytes:
+                            break
+                        victims.append(thread_id)
+                        count -= 1
+                        total -= size
+
+                if victims:
+                    rows = [(thread_id,) for thread_id in victims]
+                    cur.executemany("DELETE FROM checkpoints WHERE thread_id = ?", rows)
+                    cur.executemany("DELETE FROM writes WHERE thread_id = ?", rows)
+                    cur.executemany("DELETE FROM sessions WHERE thread_id = ?", rows)
+                    cur.execute("PRAGMA incremental_vacuum")
+            if victims:
+                self._evicted += len(victims)
+                logger.info(f"Evicted {len(victims)} sessions")
+            return len(victims)
+
+        def stats(self) -> Dict[str, Any]:
+            """Return the number of sessions, their checkpoint bytes, the file size and sessions evicted so far."""
+            with self.cursor(transaction=False) as cur:
+                cur.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM sessions")
+                sessions, checkpoint_bytes = cur.fetchone()
+                cur.execute("PRAGMA page_count")
+                pages = cur.fetchone()[0]
+                cur.execute("PRAGMA page_size")
+                page_size = cur.fetchone()[0]
+            return {
+                "sessions": sessions,
+                "checkpoint_bytes": checkpoint_bytes,
+                "file_bytes": pages * page_size,
+                "evicted": self._evicted,
+            }
+
+        # SQLite calls are short and local, so the async interface runs the sync one in a thread
+
+        async def aget_tuple(self, config):
+            return await asyncio.to_thread(self.get_tuple, config)
+
+        async def alist(self, config, *, filter=None, before=None, limit=None) -> AsyncIterator[Any]:
+            checkpoints = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+            for checkpoint in checkpoints:
+                yield checkpoint
+
+        async def aput(self, config, checkpoint, metadata, new_versions):
+            return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+        async def aput_writes(self, config, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+            await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+        async def adelete_thread(self, thread_id: str) -> None:
+            await asyncio.to_thread(self.delete_thread, thread_id)
+
+    return SessionCheckpointer
+
+
+def __getattr__(name: str) -> Any:
+    # session_store.SessionCheckpointer keeps working; the class is only built when asked for
+    if name == "SessionCheckpointer":
+        return session_checkpointer_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_checkpointer() -> Any:
+    """Return the process-wide session checkpointer, opening the store on first use."""
+    global _checkpointer
+
+    if _checkpointer is None:
+        with _checkpointer_lock:
+            if _checkpointer is None:
+                path = os.environ.get('SESSION_STORE_PATH', '/tmp/pet_store_sessions.sqlite')
+                logger.info(f"Opening session store {path}")
+                _checkpointer = session_checkpointer_class().from_path(
+                    path,
+                    ttl_seconds=env_int('SESSION_TTL_SECONDS', 3600),
+                    max_bytes=env_int('SESSION_STORE_MAX_BYTES', 64 * 1024 * 1024),
+                    max_sessions=env_int('SESSION_STORE_MAX_SESSIONS', 10000),
+                    max_checkpoints=env_int('SESSION_MAX_CHECKPOINTS', 2),
+                    eviction_interval=env_int('SESSION_EVICTION_INTERVAL_SECONDS', 30),
+                )
+    return _checkpointer
+
+
+def reset_checkpointer() -> None:
+    """Close the process-wide checkpointer so that the next use reopens the store."""
+    global _checkpointer
+
+    with _checkpointer_lock:
+        if _checkpointer is not None:
+            _checkpointer.conn.close()
+        _checkpointer = None
@@ -0,0 +1,403 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Resilient invocation of the Lambda-backed system functions.
+
+All inventory and user lookups go through invoke_system_function, which adds per
+Lambda function:
+- A circuit breaker. After LAMBDA_BREAKER_FAILURES consecutive failed attempts it
+  opens and calls fail immediately; after LAMBDA_BREAKER_RESET_SECONDS one probe
+  call is let through, and its outcome closes or re-opens the breaker.
+- Hedging. When an attempt has not answered within the function's recent p95
+  latency, a duplicate request is sent and the first answer wins. The system
+  functions only read data, so duplicates are safe.
+- Retries with full jitter for throttling, server and connection errors.
+- A retry budget shared by retries and hedges and refilled by successful calls, so
+  a struggling function does not receive multiplied load.
+
+Failures raise SystemFunctionError. Its message is a compact JSON object that the
+tools pass on to the model, so the model can answer with the Error status at once.
+
+Configuration is read from the environment:
+    LAMBDA_TIMEOUT_SECONDS         overall time allowed per call, capped by the request deadline (default 10)
+    LAMBDA_MAX_ATTEMPTS            attempts per call, including retries (default 3)
+    LAMBDA_RETRY_BASE_MS           base of the exponential retry backoff (default 50)
+    LAMBDA_RETRY_BUDGET_RATIO      retry tokens earned per successful call (default 0.1)
+    LAMBDA_RETRY_BUDGET_MAX        retry budget capacity in tokens (default 10)
+    LAMBDA_HEDGING_ENABLED         send hedged requests (default true)
+    LAMBDA_HEDGE_MIN_DELAY_MS      lower bound of the hedge delay (default 50)
+    LAMBDA_HEDGE_DEFAULT_DELAY_MS  hedge delay until enough latency samples exist (default 1000)
+    LAMBDA_BREAKER_FAILURES        consecutive failures that open the breaker (default 5)
+    LAMBDA_BREAKER_RESET_SECONDS   time the breaker stays open (default 30)
+    LAMBDA_MAX_CONCURRENCY         worker threads for in-flight invocations (default 32)
+"""
+
+import json
+import time
+import random
+import logging
+import threading
+import contextvars
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Optional, Tuple
+
+from aws_clients import get_lambda_client, lambda_call_timeout
+from config import env_flag, env_float, env_int
+from deadline import current_deadline
+from telemetry import annotate, percentile
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Latency samples needed before the hedge delay follows the observed p95
+MIN_LATENCY_SAMPLES = 20
+LATENCY_WINDOW = 200
+MAX_BACKOFF_SECONDS = 2.0
+
+_THROTTLING_CODES = {"TooManyRequestsException", "ThrottlingException", "EC2ThrottledException", "RequestLimitExceeded"}
+_UNAVAILABLE_CODES = {"ServiceException", "ResourceNotReadyException", "ServiceUnavailableException", "RequestTimeout"}
+
+
+def _hedging_enabled() -> bool:
+    return env_flag('LAMBDA_HEDGING_ENABLED')
+
+
+class SystemFunctionError(Exception):
+    """A system function call that failed; str() is a JSON object for the model."""
+
+    def __init__(self, kind: str, function: str, detail: str, retryable: bool = False):
+        self.kind = kind
+        self.function = function
+        self.detail = detail
+        self.retryable = retryable
+        super().__init__(json.dumps({"error": kind, "function": function, "retryable": retryable, "detail": detail}))
+
+
+def _classify(error: BaseException) -> Tuple[str, bool]:
+    """Return the error kind and whether another attempt may succeed."""
+    if isinstance(error, SystemFunctionError):
+        return error.kind, error.retryable
+    # botocore is loaded by the time a Lambda client has raised; importing it here keeps it off the import path
+    from botocore.exceptions import BotoCoreError, ClientError, ConnectionError as BotoConnectionError, HTTPClientError
+    if isinstance(error, ClientError):
+        code = error.response.get("Error", {}).get("Code", "")
+        status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode") or 0
+        if code in _THROTTLING_CODES or status == 429:
+            return "throttled", True
+        if code in _UNAVAILABLE_CODES or status >= 500:
+            return "unavailable", True
+        return "rejected", False
+    if isinstance(error, (BotoConnectionError, HTTPClientError)):
+        return "unavailable", True
+    if isinstance(error, BotoCoreError):
+        return "rejected", False
+    return "failed", False
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe."""
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self._clock() >= self._opened_at + self.reset_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Return True if a call may go ahead; in half-open state only one probe is allowed."""
+        with self._lock:
+            if self._state == OPEN:
+                if self._clock() < self._opened_at + self.reset_seconds:
+                    return False
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def release_probe(self) -> None:
+        """Let another call probe a half-open breaker without recording an outcome."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info("Circuit breaker closed")
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    logger.warning(f"Circuit breaker opened after {self._failures} failures")
+                self._state = OPEN
+                self._opened_at = self._clock()
+                self._probing = False
+
+
+class RetryBudget:
+    """Token bucket limiting retries and hedges to a fraction of successful calls."""
+
+    def __init__(self, ratio: float = 0.1, capacity: float = 10.0):
+        self.ratio = ratio
+        self.capacity = capacity
+        self._tokens = capacity
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            return self._tokens
+
+
+class _FunctionState:
+    """Breaker, retry budget, latency window and counters for one Lambda function."""
+
+    def __init__(self):
+        self.breaker = CircuitBreaker(
+            env_int('LAMBDA_BREAKER_FAILURES', 5),
+            env_float('LAMBDA_BREAKER_RESET_SECONDS', 30),
+        )
+        self.budget = RetryBudget(
+            env_float('LAMBDA_RETRY_BUDGET_RATIO', 0.1),
+            env_float('LAMBDA_RETRY_BUDGET_MAX', 10),
+        )
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.counters = Counter()
+        self.lock = threading.Lock()
+
+    def count(self, counter: str) -> None:
+        with self.lock:
+            self.counters[counter] += 1
+
+    def record_latency(self, seconds: float) -> None:
+        with self.lock:
+            self.latencies.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        with self.lock:
+            if len(self.latencies) < MIN_LATENCY_SAMPLES:
+                return None
+            samples = list(self.latencies)
+        return percentile(samples, 95)
+
+    def hedge_delay(self) -> float:
+        p95 = self.p95()
+        if p95 is None:
+            return env_float('LAMBDA_HEDGE_DEFAULT_DELAY_MS', 1000) / 1000
+        return max(p95, env_float('LAMBDA_HEDGE_MIN_DELAY_MS', 50) / 1000)
+
+
+_states: Dict[str, _FunctionState] = {}
+_states_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _state(function_name: str) -> _FunctionState:
+    state = _states.get(function_name)
+    if state is None:
+        with _states_lock:
+            state = _states.setdefault(function_name, _FunctionState())
+    return state
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=env_int('LAMBDA_MAX_CONCURRENCY', 32), thread_name_prefix="system-function")
+    return _executor
+
+
+def _invoke_once(client: Any, function_name: str, payload: str) -> Tuple[Any, float]:
+    """Invoke the function once and return the decoded response body and the call latency."""
+    started = time.perf_counter()
+    response = client.invoke(FunctionName=function_name, Payload=payload)
+    elapsed = time.perf_counter() - started
+    if response.get("FunctionError"):
+        detail = response["Payload"].read().decode("utf-8", "replace")[:200]
+        raise SystemFunctionError("function_error", function_name, detail)
+    try:
+        lambda_response = json.loads(response['Payload'].read())
+        # Extract the actual data from the nested response structure
+        return json.loads(lambda_response['response']['functionResponse']['responseBody']['TEXT']['body']), elapsed
+    except (KeyError, TypeError, ValueError) as e:
+        raise SystemFunctionError("bad_response", function_name, f"Unexpected response: {str(e)}")
+
+
+def _attempt(state: _FunctionState, client: Any, function_name: str, payload: str, deadline: float) -> Tuple[Any, bool]:
+    """
+    Run one attempt, hedged with a duplicate request when it is slower than the recent p95.
+
+    Returns:
+        Tuple of (decoded body, True if the hedged request answered first).
+    """
+    executor = _get_executor()
+    # Run in a copy of the caller's context so client spans nest under the tool span
+    primary = executor.submit(contextvars.copy_context().run, _invoke_once, client, function_name, payload)
+    pending = {primary}
+    hedge_at = time.monotonic() + state.hedge_delay() if _hedging_enabled() else None
+    error = None
+
+    while pending:
+        now = time.monotonic()
+        if now >= deadline:
+            raise SystemFunctionError("timeout", function_name, "No response before the deadline", retryable=False)
+        timeout = deadline - now if hedge_at is None else max(0.0, min(deadline, hedge_at) - now)
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            if future.exception() is None:
+                body, elapsed = future.result()
+                state.record_latency(elapsed)
+                return body, future is not primary
+            error = future.exception()
+            state.breaker.record_failure()
+
+        if hedge_at is not None and pending and time.monotonic() >= hedge_at:
+            hedge_at = None
+            if state.breaker.state == CLOSED and state.budget.withdraw():
+                state.count("hedges")
+                pending.add(executor.submit(contextvars.copy_context().run, _invoke_once, client, function_name, payload))
+
+    raise error
+
+
+def invoke_system_function(function_name: str, function: str, parameters: Dict[str, Any]) -> Any:
+    """
+    Invoke a system function Lambda through the circuit breaker, hedging and retries.
+
+    Args:
+        function_name: Lambda function name, e.g. the value of SYSTEM_FUNCTION_1_NAME.
+        function: System function, e.g. "getInventory".
+        parameters: Parameter values by name.
+
+    Returns:
+        The decoded response body.
+
+    Raises:
+        SystemFunctionError: The breaker is open, the deadline passed or the call failed.
+    """
+    state = _state(function_name)
+    state.count("calls")
+
+    deadline = time.monotonic() + lambda_call_timeout()
+    # Never wait past the deadline of the request being processed
+    request_deadline = current_deadline()
+    bounded_by_request = request_deadline is not None and request_deadline.expires_at < deadline
+    if bounded_by_request:
+        deadline = request_deadline.expires_at
+        if deadline <= time.monotonic():
+            state.count("failures.deadline_exceeded")
+            raise SystemFunctionError("deadline_exceeded", function_name, "Request deadline exceeded")
+
+    if not state.breaker.allow():
+        state.count("short_circuited")
+        annotate(breaker=OPEN)
+        raise SystemFunctionError("circuit_open", function_name, "Temporarily unavailable after repeated failures")
+
+    payload = json.dumps({
+        "function": function,
+        "parameters": [{"name": name, "value": value} for name, value in parameters.items()],
+    })
+    client = get_lambda_client()
+    max_attempts = max(1, env_int('LAMBDA_MAX_ATTEMPTS', 3))
+    base = env_float('LAMBDA_RETRY_BASE_MS', 50) / 1000
+
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            body, hedge_won = _attempt(state, client, function_name, payload, deadline)
+        except Exception as e:
+            kind, retryable = _classify(e)
+            if kind == "timeout" and bounded_by_request:
+                # The request ran out of time, not the function; release a half-open probe without judging it
+                kind = "deadline_exceeded"
+                state.breaker.release_probe()
+            elif kind == "timeout":
+                state.breaker.record_failure()
+            backoff = random.uniform(0, min(MAX_BACKOFF_SECONDS, base * 2 ** (attempt - 1)))
+            if (
+                retryable
+                and attempt < max_attempts
+                and time.monotonic() + backoff < deadline
+                and state.breaker.state == CLOSED
+                and state.budget.withdraw()
+            ):
+                logger.warning(f"{function} attempt {attempt} failed ({kind}), retrying in {backoff * 1000:.0f} ms")
+                state.count("retries")
+                time.sleep(backoff)
+                continue
+            state.count("failures")
+            state.count(f"failures.{kind}")
+            annotate(retries=attempt - 1, breaker=state.breaker.state)
+            if isinstance(e, SystemFunctionError) and e.kind == kind:
+                raise
+            # Retries are already spent here, so the model should not call the tool again
+            raise SystemFunctionError(kind, function_name, getattr(e, "detail", str(e))) from e
+
+        state.breaker.record_success()
+        state.budget.deposit()
+        state.count("successes")
+        if hedge_won:
+            state.count("hedge_wins")
+        annotate(retries=attempt - 1, hedged=hedge_won or None)
+        return body
+
+
+def invocation_stats() -> Dict[str, Dict[str, Any]]:
+    """Return per-function counters, breaker state, retry budget and p95 latency."""
+    stats = {}
+    for function_name, state in list(_states.items()):
+        with state.lock:
+            counters = dict(state.counters)
+        p95 = state.p95()
+        stats[function_name] = {
+            **counters,
+            "breaker": state.breaker.state,
+            "retry_budget": round(state.budget.tokens, 2),
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+    return stats
+
+
+def reset_invocation_state() -> None:
+    """Forget breakers, budgets, latency windows and counters, e.g. between benchmark runs."""
+    with _states_lock:
+        _states.clear()
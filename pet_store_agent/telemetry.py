@@ -0,0 +1,324 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Latency instrumentation for tool calls, model calls and graph nodes.
+
+Every measured operation becomes an OpenTelemetry span plus histogram samples
+(duration, payload and response bytes), tagged with its kind ("tool", "model" or
+"node"), name, status, cache outcome and retry count. The OpenTelemetry API is
+optional: without it, or without a configured SDK, spans and metrics are no-ops.
+
+The same records are delivered to in-process exporters, so tests and benchmarks
+can collect them without a collector:
+
+    with telemetry.capture() as exporter:
+        process_request(prompt)
+    exporter.records  # list of dicts
+
+At the end of each request, record_usage() emits its model turns, tool calls,
+tokens and estimated cost (usage.py) as histograms and as a "request" record.
+"""
+
+import time
+import json
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from functools import wraps
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+try:
+    from opentelemetry import trace, metrics
+except ImportError:
+    trace = None
+    metrics = None
+
+logger = logging.getLogger(__name__)
+
+INSTRUMENTATION_NAME = "pet_store_agent"
+
+_current = contextvars.ContextVar("pet_store_agent_span", default=None)
+_exporters: List["InMemoryExporter"] = []
+_exporters_lock = threading.Lock()
+_instruments = None
+_instruments_lock = threading.Lock()
+
+
+def _get_instruments():
+    """Create the tracer and histograms on first use, once OpenTelemetry has been configured."""
+    global _instruments
+
+    if trace is None:
+        return None
+    if _instruments is None:
+        with _instruments_lock:
+            if _instruments is None:
+                meter = metrics.get_meter(INSTRUMENTATION_NAME)
+                _instruments = {
+                    "tracer": trace.get_tracer(INSTRUMENTATION_NAME),
+                    "duration": meter.create_histogram("agent.operation.duration", unit="ms", description="Duration of tool calls, model calls and graph nodes"),
+                    "payload": meter.create_histogram("agent.operation.payload_size", unit="By", description="Request payload size"),
+                    "response": meter.create_histogram("agent.operation.response_size", unit="By", description="Response size"),
+                    "tokens": meter.create_histogram("agent.request.tokens", unit="{token}", description="Model tokens per request"),
+                    "model_turns": meter.create_histogram("agent.request.model_turns", unit="{turn}", description="Model turns per request"),
+                    "tool_calls": meter.create_histogram("agent.request.tool_calls", unit="{call}", description="Tool calls per request"),
+                    "cost": meter.create_histogram("agent.request.cost", unit="USD", description="Estimated model cost per request"),
+                }
+    return _instruments
+
+
+class InMemoryExporter:
+    """Collects operation records in memory."""
+
+    def __init__(self):
+        self.records: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def export(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self.records.append(record)
+
+    def by_kind(self, kind: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [record for record in self.records if record["kind"] == kind]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.records.clear()
+
+
+def add_exporter(exporter: InMemoryExporter) -> None:
+    with _exporters_lock:
+        _exporters.append(exporter)
+
+
+def remove_exporter(exporter: InMemoryExporter) -> None:
+    with _exporters_lock:
+        if exporter in _exporters:
+            _exporters.remove(exporter)
+
+
+@contextmanager
+def capture():
+    """Collect records emitted inside the block into a new InMemoryExporter."""
+    exporter = InMemoryExporter()
+    add_exporter(exporter)
+    try:
+        yield exporter
+    finally:
+        remove_exporter(exporter)
+
+
+class Operation:
+    """A measured operation; attributes can be filled in while it runs."""
+
+    def __init__(self, kind: str, name: str, **attributes):
+        self.kind = kind
+        self.name = name
+        self.attributes: Dict[str, Any] = {"status": "ok", **attributes}
+        self.start = time.perf_counter()
+        self.span = None
+        instruments = _get_instruments()
+        if instruments is not None:
+            self.span = instruments["tracer"].start_span(f"{kind} {name}")
+
+    def set(self, **attributes) -> None:
+        self.attributes.update({key: value for key, value in attributes.items() if value is not None})
+
+    def finish(self) -> Dict[str, Any]:
+        duration_ms = (time.perf_counter() - self.start) * 1000
+        record = {"kind": self.kind, "name": self.name, "duration_ms": round(duration_ms, 3), **self.attributes}
+
+        metric_attributes = {
+            "kind": self.kind,
+            "name": self.name,
+            "status": str(self.attributes["status"]),
+        }
+        if "cache" in self.attributes:
+            metric_attributes["cache"] = str(self.attributes["cache"])
+
+        instruments = _get_instruments()
+        if instruments is not None:
+            instruments["duration"].record(duration_ms, metric_attributes)
+            if "payload_bytes" in self.attributes:
+                instruments["payload"].record(self.attributes["payload_bytes"], metric_attributes)
+            if "response_bytes" in self.attributes:
+                instruments["response"].record(self.attributes["response_bytes"], metric_attributes)
+        if self.span is not None:
+            for key, value in self.attributes.items():
+                if isinstance(value, (str, bool, int, float)):
+                    self.span.set_attribute(f"agent.{key}", value)
+            self.span.end()
+
+        with _exporters_lock:
+            exporters = list(_exporters)
+        for exporter in exporters:
+            exporter.export(record)
+        return record
+
+
+@contextmanager
+def operation(kind: str, name: str, **attributes):
+    """Measure the enclosed block as an operation; annotate() inside it adds attributes."""
+    op = Operation(kind, name, **attributes)
+    token = _current.set(op)
+    # Make the span current so client spans (e.g. botocore) nest under it
+    span_context = trace.use_span(op.span, end_on_exit=False) if op.span is not None else nullcontext()
+    try:
+        with span_context:
+            yield op
+    except BaseException as e:
+        op.set(status="error", error=type(e).__name__)
+        raise
+    finally:
+        _current.reset(token)
+        op.finish()
+
+
+def annotate(**attributes) -> None:
+    """Add attributes such as cache="hit" or retries=1 to the operation currently running, if any."""
+    op = _current.get()
+    if op is not None:
+        op.set(**attributes)
+
+
+def record_usage(usage: Dict[str, Any], duration_ms: float, **attributes) -> Dict[str, Any]:
+    """
+    Record a request's usage as metrics and deliver it to the exporters as a "request" record.
+
+    Args:
+        usage: The usage report of the request (usage.usage_report()).
+        duration_ms: Request duration.
+        attributes: Request attributes such as tier="fast" or stopped="turn_budget".
+    """
+    tokens = usage["tokens"]
+    record = {
+        "kind": "request",
+        "name": "usage",
+        "duration_ms": round(duration_ms, 3),
+        "model_turns": usage["model_turns"],
+        "tool_calls": usage["tool_calls"],
+        "input_tokens": tokens["input"],
+        "output_tokens": tokens["output"],
+        "cache_read_tokens": tokens["cache_read"],
+        "cost_usd": usage["cost_usd"],
+        **{key: value for key, value in attributes.items() if value is not None},
+    }
+
+    instruments = _get_instruments()
+    if instruments is not None:
+        metric_attributes = {key: str(value) for key, value in attributes.items() if value is not None}
+        for kind in ("input", "output", "cache_read"):
+            instruments["tokens"].record(tokens[kind], {**metric_attributes, "type": kind})
+        instruments["model_turns"].record(usage["model_turns"], metric_attributes)
+        instruments["tool_calls"].record(usage["tool_calls"], metric_attributes)
+        instruments["cost"].record(usage["cost_usd"], metric_attributes)
+
+    with _exporters_lock:
+        exporters = list(_exporters)
+    for exporter in exporters:
+        exporter.export(record)
+    return record
+
+
+def percentile(values: Iterable[float], pct: float, digits: Optional[int] = None) -> Optional[float]:
+    """Return the pct-th percentile of values by nearest rank, rounded to digits when given; None without values."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    value = ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+    return round(value, digits) if digits is not None else value
+
+
+def _size(value: Any) -> int:
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if not isinstance(value, str):
+        try:
+            value = json.dumps(value, default=str)
+        except (TypeError, ValueError):
+            value = str(value)
+    return len(value.encode("utf-8"))
+
+
+# Prefixes of the error strings the tools return to the model
+TOOL_ERROR_PREFIXES = ("Failed to", "Error")
+
+
+def is_tool_error(result: Any) -> bool:
+    """Return whether a tool result is one of the error strings the tools return to the model."""
+    return isinstance(result, str) and result.startswith(TOOL_ERROR_PREFIXES)
+
+
+def traced_tool(func: Callable) -> Callable:
+    """Decorate a tool function so each call is measured as a "tool" operation."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with operation("tool", func.__name__, payload_bytes=_size([args, kwargs])) as op:
+            result = func(*args, **kwargs)
+            op.set(response_bytes=_size(result))
+            if is_tool_error(result):
+                op.set(status="error")
+            return result
+    return wrapper
+
+
+class TelemetryCallbackHandler(BaseCallbackHandler):
+    """LangChain callback handler that measures model calls and LangGraph nodes."""
+
+    def __init__(self):
+        self._operations: Dict[Any, Operation] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, kind: str, name: str, **attributes) -> None:
+        with self._lock:
+            self._operations[run_id] = Operation(kind, name, **attributes)
+
+    def _finish(self, run_id, **attributes) -> None:
+        with self._lock:
+            op = self._operations.pop(run_id, None)
+        if op is not None:
+            op.set(**attributes)
+            op.finish()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        name = (kwargs.get("metadata") or {}).get("ls_model_name") or kwargs.get("name") or "chat_model"
+        payload = sum(_size(m.content) for batch in messages for m in batch)
+        self._start(run_id, "model", name, payload_bytes=payload)
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        response_bytes = 0
+        usage = {}
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                response_bytes += _size(getattr(message, "content", generation.text))
+                if message is not None and getattr(message, "tool_calls", None):
+                    response_bytes += _size(message.tool_calls)
+                if message is not None and getattr(message, "usage_metadata", None):
+                    usage = message.usage_metadata
+        self._finish(
+            run_id,
+            response_bytes=response_bytes,
+            input_tokens=usage.get("input_tokens"),
+            output_tokens=usage.get("output_tokens"),
+        )
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self._finish(run_id, status="error", error=type(error).__name__)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs) -> None:
+        node = (metadata or {}).get("langgraph_node")
+        # Only the node runnable itself, not the runnables nested inside it
+        if node and kwargs.get("name") == node:
+            self._start(run_id, "node", node)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs) -> None:
+        self._finish(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs) -> None:
+        self._finish(run_id, status="error", error=type(error).__name__)
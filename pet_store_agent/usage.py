@@ -0,0 +1,154 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Per-request usage accounting and budgets.
+
+The request's Deadline counts model turns, tool calls and tokens by model
+(DeadlineCallbackHandler fills them in from each model call's usage metadata,
+including prompt cache reads and writes). This module prices the tokens, reports
+the usage in the response metadata and holds the usage budgets.
+
+Budgets are checked together with the time budget between graph steps and before
+a re-ask or escalation. The request loop stops once a budget is spent, or when
+the next model turn would exceed the token or cost budget, assuming it uses as
+much as the previous turn did. A stopped request gets the schema-valid Error
+response. The model turn budget also bounds the graph recursion limit, so a
+runaway ReAct loop ends even between checks.
+
+Prices are estimates in USD per 1,000 tokens. Prompt cache reads are charged at
+CACHE_READ_PRICE_RATIO of the input price, and cache writes at the input price.
+Models without a price (e.g. stand-in models) are charged as DEFAULT_MODEL_ID.
+
+Configuration is read from the environment:
+    REQUEST_MAX_MODEL_TURNS  model turns per request, re-asks included (default 10, 0 for no limit)
+    REQUEST_MAX_TOOL_CALLS   tool calls per request (default 20, 0 for no limit)
+    REQUEST_MAX_TOKENS       input plus output tokens per request (default 0, no limit)
+    REQUEST_MAX_COST_USD     estimated model cost per request (default 0, no limit)
+    MODEL_PRICES             JSON object of model id to [input, output] USD per 1,000 tokens, overriding the built-in prices
+"""
+
+import os
+import json
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from config import env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+# Bedrock on-demand prices, USD per 1,000 input and output tokens
+DEFAULT_PRICES: Dict[str, Tuple[float, float]] = {
+    "us.amazon.nova-pro-v1:0": (0.0008, 0.0032),
+    "us.amazon.nova-lite-v1:0": (0.00006, 0.00024),
+    "us.amazon.nova-micro-v1:0": (0.000035, 0.00014),
+}
+DEFAULT_MODEL_ID = "us.amazon.nova-pro-v1:0"
+CACHE_READ_PRICE_RATIO = 0.25
+
+# Stop reasons of the usage budgets, as reported under deadline "stopped"
+TURN_BUDGET = "turn_budget"
+TOOL_BUDGET = "tool_budget"
+TOKEN_BUDGET = "token_budget"
+COST_BUDGET = "cost_budget"
+
+
+def model_prices() -> Dict[str, Tuple[float, float]]:
+    """Return the input and output prices per 1,000 tokens by model id, with the MODEL_PRICES overrides."""
+    prices = dict(DEFAULT_PRICES)
+    overrides = os.environ.get('MODEL_PRICES')
+    if overrides:
+        try:
+            prices.update({model: (float(p[0]), float(p[1])) for model, p in json.loads(overrides).items()})
+        except (ValueError, TypeError, IndexError, AttributeError) as e:
+            logger.warning(f"Ignoring MODEL_PRICES: {str(e)}")
+    return prices
+
+
+def estimate_cost(tokens_by_model: Dict[str, Dict[str, int]]) -> float:
+    """
+    Estimate the model cost of token counts.
+
+    Args:
+        tokens_by_model: Token counts by model id, with "input" (cache reads and writes included), "output" and "cache_read".
+
+    Returns:
+        The estimated cost in USD.
+    """
+    prices = model_prices()
+    cost = 0.0
+    for model, tokens in tokens_by_model.items():
+        input_price, output_price = prices.get(model) or prices.get(DEFAULT_MODEL_ID) or DEFAULT_PRICES[DEFAULT_MODEL_ID]
+        cache_read = tokens.get("cache_read", 0)
+        cost += (tokens.get("input", 0) - cache_read + cache_read * CACHE_READ_PRICE_RATIO) * input_price / 1000
+        cost += tokens.get("output", 0) * output_price / 1000
+    return cost
+
+
+class UsageBudget:
+    """Limits on the model turns, tool calls, tokens and estimated cost of one request; 0 means no limit."""
+
+    def __init__(self, max_model_turns: int = 0, max_tool_calls: int = 0, max_tokens: int = 0, max_cost_usd: float = 0.0):
+        self.max_model_turns = max_model_turns
+        self.max_tool_calls = max_tool_calls
+        self.max_tokens = max_tokens
+        self.max_cost_usd = max_cost_usd
+
+    @classmethod
+    def from_env(cls) -> "UsageBudget":
+        return cls(
+            max(0, env_int('REQUEST_MAX_MODEL_TURNS', 10)),
+            max(0, env_int('REQUEST_MAX_TOOL_CALLS', 20)),
+            max(0, env_int('REQUEST_MAX_TOKENS', 0)),
+            max(0.0, env_float('REQUEST_MAX_COST_USD', 0.0)),
+        )
+
+    def exceeded(self, deadline: Any) -> Optional[str]:
+        """Return the budget another model turn of the request would exceed, or None when it fits in all of them."""
+        if self.max_model_turns and deadline.model_turns >= self.max_model_turns:
+            return TURN_BUDGET
+        if self.max_tool_calls and deadline.tool_calls >= self.max_tool_calls:
+            return TOOL_BUDGET
+        last_turn = deadline.last_turn_tokens()
+        if self.max_tokens:
+            used = deadline.tokens["input"] + deadline.tokens["output"]
+            if used + last_turn["input"] + last_turn["output"] > self.max_tokens:
+                return TOKEN_BUDGET
+        if self.max_cost_usd:
+            next_turn = estimate_cost({last_turn["model"]: last_turn}) if last_turn["model"] is not None else 0.0
+            if estimate_cost(deadline.tokens_by_model()) + next_turn > self.max_cost_usd:
+                return COST_BUDGET
+        return None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "max_model_turns": self.max_model_turns or None,
+            "max_tool_calls": self.max_tool_calls or None,
+            "max_tokens": self.max_tokens or None,
+            "max_cost_usd": self.max_cost_usd or None,
+        }
+
+
+def usage_report(deadline: Any) -> Dict[str, Any]:
+    """
+    Summarize a request's usage for the response metadata.
+
+    Returns:
+        Dictionary with the model turns, tool calls, tokens (input, output,
+        cache_read, cache_write and total), tokens and estimated cost by model,
+        the total estimated cost in USD, the budgets and the budget that stopped
+        the request, if any.
+    """
+    by_model = deadline.tokens_by_model()
+    tokens = dict(deadline.tokens)
+    tokens["total"] = tokens["input"] + tokens["output"]
+    stopped = deadline.stopped if deadline.stopped in (TURN_BUDGET, TOOL_BUDGET, TOKEN_BUDGET, COST_BUDGET) else None
+    return {
+        "model_turns": deadline.model_turns,
+        "tool_calls": deadline.tool_calls,
+        "tokens": tokens,
+        "by_model": {model: {**counts, "cost_usd": round(estimate_cost({model: counts}), 6)} for model, counts in by_model.items()},
+        "cost_usd": round(estimate_cost(by_model), 6),
+        "budget": deadline.usage_budget.as_dict(),
+        "exceeded": stopped,
+    }
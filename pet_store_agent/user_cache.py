@@ -0,0 +1,289 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Bounded cache of user profiles, indexed by user id and by email.
+
+One record fetched by either lookup answers both: a lookup by email followed by
+one by id for the same customer, or the same lookup on every turn of a session,
+costs a single user-management call. The parsed record is stored; the tools
+serialize it for the model.
+
+Records have two lifetimes. Subscription fields go stale quickly, so a record is
+served from the cache for the short subscription TTL and fetched again after
+that. Until the record TTL it is still kept as a fallback, served only when the
+fetch fails. Unknown users (an {"error": ...} body saying the user was not found)
+are cached as negative entries for the negative TTL. Other error bodies, such as
+a timeout inside the function, are treated like a failed fetch and never cached.
+Records and negative entries are each bounded by the maximum number of entries,
+least recently used first, and invalidate_user() drops what is cached for a user
+by id or email.
+
+The cache is created from the settings below on first use; reset_user_cache()
+drops it so the next lookup creates it again.
+
+Configuration is read from the environment:
+    USER_CACHE_ENABLED                   enable the cache (default true)
+    USER_CACHE_MAX_ENTRIES               maximum number of cached users and of unknown users (default 1024)
+    USER_CACHE_TTL_SECONDS               record time to live, as a fallback when a fetch fails (default 300)
+    USER_CACHE_SUBSCRIPTION_TTL_SECONDS  time a record is served before it is fetched again (default 60)
+    USER_CACHE_NEGATIVE_TTL_SECONDS      time an unknown user is remembered (default 60)
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import env_flag, env_float, env_int
+from telemetry import annotate
+
+logger = logging.getLogger(__name__)
+
+# Lookup kinds, named after the tool parameters
+BY_ID = "user_id"
+BY_EMAIL = "user_email"
+
+LookupKey = Tuple[str, str]
+
+# Phrases in the error of a user-management body that mean the user does not exist
+NOT_FOUND_MARKERS = ("not found", "does not exist", "no such user", "unknown user")
+
+
+def is_not_found(body: Any) -> bool:
+    """Return whether a user-management body reports an unknown user, rather than a lookup that failed."""
+    if not isinstance(body, dict) or "error" not in body:
+        return False
+    return body.get("statusCode") == 404 or any(marker in str(body["error"]).lower() for marker in NOT_FOUND_MARKERS)
+
+
+def _normalize(kind: str, value: str) -> LookupKey:
+    value = (value or "").strip()
+    return (kind, value.lower() if kind == BY_EMAIL else value)
+
+
+class UserCache:
+    """Thread-safe LRU cache of user records under both of their keys, with negative entries for unknown users."""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 300.0,
+        subscription_ttl_seconds: float = 60.0,
+        negative_ttl_seconds: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.subscription_ttl_seconds = min(subscription_ttl_seconds, ttl_seconds)
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._clock = clock
+        # user id -> (fetched_at, record)
+        self._records: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # normalized email -> user id
+        self._emails: Dict[str, str] = {}
+        # lookup key -> (expires_at, not found body)
+        self._missing: "OrderedDict[LookupKey, Tuple[float, Any]]" = OrderedDict()
+        self._stats = {"hits": 0, "negative_hits": 0, "misses": 0, "refreshes": 0, "stale": 0, "evictions": 0, "invalidations": 0}
+        self._lock = threading.Lock()
+
+    def _find(self, key: LookupKey) -> Optional[Tuple[float, Dict[str, Any]]]:
+        kind, value = key
+        user_id = self._emails.get(value) if kind == BY_EMAIL else value
+        return self._records.get(user_id) if user_id is not None else None
+
+    def get_or_load(self, kind: str, value: str, loader: Callable[[], Any]) -> Any:
+        """
+        Return the user record for a lookup, loading it when it is not cached or its subscription data is stale.
+
+        Args:
+            kind: BY_ID or BY_EMAIL.
+            value: The user id or email looked up.
+            loader: Function invoking the user-management function and returning the decoded body.
+
+        Returns:
+            The user record, or the body returned for an unknown user. Loader errors, and
+            error bodies other than not found, are passed on unless a record within the
+            record TTL can be served instead.
+        """
+        key = _normalize(kind, value)
+        now = self._clock()
+        with self._lock:
+            missing = self._missing.get(key)
+            if missing is not None:
+                if missing[0] > now:
+                    self._missing.move_to_end(key)
+                    self._stats["negative_hits"] += 1
+                    annotate(cache="negative_hit")
+                    return missing[1]
+                del self._missing[key]
+
+            entry = self._find(key)
+            if entry is not None:
+                age = now - entry[0]
+                if age < self.subscription_ttl_seconds:
+                    self._records.move_to_end(str(entry[1]["id"]))
+                    self._stats["hits"] += 1
+                    annotate(cache="hit")
+                    return entry[1]
+                if age >= self.ttl_seconds:
+                    self._drop(entry[1])
+                    self._stats["evictions"] += 1
+                    entry = None
+            self._stats["refreshes" if entry is not None else "misses"] += 1
+
+        annotate(cache="refresh" if entry is not None else "miss")
+        try:
+            body = loader()
+        except Exception as e:
+            if entry is None:
+                raise
+            return self._serve_stale(entry, str(e))
+
+        if isinstance(body, dict) and body.get("id") and "error" not in body:
+            with self._lock:
+                self._store(key, body)
+        elif is_not_found(body):
+            with self._lock:
+                self._store_missing(key, body)
+        elif entry is not None:
+            return self._serve_stale(entry, str(body)[:200])
+        return body
+
+    def _serve_stale(self, entry: Tuple[float, Dict[str, Any]], error: str) -> Dict[str, Any]:
+        logger.warning(f"User lookup failed, serving the cached record: {error}")
+        with self._lock:
+            self._stats["stale"] += 1
+        annotate(cache="stale")
+        return entry[1]
+
+    def _store(self, key: LookupKey, record: Dict[str, Any]) -> None:
+        user_id = str(record["id"])
+        previous = self._records.pop(user_id, None)
+        if previous is not None:
+            self._drop(previous[1])
+        self._records[user_id] = (self._clock(), record)
+        keys = [(BY_ID, user_id)]
+        if isinstance(record.get("email"), str):
+            keys.append(_normalize(BY_EMAIL, record["email"]))
+        if key[0] == BY_EMAIL:
+            keys.append(key)
+        for kind, value in keys:
+            if kind == BY_EMAIL:
+                self._emails[value] = user_id
+            self._missing.pop((kind, value), None)
+        while len(self._records) > self.max_entries:
+            _, (_, evicted) = self._records.popitem(last=False)
+            self._drop(evicted)
+            self._stats["evictions"] += 1
+
+    def _store_missing(self, key: LookupKey, body: Any) -> None:
+        self._missing[key] = (self._clock() + self.negative_ttl_seconds, body)
+        self._missing.move_to_end(key)
+        while len(self._missing) > self.max_entries:
+            self._missing.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _drop(self, record: Dict[str, Any]) -> None:
+        """Remove a record and the emails pointing at it."""
+        user_id = str(record["id"])
+        self._records.pop(user_id, None)
+        for email in [email for email, owner in self._emails.items() if owner == user_id]:
+            del self._emails[email]
+
+    def invalidate_user(self, user_id: Optional[str] = None, user_email: Optional[str] = None) -> None:
+        """Drop the record and negative entries of a user, given by id or email, under both keys."""
+        with self._lock:
+            keys = [_normalize(kind, value) for kind, value in ((BY_ID, user_id), (BY_EMAIL, user_email)) if value]
+            records = [entry[1] for entry in map(self._find, keys) if entry is not None]
+            for record in records:
+                keys.append((BY_ID, str(record["id"])))
+                if isinstance(record.get("email"), str):
+                    keys.append(_normalize(BY_EMAIL, record["email"]))
+                self._drop(record)
+                self._stats["invalidations"] += 1
+            for key in keys:
+                self._missing.pop(key, None)
+
+    def invalidate(self) -> None:
+        """Drop all records and negative entries."""
+        with self._lock:
+            self._records.clear()
+            self._emails.clear()
+            self._missing.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the counters, the number of cached users and unknown users, and the hit rate of lookups."""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["negative_hits"] + self._stats["misses"] + self._stats["refreshes"]
+            served = self._stats["hits"] + self._stats["negative_hits"]
+            return {
+                **self._stats,
+                "users": len(self._records),
+                "unknown_users": len(self._missing),
+                "hit_rate": round(served / lookups, 4) if lookups else 0.0,
+            }
+
+
+def _enabled() -> bool:
+    return env_flag('USER_CACHE_ENABLED')
+
+
+def _new_cache() -> UserCache:
+    return UserCache(
+        env_int('USER_CACHE_MAX_ENTRIES', 1024),
+        env_float('USER_CACHE_TTL_SECONDS', 300),
+        env_float('USER_CACHE_SUBSCRIPTION_TTL_SECONDS', 60),
+        env_float('USER_CACHE_NEGATIVE_TTL_SECONDS', 60),
+    )
+
+
+_cache: Optional[UserCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_user_cache() -> UserCache:
+    """Return the shared user cache, creating it on first use."""
+    global _cache
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = _new_cache()
+    return _cache
+
+
+def reset_user_cache() -> None:
+    """Drop the shared user cache, e.g. after a configuration change."""
+    global _cache
+
+    with _cache_lock:
+        _cache = None
+
+
+def cached_user(kind: str, value: str, loader: Callable[[], Any]) -> Any:
+    """
+    Look up a user through the shared cache.
+
+    Args:
+        kind: BY_ID or BY_EMAIL.
+        value: The user id or email.
+        loader: Function invoking the user-management function and returning the decoded body.
+
+    Returns:
+        The decoded body: the user record, or the error body for an unknown user.
+    """
+    if not _enabled():
+        return loader()
+    return get_user_cache().get_or_load(kind, value, loader)
+
+
+def invalidate_user(user_id: Optional[str] = None, user_email: Optional[str] = None) -> None:
+    """Drop what is cached for a user, e.g. after their subscription changed."""
+    get_user_cache().invalidate_user(user_id, user_email)
+
+
+def user_cache_stats() -> Dict[str, Any]:
+    """Return the user cache counters and hit rate."""
+    return get_user_cache().stats()
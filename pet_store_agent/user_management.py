@@ -3,11 +3,16 @@
 
 import os
 import json
-import boto3
+import asyncio
 import logging
 
+from system_functions import invoke_system_function
+from telemetry import traced_tool
+from user_cache import BY_EMAIL, BY_ID, cached_user
+
 logger = logging.getLogger(__name__)
 
+@traced_tool
 def get_user_by_id(user_id: str) -> str:
     """
     Get user information by user ID.
@@ -48,27 +53,8 @@ def get_user_by_id(user_id: str) -> str:
     """
     logger.info(f"get_user_by_id called with input: user_id={user_id}")
     
-    lambda_client = boto3.client('lambda')
-    
-    payload = {
-        "function": "getUserById",
-        "parameters": [
-            {
-                "name": "user_id",
-                "value": user_id
-            }
-        ]
-    }
-    
     try:
-        response = lambda_client.invoke(
-            FunctionName=os.environ.get('SYSTEM_FUNCTION_2_NAME'),
-            Payload=json.dumps(payload)
-        )
-        
-        lambda_response = json.loads(response['Payload'].read())
-        # Extract the actual data from the nested response structure
-        actual_data = json.loads(lambda_response['response']['functionResponse']['responseBody']['TEXT']['body'])
+        actual_data = _fetch_user("getUserById", BY_ID, user_id)
         
         result = json.dumps(actual_data)
         logger.info(f"get_user_by_id returning result: {result}")
@@ -80,6 +66,7 @@ def get_user_by_id(user_id: str) -> str:
         logger.info(f"get_user_by_id returning result: {result}")
         return result
 
+@traced_tool
 def get_user_by_email(user_email: str) -> str:
     """
     Get user information by email address.
@@ -120,27 +107,8 @@ def get_user_by_email(user_email: str) -> str:
     """
     logger.info(f"get_user_by_email called with input: user_email={user_email}")
     
-    lambda_client = boto3.client('lambda')
-    
-    payload = {
-        "function": "getUserByEmail",
-        "parameters": [
-            {
-                "name": "user_email",
-                "value": user_email
-            }
-        ]
-    }
-    
     try:
-        response = lambda_client.invoke(
-            FunctionName=os.environ.get('SYSTEM_FUNCTION_2_NAME'),
-            Payload=json.dumps(payload)
-        )
-        
-        lambda_response = json.loads(response['Payload'].read())
-        # Extract the actual data from the nested response structure
-        actual_data = json.loads(lambda_response['response']['functionResponse']['responseBody']['TEXT']['body'])
+        actual_data = _fetch_user("getUserByEmail", BY_EMAIL, user_email)
         
         result = json.dumps(actual_data)
         logger.info(f"get_user_by_email returning result: {result}")
@@ -150,4 +118,18 @@ def get_user_by_email(user_email: str) -> str:
         
         result = f"Failed to get user by email: {str(e)}"
         logger.info(f"get_user_by_email returning result: {result}")
-        return result
\ No newline at end of file
+        return result
+
+def _fetch_user(function: str, parameter: str, value: str):
+    """Look up a user through the user cache, invoking the user-management function on a miss."""
+    def load():
+        return invoke_system_function(os.environ.get('SYSTEM_FUNCTION_2_NAME'), function, {parameter: value})
+    return cached_user(parameter, value, load)
+
+async def aget_user_by_id(user_id: str) -> str:
+    """Async variant of get_user_by_id that runs the Lambda invocation in a worker thread."""
+    return await asyncio.to_thread(get_user_by_id, user_id)
+
+async def aget_user_by_email(user_email: str) -> str:
+    """Async variant of get_user_by_email that runs the Lambda invocation in a worker thread."""
+    return await asyncio.to_thread(get_user_by_email, user_email)
@@ -0,0 +1,118 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import deadline as deadline_module
+from deadline import MIN_MODEL_SAMPLES, Deadline, DeadlineCallbackHandler, model_turn_estimate, record_model_duration
+from usage import TOOL_BUDGET, TURN_BUDGET, UsageBudget
+
+
+class Clock:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def samples(monkeypatch):
+    """Start every test without model call samples, a model turn seed or budgets from the environment."""
+    monkeypatch.setattr(deadline_module, "_model_durations", deque(maxlen=200))
+    monkeypatch.delenv("DEADLINE_MODEL_TURN_MS", raising=False)
+    monkeypatch.delenv("DEADLINE_MARGIN_MS", raising=False)
+
+
+def _deadline(seconds, **budget):
+    return Deadline(seconds, clock=Clock(), usage_budget=UsageBudget(**budget))
+
+
+def _record(*seconds):
+    for value in seconds:
+        record_model_duration(value)
+
+
+def test_no_estimate_below_the_minimum_samples():
+    _record(*[1.0] * (MIN_MODEL_SAMPLES - 1))
+    assert model_turn_estimate() is None
+    _record(1.0)
+    assert model_turn_estimate() == 1.0
+
+
+def test_seed_estimate_until_enough_samples(monkeypatch):
+    monkeypatch.setenv("DEADLINE_MODEL_TURN_MS", "800")
+    _record(5.0)
+    assert model_turn_estimate() == 0.8
+    _record(*[0.5] * (MIN_MODEL_SAMPLES - 1))
+    assert model_turn_estimate() == 5.0
+
+
+def test_estimate_is_the_p95_of_recent_calls():
+    _record(*[0.1] * 18, 2.0, 3.0)
+    assert model_turn_estimate() == 2.0
+
+
+@pytest.mark.parametrize("seconds,estimate,budget,used,limit", [
+    # Without an estimate only the turn budget bounds the steps
+    (10, None, {}, 0, 25),
+    (10, None, {"max_model_turns": 3}, 0, 10),
+    (10, None, {"max_model_turns": 3}, 2, 4),
+    (10, None, {"max_model_turns": 3}, 5, 4),
+    # With one, the model turns that fit before the answer margin
+    (4.5, 1.0, {}, 0, 13),
+    (1.0, 1.0, {}, 0, 4),
+    (100, 1.0, {}, 0, 25),
+    (100, 1.0, {"max_model_turns": 2}, 0, 7),
+])
+def test_recursion_limit(seconds, estimate, budget, used, limit):
+    if estimate is not None:
+        _record(*[estimate] * MIN_MODEL_SAMPLES)
+    deadline = _deadline(seconds, **budget)
+    deadline.model_turns = used
+    assert deadline.recursion_limit() == limit
+
+
+def test_stop_reason_without_an_estimate():
+    deadline = _deadline(2)
+    assert deadline.stop_reason() is None
+    deadline._clock.now = 1.6
+    assert deadline.stop_reason() == "deadline"
+
+
+def test_stop_reason_when_the_next_model_turn_does_not_fit():
+    _record(*[1.0] * MIN_MODEL_SAMPLES)
+    deadline = _deadline(2)
+    assert deadline.stop_reason() is None
+    deadline._clock.now = 0.6
+    assert not deadline.can_start_model_turn()
+    assert deadline.stop_reason() == "deadline"
+
+
+def test_stop_reason_of_spent_usage_budgets():
+    deadline = _deadline(10, max_model_turns=2, max_tool_calls=1)
+    deadline.add_model_turn()
+    assert deadline.stop_reason() is None
+    deadline.add_tool_interval(0.0, 0.1)
+    assert deadline.stop_reason() == TOOL_BUDGET
+    deadline.add_model_turn()
+    assert deadline.stop_reason() == TURN_BUDGET
+    # Running out of time comes first
+    deadline._clock.now = 10
+    assert deadline.stop_reason() == "deadline"
+
+
+def test_concurrent_model_turns_are_all_counted():
+    deadline = _deadline(10)
+    handler = DeadlineCallbackHandler(deadline)
+
+    def start_turns(_):
+        for _ in range(500):
+            handler.on_chat_model_start({}, [[]], run_id=uuid.uuid4())
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(start_turns, range(8)))
+    assert deadline.model_turns == 4000
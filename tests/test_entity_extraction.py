@@ -0,0 +1,80 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import json
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from model_router import _PRODUCT_NAME
+from plan_execute import parse_entities
+from prefetch import extract_identifiers, plan_prefetch
+
+DOGGY = {"productId": "DD006", "name": "Doggy Delights", "price": 54.99, "quantity": 2}
+
+
+@pytest.mark.parametrize("prompt,user_id,user_email,query", [
+    ("CustomerId: usr_001\nCustomerRequest: How much are two Doggy Delights?", "usr_001", None, "How much are two Doggy Delights?"),
+    ("Order for usr_A12b, not usr_B34", "usr_A12b", None, "Order for usr_A12b, not usr_B34"),
+    ("usr_ alone is not an id", None, None, "usr_ alone is not an id"),
+    ("xusr_001 is not an id either", None, None, "xusr_001 is not an id either"),
+    ("Email: John.Doe+pets@virtual-pet.store.com\ncustomerrequest:  two bags ", None, "John.Doe+pets@virtual-pet.store.com", "two bags"),
+    ("Write to john@localhost please", None, None, "Write to john@localhost please"),
+    ("CustomerId: usr_002\nEmail: jane@example.com\nCustomerRequest: Hi", "usr_002", "jane@example.com", "Hi"),
+    ("CustomerRequest: First line\nsecond line", None, None, "First line\nsecond line"),
+    ("CustomerRequest:   ", None, None, None),
+    ("", None, None, None),
+])
+def test_extract_identifiers(prompt, user_id, user_email, query):
+    assert extract_identifiers(prompt) == {"user_id": user_id, "user_email": user_email, "query": query}
+
+
+@pytest.mark.parametrize("prompt,calls", [
+    ("CustomerId: usr_001\nCustomerRequest: Doggy Delights?", [("get_user_by_id", {"user_id": "usr_001"}), ("retrieve_product_info", {"text": "Doggy Delights?"})]),
+    # The id wins over the email
+    ("usr_001 jane@example.com\nCustomerRequest: Hi", [("get_user_by_id", {"user_id": "usr_001"}), ("retrieve_product_info", {"text": "Hi"})]),
+    ("jane@example.com\nCustomerRequest: Hi", [("get_user_by_email", {"user_email": "jane@example.com"}), ("retrieve_product_info", {"text": "Hi"})]),
+    ("CustomerRequest: ", []),
+])
+def test_plan_prefetch(prompt, calls):
+    planned = plan_prefetch(prompt)
+    assert [(call["name"], call["args"]) for call in planned] == calls
+    assert len({call["id"] for call in planned}) == len(planned)
+
+
+@pytest.mark.parametrize("text,names", [
+    ("Is the Doggy Delights still available?", ["Doggy Delights"]),
+    ("I want Bark Park Buddy and Purr Pillow", ["Bark Park Buddy", "Purr Pillow"]),
+    ("Do you sell dog food?", []),
+    # A single capitalized word is not a product name
+    ("Hello, do you have bowls?", []),
+    ("DOGGY DELIGHTS in stock?", []),
+])
+def test_product_names(text, names):
+    assert _PRODUCT_NAME.findall(text) == names
+
+
+@pytest.mark.parametrize("content,entities", [
+    (json.dumps({"items": [DOGGY], "petCareQuestion": ""}), {"items": [DOGGY], "petCareQuestion": ""}),
+    ('Here you go:\n```json\n{"items": [], "petCareQuestion": " How often should I bathe my dog? "}\n```',
+     {"items": [], "petCareQuestion": "How often should I bathe my dog?"}),
+    # Numbers as strings, missing quantity and missing price
+    (json.dumps({"items": [{"productId": "DD006", "price": "54.99", "quantity": "3"}, {"productId": "BP010"}]}),
+     {"items": [{"productId": "DD006", "name": None, "price": 54.99, "quantity": 3},
+                {"productId": "BP010", "name": None, "price": None, "quantity": 1}], "petCareQuestion": ""}),
+    # Items without a product id are skipped, quantities below one become one
+    (json.dumps({"items": [{"name": "Mystery"}, "DD006", {"productId": "DD006", "price": 1, "quantity": 0}], "petCareQuestion": None}),
+     {"items": [{"productId": "DD006", "name": None, "price": 1.0, "quantity": 1}], "petCareQuestion": ""}),
+    (json.dumps({"items": [{"productId": "DD006", "price": "a lot"}]}), None),
+    (json.dumps({"items": "DD006"}), None),
+    (json.dumps([DOGGY]), None),
+    ("I could not find any products.", None),
+    ("{not json}", None),
+])
+def test_parse_entities(content, entities):
+    assert parse_entities(AIMessage(content=content)) == entities
+
+
+def test_parse_entities_from_content_blocks():
+    message = AIMessage(content=[{"type": "text", "text": '{"items": ['}, {"type": "text", "text": "]}"}])
+    assert parse_entities(message) == {"items": [], "petCareQuestion": ""}
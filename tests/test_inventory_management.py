@@ -0,0 +1,78 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import json
+import logging
+
+import pytest
+
+import inventory_management
+from inventory_management import get_inventory_batch
+
+RECORDS = {
+    code: {"product_code": code, "name": f"Product {code}", "quantity": 10 * i, "status": "in_stock", "reorder_level": 5}
+    for i, code in enumerate(["CM001", "DD006", "BP010", "PT003", "PM015"], start=1)
+}
+CODES = ["CM001", "DD006", "BP010", "XX999"]
+
+
+class LambdaCalls(list):
+    """The product codes getInventory was called with (None for a full fetch), and the full-fetch response."""
+    full_response = None
+
+
+@pytest.fixture
+def lambda_calls(monkeypatch):
+    """Answer getInventory from RECORDS, and full fetches with full_response, set in the test."""
+    calls = LambdaCalls()
+
+    def invoke(function_name, function, parameters):
+        calls.append(parameters.get("product_code"))
+        if "product_code" in parameters:
+            return RECORDS.get(parameters["product_code"], {"error": "Product not found"})
+        return calls.full_response
+
+    monkeypatch.setattr(inventory_management, "invoke_system_function", invoke)
+    monkeypatch.setenv("INVENTORY_BATCH_FULL_FETCH_THRESHOLD", "4")
+    return calls
+
+
+def _batch(codes):
+    return json.loads(get_inventory_batch.__wrapped__(codes))
+
+
+@pytest.mark.parametrize("full_response", [
+    list(RECORDS.values()),
+    {"products": list(RECORDS.values())},
+    {"items": list(RECORDS.values())},
+    {"inventory": list(RECORDS.values())},
+])
+def test_full_fetch_answers_a_large_batch(lambda_calls, full_response):
+    lambda_calls.full_response = full_response
+    result = _batch(CODES)
+    assert lambda_calls == [None]
+    assert result["DD006"] == {"quantity": 20, "status": "in_stock", "reorder_level": 5, "name": "Product DD006"}
+    assert result["XX999"] == {"error": "Product XX999 not found"}
+
+
+@pytest.mark.parametrize("full_response", [
+    {"data": list(RECORDS.values())},
+    {"error": "Inventory service timed out"},
+    "CM001,DD006",
+    None,
+])
+def test_unrecognized_full_response_falls_back_to_per_product_lookups(lambda_calls, full_response, caplog):
+    lambda_calls.full_response = full_response
+    with caplog.at_level(logging.WARNING, logger="inventory_management"):
+        result = _batch(CODES)
+    assert lambda_calls[0] is None
+    assert sorted(lambda_calls[1:]) == sorted(CODES)
+    assert result["DD006"]["quantity"] == 20
+    assert result["XX999"] == {"error": "Product not found"}
+    assert "Unrecognized full inventory response" in caplog.text
+
+
+def test_small_batch_uses_per_product_lookups(lambda_calls):
+    result = _batch(["CM001", "DD006", "CM001"])
+    assert sorted(lambda_calls) == ["CM001", "DD006"]
+    assert set(result) == {"CM001", "DD006"}
@@ -0,0 +1,46 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import pytest
+
+from model_router import FAST, STRONG, request_features, route
+
+
+@pytest.mark.parametrize("prompt,products", [
+    ("Is the Doggy Delights at $54.99 still available?", 1),
+    ("Do you sell anything under $20?", 0),
+    ("I bought Bark Bites in 2023, do you still sell them?", 1),
+    ("Is the 2024 catalog out yet?", 0),
+    ("How much is 1,000 treats?", 0),
+    ("Do you have two leashes in red?", 1),
+    ("Two Doggy Delights please", 1),
+    ("I want 2 Doggy Delights and 3 bags of Kitty Crunch", 2),
+    ("Can I order 3 cans of food and 2 bowls?", 2),
+    ("A couple of toys and a pair of collars, please", 2),
+])
+def test_products_counts_names_and_quantity_phrases(prompt, products):
+    assert request_features(prompt)["products"] == products
+
+
+@pytest.mark.parametrize("prompt,tier", [
+    ("Is the Doggy Delights at $54.99 still available?", FAST),
+    ("I bought Bark Bites in 2023, do you still sell them?", FAST),
+    ("I want 2 Doggy Delights and 3 bags of Kitty Crunch", STRONG),
+    ("Can I order 3 cans of food and 2 bowls?", STRONG),
+    ("How often should I bathe my puppy?", STRONG),
+    ("I'm usr_001, is the Doggy Delights in stock?", STRONG),
+])
+def test_route(prompt, tier):
+    assert route(prompt)[0] == tier
+
+
+def test_session_and_disabled_router_go_to_the_strong_tier(monkeypatch):
+    prompt = "Is the Doggy Delights still available?"
+    assert route(prompt, session_id="s1")[0] == STRONG
+    monkeypatch.setenv("MODEL_ROUTER_ENABLED", "false")
+    assert route(prompt)[0] == STRONG
+
+
+def test_long_requests_go_to_the_strong_tier(monkeypatch):
+    monkeypatch.setenv("MODEL_ROUTER_MAX_WORDS", "5")
+    assert route("Is the Doggy Delights still available in blue?")[0] == STRONG
@@ -0,0 +1,131 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import json
+import itertools
+from decimal import Decimal
+
+import pytest
+
+from pricing import (
+    FREE_SHIPPING_THRESHOLD, LARGE_ORDER_SHIPPING, SMALL_ORDER_SHIPPING,
+    calculate_order, item_total, needs_replenishment, price_order, shipping_cost,
+)
+
+PRICES = ["0.01", "0.99", "16.99", "24.99", "54.99", "74.99", "75.00", "149.99", "299.99"]
+QUANTITIES = [1, 2, 3, 5, 10]
+
+
+def _cents(value):
+    return Decimal(str(value)).as_tuple().exponent >= -2
+
+
+@pytest.mark.parametrize("price,quantity", list(itertools.product(PRICES, QUANTITIES)))
+def test_bundle_discount(price, quantity):
+    price = Decimal(price)
+    total = item_total(price, quantity)
+    # First unit at full price, every additional unit 10% off
+    assert abs(total - (price + price * (quantity - 1) * Decimal("0.9"))) <= Decimal("0.005")
+    assert total <= price * quantity
+    # The discount shows once it is worth at least half a cent
+    if price * (quantity - 1) * Decimal("0.1") >= Decimal("0.005"):
+        assert total < price * quantity
+
+
+@pytest.mark.parametrize("price,quantity", list(itertools.product(PRICES, QUANTITIES)))
+def test_order_figures_are_rounded_to_cents(price, quantity):
+    order = price_order([{"productId": "XX001", "price": float(price), "quantity": quantity}])
+    for field in ("subtotal", "shippingCost", "total"):
+        assert _cents(order[field])
+    assert _cents(order["items"][0]["total"])
+    assert order["items"][0]["bundleDiscount"] == (0.10 if quantity > 1 else 0)
+
+
+@pytest.mark.parametrize("price,quantity", list(itertools.product(PRICES, QUANTITIES)))
+def test_total_is_discounted_subtotal_plus_shipping(price, quantity):
+    order = price_order([{"productId": "XX001", "price": float(price), "quantity": quantity}])
+    discounted = Decimal(str(order["subtotal"])) * (1 - Decimal(str(order["additionalDiscount"])))
+    expected = discounted + Decimal(str(order["shippingCost"]))
+    assert abs(Decimal(str(order["total"])) - expected) <= Decimal("0.01")
+    assert order["additionalDiscount"] == (0.15 if order["subtotal"] > 300 else 0)
+
+
+@pytest.mark.parametrize("amount,items,expected", [
+    ("74.99", 1, SMALL_ORDER_SHIPPING),
+    ("74.99", 2, SMALL_ORDER_SHIPPING),
+    ("74.99", 3, LARGE_ORDER_SHIPPING),
+    ("10.00", 12, LARGE_ORDER_SHIPPING),
+    ("75.00", 1, Decimal("0")),
+    ("75.00", 12, Decimal("0")),
+    ("300.00", 2, Decimal("0")),
+    ("0.00", 0, Decimal("0")),
+])
+def test_shipping_cost(amount, items, expected):
+    assert shipping_cost(Decimal(amount), items) == expected
+
+
+@pytest.mark.parametrize("quantities", [[1], [2], [1, 1], [3], [1, 2], [1, 1, 1], [2, 2]])
+def test_large_order_shipping_counts_units(quantities):
+    order = price_order([{"productId": f"XX00{i}", "price": 5.0, "quantity": q} for i, q in enumerate(quantities)])
+    expected = LARGE_ORDER_SHIPPING if sum(quantities) >= 3 else SMALL_ORDER_SHIPPING
+    assert order["shippingCost"] == float(expected)
+
+
+def test_free_shipping_threshold_applies_after_order_discount():
+    # 2 x 160.00 = 304.00 subtotal, 258.40 after the 15% order discount
+    order = price_order([{"productId": "XX001", "price": 160.0, "quantity": 2}])
+    assert order["subtotal"] == 304.0
+    assert order["additionalDiscount"] == 0.15
+    assert order["shippingCost"] == 0
+    assert order["total"] == 258.4
+    assert Decimal(str(order["total"])) >= FREE_SHIPPING_THRESHOLD
+
+
+def test_sample_order_single_item():
+    order = price_order([{"productId": "DD006", "price": 54.99, "quantity": 1}])
+    assert order["items"][0]["total"] == 54.99
+    assert order["items"][0]["bundleDiscount"] == 0
+    assert order["subtotal"] == 54.99
+    assert order["shippingCost"] == 14.95
+    assert order["additionalDiscount"] == 0
+    assert order["total"] == 69.94
+
+
+def test_sample_order_bundle():
+    order = price_order([{"productId": "BP010", "price": 16.99, "quantity": 2}])
+    assert order["items"][0]["total"] == 32.28
+    assert order["items"][0]["bundleDiscount"] == 0.10
+    assert order["subtotal"] == 32.28
+    assert order["shippingCost"] == 14.95
+    assert order["additionalDiscount"] == 0
+    assert order["total"] == 47.23
+
+
+def test_empty_order_is_not_shipped():
+    order = price_order([])
+    assert order["subtotal"] == 0
+    assert order["shippingCost"] == 0
+    assert order["total"] == 0
+
+
+@pytest.mark.parametrize("quantity", [0, -1, -5])
+def test_quantity_below_one_is_rejected(quantity):
+    with pytest.raises(ValueError):
+        price_order([{"productId": "XX001", "price": 10.0, "quantity": quantity}])
+    assert calculate_order.__wrapped__([{"productId": "XX001", "price": 10.0, "quantity": quantity}]).startswith("Failed to calculate order")
+
+
+def test_replenishment_and_availability():
+    order = price_order([
+        {"productId": "XX001", "price": 10.0, "quantity": 2, "inventoryQuantity": 12, "reorderLevel": 10},
+        {"productId": "XX002", "price": 10.0, "quantity": 1, "inventoryQuantity": 50, "reorderLevel": 10},
+        {"productId": "XX003", "price": 10.0, "quantity": 4, "inventoryQuantity": 3, "reorderLevel": 1},
+    ])
+    assert [item["replenishInventory"] for item in order["items"]] == [True, False, True]
+    assert order["unavailableProducts"] == ["XX003"]
+    assert needs_replenishment(None, 10, 1) is False
+
+
+def test_calculate_order_returns_json():
+    result = json.loads(calculate_order.__wrapped__([{"productId": "BP010", "price": 16.99, "quantity": 2}]))
+    assert result["total"] == 47.23
@@ -0,0 +1,121 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import json
+
+import pytest
+
+import inventory_management
+import response_cache
+from response_cache import ResponseCache, get_response_cache, store_response
+
+ACCEPT = json.dumps({"status": "Accept", "message": "Doggy Delights are in stock."})
+REJECT = json.dumps({"status": "Reject", "message": "Sorry, we do not sell that product."})
+ERROR = json.dumps({"status": "Error", "message": "We are sorry for the technical difficulties."})
+IN_STOCK = {"status": "in_stock", "quantity": 150, "reorder_level": 50}
+LOW_STOCK = {"status": "low_stock", "quantity": 40, "reorder_level": 50}
+
+
+class Clock:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setenv("RESPONSE_CACHE_TTL_SECONDS", "300")
+    response_cache.reset_response_cache()
+    yield get_response_cache()
+    response_cache.reset_response_cache()
+
+
+def _read(code, record):
+    """Feed an inventory read of a product to the status versions, as a get_inventory call does."""
+    inventory_management._observe([{"product_code": code, **record}])
+    return {code: inventory_management.status_version(code)}
+
+
+def _key(prompt):
+    return ResponseCache.make_key(prompt, "catalog")
+
+
+def test_cache_is_created_on_first_use_from_the_environment(monkeypatch):
+    response_cache.reset_response_cache()
+    monkeypatch.setenv("RESPONSE_CACHE_MAX_ENTRIES", "7")
+    try:
+        assert get_response_cache().max_entries == 7
+        assert get_response_cache() is get_response_cache()
+    finally:
+        response_cache.reset_response_cache()
+
+
+def test_status_threshold_crossing_drops_dependent_entries(cache):
+    key, other = _key("Do you have Doggy Delights?"), _key("Do you have Bark Bites?")
+    assert store_response(key, ACCEPT, _read("RC001", IN_STOCK))
+    assert store_response(other, ACCEPT, _read("RC002", IN_STOCK))
+
+    # A read within the same bucket changes nothing
+    _read("RC001", {**IN_STOCK, "quantity": 120})
+    assert cache.lookup(key) == ("hit", ACCEPT)
+
+    _read("RC001", LOW_STOCK)
+    assert cache.lookup(key) == ("miss", None)
+    assert cache.lookup(other) == ("hit", ACCEPT)
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_threshold_crossed_on_refresh_is_stale(cache):
+    key = _key("Do you have Doggy Delights?")
+    store_response(key, ACCEPT, _read("RC003", IN_STOCK))
+    refreshed = []
+
+    def refresh(codes):
+        refreshed.extend(codes)
+        _read("RC003", LOW_STOCK)
+        return True
+
+    assert cache.lookup(key, refresh) == ("stale", None)
+    assert refreshed == ["RC003"]
+    assert cache.lookup(key) == ("miss", None)
+    assert cache.stats()["stale"] == 1
+
+
+def test_failed_refresh_is_stale(cache):
+    key = _key("Do you have Doggy Delights?")
+    store_response(key, ACCEPT, _read("RC004", IN_STOCK))
+    assert cache.lookup(key, lambda codes: False) == ("stale", None)
+
+
+def test_confirmed_refresh_is_a_hit(cache):
+    key = _key("Do you have Doggy Delights?")
+    store_response(key, ACCEPT, _read("RC005", IN_STOCK))
+    assert cache.lookup(key, lambda codes: bool(_read("RC005", IN_STOCK))) == ("hit", ACCEPT)
+
+
+@pytest.mark.parametrize("response", [ERROR, "Not JSON", json.dumps(["Accept"])])
+def test_error_responses_are_not_stored(cache, response):
+    key = _key("Do you have Doggy Delights?")
+    assert not store_response(key, response, _read("RC006", IN_STOCK))
+    assert cache.lookup(key) == ("miss", None)
+
+
+def test_accept_without_inventory_reads_is_not_stored(cache):
+    assert not store_response(_key("Do you have Doggy Delights?"), ACCEPT, {})
+    assert store_response(_key("Do you sell parrots?"), REJECT, {})
+    assert cache.stats()["entries"] == 1
+
+
+def test_entries_expire_and_the_least_recent_is_evicted():
+    clock = Clock()
+    cache = ResponseCache(max_entries=2, ttl_seconds=60, clock=clock)
+    for prompt in ("a", "b"):
+        cache.put(_key(prompt), REJECT, {})
+    cache.lookup(_key("a"))
+    cache.put(_key("c"), REJECT, {})
+    assert cache.lookup(_key("b")) == ("miss", None)
+
+    clock.now = 61
+    assert cache.lookup(_key("a")) == ("miss", None)
+    assert cache.stats()["evictions"] == 2
@@ -0,0 +1,194 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import response_validation
+from pricing import price_order
+from prompts import RESPONSE_SCHEMA
+from response_validation import (
+    ERROR_RESPONSE, _coerce, _extract_json, _recompute_totals, compile_schema,
+    repair_response, validate_response, validated_response,
+)
+
+ITEM = {"productId": "DD006", "price": 54.99, "quantity": 2}
+REJECT = {"status": "Reject", "message": "Sorry, we do not sell that product."}
+
+
+class ReaskModel:
+    """Answers every re-ask with the queued content and records the messages."""
+
+    def __init__(self, content):
+        self.content = content
+        self.calls = []
+
+    def invoke(self, messages, config=None):
+        self.calls.append(messages)
+        if isinstance(self.content, Exception):
+            raise self.content
+        return SimpleNamespace(content=self.content)
+
+
+def _accept(**fields):
+    order = price_order([ITEM])
+    return {"status": "Accept", "message": "Thank you for your order.", "customerType": "Guest", **order, **fields}
+
+
+@pytest.mark.parametrize("schema,value,errors", [
+    ({"type": "string"}, "x", []),
+    ({"type": "string"}, 1, ["$: expected string"]),
+    ({"type": "integer"}, True, ["$: expected integer"]),
+    ({"type": "number", "minimum": 0}, -1, ["$: below minimum 0"]),
+    ({"type": "number", "maximum": 1}, 1.5, ["$: above maximum 1"]),
+    ({"type": "string", "maxLength": 3}, "four", ["$: longer than 3 characters"]),
+    ({"enum": ["Accept", "Reject"]}, "accept", ["$: must be one of ['Accept', 'Reject']"]),
+    ({"type": "object", "required": ["status"]}, {}, ["$.status: required"]),
+    ({"type": "array", "minItems": 1}, [], ["$: fewer than 1 items"]),
+    ({"type": "array", "items": {"type": "integer"}}, [1, "2"], ["$[1]: expected integer"]),
+    # A value of the wrong type is not checked any further
+    ({"type": "string", "enum": ["a"]}, 1, ["$: expected string"]),
+])
+def test_compile_schema(schema, value, errors):
+    assert compile_schema(schema)(value) == errors
+
+
+def test_compile_schema_reports_nested_paths():
+    response = _accept()
+    response["items"][0]["quantity"] = 0
+    assert validate_response(response) == ["$.items[0].quantity: below minimum 1"]
+
+
+@pytest.mark.parametrize("text,repairs", [
+    ('{"status": "Reject"}', []),
+    ('```json\n{"status": "Reject"}\n```', ["code_fence"]),
+    ('```\n{"status": "Reject"}\n```', ["code_fence"]),
+    ('Here is the response: {"status": "Reject"} Let me know!', ["surrounding_text"]),
+    ('Sure:\n```json\n{"status": "Reject"}\n```\nThanks', ["code_fence"]),
+])
+def test_extract_json_strips_fences_and_prose(text, repairs):
+    applied = []
+    assert _extract_json(text, applied) == {"status": "Reject"}
+    assert applied == repairs
+
+
+@pytest.mark.parametrize("text", ["No JSON here", '{"status": ', ""])
+def test_extract_json_without_an_object(text):
+    assert _extract_json(text, []) is None
+
+
+@pytest.mark.parametrize("schema,value,expected,repair", [
+    ({"type": "number"}, "54.99", 54.99, "number"),
+    ({"type": "number"}, "$1,099.50", 1099.5, "number"),
+    ({"type": "integer"}, "2", 2, "number"),
+    ({"type": "integer"}, 2.0, 2, "number"),
+    ({"type": "boolean"}, "True", True, "boolean"),
+    ({"type": "string", "enum": ["Accept", "Reject"]}, " accept ", "Accept", "enum"),
+    ({"type": "string", "maxLength": 10}, "one two three four", "one...", "max_length"),
+    ({"type": "object", "properties": {"petAdvice": {"type": "string"}}}, {"petAdvice": None}, {}, "null_field"),
+])
+def test_coerce(schema, value, expected, repair):
+    repairs = []
+    assert _coerce(value, schema, repairs) == expected
+    assert repairs == [repair]
+
+
+@pytest.mark.parametrize("schema,value", [
+    ({"type": "number"}, "a lot"),
+    ({"type": "boolean"}, "maybe"),
+    ({"type": "string", "enum": ["Accept"]}, "Accepted"),
+    ({"type": "object", "required": ["status"]}, {"status": None}),
+])
+def test_coerce_leaves_what_it_cannot_fix(schema, value):
+    repairs = []
+    assert _coerce(dict(value) if isinstance(value, dict) else value, schema, repairs) == value
+    assert repairs == []
+
+
+def test_recompute_totals_fixes_accept_arithmetic():
+    response = _accept(subtotal=100.0, total=1.0)
+    response["items"][0]["total"] = 109.98
+    repairs = []
+    _recompute_totals(response, repairs)
+    assert repairs == ["totals"]
+    assert response == _accept()
+
+
+def test_recompute_totals_leaves_correct_figures_alone():
+    response = _accept()
+    repairs = []
+    _recompute_totals(response, repairs)
+    assert repairs == []
+
+
+@pytest.mark.parametrize("status", ["Reject", "Error"])
+def test_recompute_totals_only_on_accept(status):
+    response = _accept(status=status, total=1.0)
+    repairs = []
+    _recompute_totals(response, repairs)
+    assert repairs == []
+    assert response["total"] == 1.0
+
+
+def test_recompute_totals_needs_price_and_quantity():
+    response = _accept(total=1.0)
+    del response["items"][0]["price"]
+    _recompute_totals(response, [])
+    assert response["total"] == 1.0
+
+
+def test_repair_response():
+    text = "```json\n" + json.dumps({**REJECT, "status": "reject", "petAdvice": None}) + "\n```"
+    repaired, repairs = repair_response(text)
+    assert repaired == REJECT
+    assert sorted(repairs) == ["code_fence", "enum", "null_field"]
+    assert not validate_response(repaired)
+
+
+def test_repair_response_without_json():
+    assert repair_response("I could not find that product.") == (None, [])
+
+
+def test_valid_response_is_returned_as_it_is():
+    text = json.dumps(_accept())
+    assert validated_response(text) == (text, {"outcome": "valid", "repairs": [], "errors": []})
+
+
+def test_repaired_response_does_not_reask(monkeypatch):
+    model = ReaskModel(json.dumps(REJECT))
+    monkeypatch.setattr(response_validation, "_reask_model", model)
+    response, report = validated_response("Answer: " + json.dumps({**_accept(), "total": "1.00"}))
+    assert report["outcome"] == "repaired"
+    assert json.loads(response) == _accept()
+    assert model.calls == []
+
+
+def test_failed_repair_reasks_the_model(monkeypatch):
+    model = ReaskModel(json.dumps(REJECT))
+    monkeypatch.setattr(response_validation, "_reask_model", model)
+    response, report = validated_response(json.dumps({"status": "Maybe", "message": "Hmm"}))
+    assert report["outcome"] == "reasked"
+    assert json.loads(response) == REJECT
+    assert len(model.calls) == 1
+    # The re-ask sees the schema and the errors
+    system, human = model.calls[0]
+    assert json.dumps(RESPONSE_SCHEMA, separators=(",", ":")) in system.content
+    assert "$.status: must be one of" in human.content
+
+
+@pytest.mark.parametrize("content", ["Still not JSON", RuntimeError("throttled")])
+def test_failed_reask_falls_back_to_the_error_response(monkeypatch, content):
+    monkeypatch.setattr(response_validation, "_reask_model", ReaskModel(content))
+    response, report = validated_response("Not JSON at all")
+    assert report["outcome"] == "failed"
+    assert response == ERROR_RESPONSE
+    assert not validate_response(json.loads(ERROR_RESPONSE))
+
+
+def test_reask_can_be_disallowed(monkeypatch):
+    model = ReaskModel(json.dumps(REJECT))
+    monkeypatch.setattr(response_validation, "_reask_model", model)
+    assert validated_response("Not JSON at all", reask_allowed=False)[0] == ERROR_RESPONSE
+    assert model.calls == []
@@ -0,0 +1,109 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import copy
+
+import pytest
+
+from result_compaction import (
+    CHARS_PER_TOKEN, MIN_TRUNCATED_TOKENS, compact_results, estimate_tokens, fit_budget, merge_and_dedupe,
+)
+from retrieval_cache import RetrievalCache
+
+SENTENCE = "The Bark Park Buddy bottle keeps water cool for dogs on long walks in the park. "
+
+
+def _result(text, score, doc="doc-1"):
+    return {
+        "content": {"text": text, "type": "TEXT"},
+        "location": {"customDocumentLocation": {"id": doc}, "type": "CUSTOM"},
+        "score": score,
+    }
+
+
+def _format(results):
+    return "\n\n".join(f"Score: {r['score']}\nDocument: {r['location']['customDocumentLocation']['id']}\n{r['content']['text']}" for r in results)
+
+
+def _texts(results):
+    return [r["content"]["text"] for r in results]
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch):
+    monkeypatch.delenv("RETRIEVAL_COMPACTION_ENABLED", raising=False)
+    monkeypatch.delenv("RETRIEVAL_TOKEN_BUDGET", raising=False)
+    monkeypatch.delenv("RETRIEVAL_DUPLICATE_THRESHOLD", raising=False)
+
+
+def test_overlapping_chunks_of_a_document_are_merged():
+    text = "".join(f"Sentence {i} about the Purr Pillow bed and its washable cover. " for i in range(6))
+    first, second = text[:250], text[180:]
+    merged = merge_and_dedupe([_result(second, 0.7), _result(first, 0.9)], 0.8)
+    assert _texts(merged) == [text]
+    assert merged[0]["score"] == 0.9
+
+
+def test_contained_chunk_is_merged_into_its_document():
+    assert _texts(merge_and_dedupe([_result(SENTENCE * 3, 0.9), _result(SENTENCE, 0.8)], 0.8)) == [SENTENCE * 3]
+
+
+def test_chunks_of_other_documents_are_not_merged():
+    results = merge_and_dedupe([_result(SENTENCE * 2, 0.9, "doc-1"), _result("Kitty Crunch is a dry food for cats.", 0.8, "doc-2")], 0.8)
+    assert len(results) == 2
+
+
+def test_near_duplicates_keep_the_higher_score():
+    duplicate = SENTENCE * 2 + "Dishwasher safe."
+    results = merge_and_dedupe([_result(duplicate, 0.6, "doc-2"), _result(SENTENCE * 2, 0.9, "doc-1")], 0.8)
+    assert [r["score"] for r in results] == [0.9]
+
+
+def test_fit_budget_keeps_results_in_order_until_the_budget():
+    results = [_result("a" * 400, 0.9), _result("b" * 400, 0.8), _result("c" * 400, 0.7)]
+    assert _texts(fit_budget(results, 200 + MIN_TRUNCATED_TOKENS - 1, lambda r: 0)) == ["a" * 400, "b" * 400]
+
+
+def test_fit_budget_truncates_the_last_result_at_a_word_boundary():
+    words = "word " * 200
+    kept = fit_budget([_result("a" * 400, 0.9), _result(words, 0.8)], 100 + MIN_TRUNCATED_TOKENS, lambda r: 0)
+    last = kept[-1]["content"]["text"]
+    assert len(kept) == 2
+    assert last.endswith("word...")
+    assert estimate_tokens(last) <= MIN_TRUNCATED_TOKENS
+    assert len(last) > (MIN_TRUNCATED_TOKENS - 2) * CHARS_PER_TOKEN
+
+
+def test_fit_budget_drops_a_result_too_big_to_truncate_usefully():
+    results = [_result("a" * 400, 0.9), _result("b" * 400, 0.8)]
+    assert _texts(fit_budget(results, 100 + MIN_TRUNCATED_TOKENS - 1, lambda r: 0)) == ["a" * 400]
+
+
+def test_compact_results_stays_within_the_tool_budget(monkeypatch):
+    monkeypatch.setenv("RETRIEVAL_TOKEN_BUDGET_RETRIEVE_PET_CARE", "150")
+    results = [_result(f"Passage {i}. " + "Grooming advice for long-haired cats and dogs. " * 8, 0.9 - i / 100, f"doc-{i}") for i in range(6)]
+    compacted = compact_results(results, "retrieve_pet_care", _format)
+    assert 0 < len(compacted) < len(results)
+    assert estimate_tokens(_format(compacted)) <= 150 + len(compacted)
+
+
+def test_compact_results_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("RETRIEVAL_COMPACTION_ENABLED", "false")
+    results = [_result(SENTENCE, 0.9), _result(SENTENCE, 0.8)]
+    assert compact_results(results, "retrieve_pet_care", _format) is results
+
+
+def test_compaction_does_not_mutate_cached_results(monkeypatch):
+    monkeypatch.setenv("RETRIEVAL_TOKEN_BUDGET", "60")
+    text = "".join(f"Sentence {i} about the Purr Pillow bed and its washable cover. " for i in range(12))
+    cached = [_result(text[:400], 0.9), _result(text[300:], 0.8), _result(SENTENCE * 6, 0.7, "doc-2")]
+    snapshot = copy.deepcopy(cached)
+    cache = RetrievalCache()
+    key = RetrievalCache.make_key("KB", "Purr Pillow", 5, 0.5)
+    cache.get_or_load(key, lambda: cached)
+
+    # Both the merge and the truncation produce new result dicts
+    compacted = compact_results(cache.get_or_load(key, list), "retrieve_product_info", _format)
+    assert _texts(compacted) != _texts(snapshot)
+    assert cache.get_or_load(key, list) == snapshot
+    assert cached == snapshot
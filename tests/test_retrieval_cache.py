@@ -0,0 +1,80 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import retrieval_cache
+from deadline import Deadline, deadline_scope
+from retrieval_cache import RetrievalCache
+
+KEY = RetrievalCache.make_key("KB", "Water bottles for dogs?", 5, 0.5)
+RESULTS = [{"content": {"text": "Water bottle"}, "score": 0.9}]
+DIRECT = [{"content": {"text": "Direct"}, "score": 0.8}]
+
+
+def _stats(cache):
+    return cache.stats()["knowledge_bases"]["KB"]
+
+
+def _start_leader(executor, cache, release):
+    """Start a retrieval that holds KEY in flight until release is set."""
+    started = threading.Event()
+
+    def slow_load():
+        started.set()
+        release.wait(5)
+        return RESULTS
+
+    leader = executor.submit(cache.get_or_load, KEY, slow_load)
+    assert started.wait(5)
+    return leader
+
+
+def test_identical_queries_share_one_retrieval():
+    cache = RetrievalCache()
+    release = threading.Event()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = _start_leader(executor, cache, release)
+        follower = executor.submit(cache.get_or_load, KEY, lambda: DIRECT, 5)
+        release.set()
+        assert leader.result() == RESULTS
+        assert follower.result() == RESULTS
+    assert _stats(cache)["misses"] == 1
+    assert _stats(cache)["coalesced"] == 1
+
+
+def test_waiting_caller_retrieves_directly_after_the_timeout():
+    cache = RetrievalCache()
+    release = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        leader = _start_leader(executor, cache, release)
+        assert cache.get_or_load(KEY, lambda: DIRECT, wait_timeout=0.02) == DIRECT
+        assert _stats(cache)["wait_timeouts"] == 1
+        release.set()
+        assert leader.result() == RESULTS
+    # The leader's results are still cached when they arrive
+    assert cache.get_or_load(KEY, lambda: DIRECT) == RESULTS
+
+
+def test_wait_timeout_leaves_half_the_remaining_request_time(monkeypatch):
+    monkeypatch.setenv("RETRIEVAL_CACHE_WAIT_SECONDS", "10")
+    assert retrieval_cache._wait_timeout() == 10
+    with deadline_scope(Deadline(4)):
+        assert retrieval_cache._wait_timeout() == pytest.approx(2, abs=0.05)
+    with deadline_scope(Deadline(60)):
+        assert retrieval_cache._wait_timeout() == 10
+    with deadline_scope(Deadline(-1)):
+        assert retrieval_cache._wait_timeout() == 0
+
+
+def test_shared_cache_is_created_on_first_use_from_the_environment(monkeypatch):
+    retrieval_cache.reset_retrieval_cache()
+    monkeypatch.setenv("RETRIEVAL_CACHE_MAX_ENTRIES", "7")
+    try:
+        assert retrieval_cache.get_retrieval_cache().max_entries == 7
+        assert retrieval_cache.get_retrieval_cache() is retrieval_cache.get_retrieval_cache()
+    finally:
+        retrieval_cache.reset_retrieval_cache()
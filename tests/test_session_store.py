@@ -0,0 +1,130 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage, ToolMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+import pet_store_agent
+from session_store import SESSION_CONTEXT_KEY, session_checkpointer_class, trim_history, with_session_context
+
+
+class Clock:
+    now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _turn(n, tool=False):
+    messages = [HumanMessage(content=f"request {n}")]
+    if tool:
+        call = {"name": "get_inventory", "args": {}, "id": f"call_{n}", "type": "tool_call"}
+        messages += [AIMessage(content="", tool_calls=[call]), ToolMessage(content="{}", tool_call_id=f"call_{n}")]
+    return messages + [AIMessage(content=f"answer {n}")]
+
+
+def _checkpointer(**kwargs):
+    checkpointer = session_checkpointer_class().from_path(":memory:", eviction_interval=0, **kwargs)
+    checkpointer.setup()
+    return checkpointer
+
+
+def _save(checkpointer, thread_id, size=10):
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"messages": "x" * size}
+    checkpointer.put(config, checkpoint, {"source": "loop", "step": 0}, {})
+
+
+def _checkpoints(checkpointer, thread_id):
+    return list(checkpointer.list({"configurable": {"thread_id": thread_id}}))
+
+
+@pytest.mark.parametrize("turns,kept", [(3, 3), (5, 3), (5, 1)])
+def test_trim_history_keeps_the_most_recent_turns(monkeypatch, turns, kept):
+    monkeypatch.setenv("SESSION_HISTORY_TURNS", str(kept))
+    messages = [message for n in range(turns) for message in _turn(n, tool=n % 2 == 0)]
+    update = trim_history({"messages": messages})
+    if turns <= kept:
+        assert update == {}
+        return
+    assert update["messages"][0] == RemoveMessage(id=REMOVE_ALL_MESSAGES)
+    remaining = update["messages"][1:]
+    assert [m.content for m in remaining if isinstance(m, HumanMessage)] == [f"request {n}" for n in range(turns - kept, turns)]
+    # Tool calls stay paired with their results
+    calls = [call["id"] for m in remaining if isinstance(m, AIMessage) for call in m.tool_calls]
+    assert calls == [m.tool_call_id for m in remaining if isinstance(m, ToolMessage)]
+
+
+def test_trim_history_keeps_the_current_turn(monkeypatch):
+    monkeypatch.setenv("SESSION_HISTORY_TURNS", "0")
+    messages = _turn(0) + _turn(1, tool=True)
+    assert trim_history({"messages": messages})["messages"][1:] == _turn(1, tool=True)
+
+
+def test_session_context_follows_the_latest_request():
+    context = _turn("prefetch", tool=True)[1:3]
+    messages = _turn(0) + [HumanMessage(content="request 1"), AIMessage(content="thinking")]
+    state = {"messages": messages, "remaining_steps": 10}
+    config = {"configurable": {SESSION_CONTEXT_KEY: context}}
+    assert with_session_context(state, config) == {"messages": messages[:3] + context + messages[3:], "remaining_steps": 10}
+    assert with_session_context(state, {"configurable": {}}) is state
+
+
+def test_put_keeps_the_newest_checkpoints():
+    checkpointer = _checkpointer(max_checkpoints=2)
+    for _ in range(4):
+        _save(checkpointer, "session-a")
+    _save(checkpointer, "session-b")
+    assert len(_checkpoints(checkpointer, "session-a")) == 2
+    assert len(_checkpoints(checkpointer, "session-b")) == 1
+
+
+def test_idle_sessions_are_evicted():
+    clock = Clock()
+    checkpointer = _checkpointer(ttl_seconds=60, clock=clock)
+    _save(checkpointer, "session-a")
+    clock.now += 30
+    _save(checkpointer, "session-b")
+    clock.now += 40
+    assert checkpointer.evict() == 1
+    assert _checkpoints(checkpointer, "session-a") == []
+    assert len(_checkpoints(checkpointer, "session-b")) == 1
+    assert checkpointer.stats()["sessions"] == 1
+
+
+def test_least_recently_used_sessions_go_first_over_the_limits():
+    clock = Clock()
+    checkpointer = _checkpointer(max_sessions=2, clock=clock)
+    for thread_id in ("session-a", "session-b", "session-c"):
+        clock.now += 1
+        _save(checkpointer, thread_id)
+    assert [t for t in ("session-a", "session-b", "session-c") if _checkpoints(checkpointer, t)] == ["session-b", "session-c"]
+    assert checkpointer.stats()["evicted"] == 1
+
+
+def test_sessions_over_the_byte_limit_are_evicted():
+    clock = Clock()
+    checkpointer = _checkpointer(max_checkpoints=1, clock=clock)
+    _save(checkpointer, "session-a", size=1000)
+    size = checkpointer.stats()["checkpoint_bytes"]
+    checkpointer.max_bytes = size + size // 2
+    clock.now += 1
+    _save(checkpointer, "session-b", size=1000)
+    assert _checkpoints(checkpointer, "session-a") == []
+    assert checkpointer.stats()["checkpoint_bytes"] <= checkpointer.max_bytes
+
+
+def test_only_agents_with_a_checkpointer_trim_history(monkeypatch):
+    for name in ("KNOWLEDGE_BASE_1_ID", "KNOWLEDGE_BASE_2_ID", "SYSTEM_FUNCTION_1_NAME", "SYSTEM_FUNCTION_2_NAME"):
+        monkeypatch.setenv(name, "test")
+    monkeypatch.setenv("AGENT_MODE", "react")
+    model = GenericFakeChatModel(messages=iter([]))
+    monkeypatch.setattr(GenericFakeChatModel, "bind_tools", lambda self, tools, **kwargs: self, raising=False)
+    shared = pet_store_agent.create_agent(model=model)
+    session = pet_store_agent.create_agent(model=model, checkpointer=_checkpointer())
+    assert "pre_model_hook" not in shared.get_graph().nodes
+    assert "pre_model_hook" in session.get_graph().nodes
@@ -0,0 +1,196 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import io
+import json
+import time
+import threading
+
+import pytest
+from botocore.exceptions import ClientError
+
+import aws_clients
+import system_functions
+from system_functions import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, SystemFunctionError, invoke_system_function
+
+FUNCTION = "test-inventory-management"
+BODY = [{"productId": "DD006", "quantity": 42}]
+
+
+class FaultInjectingLambdaClient:
+    """
+    Lambda client stand-in that fails or stalls invocations as scripted.
+
+    Each invocation takes the next entry of faults, then the value of then: None
+    answers at once, a number stalls for that many seconds before answering, and
+    "throttled" or "unavailable" raises the ClientError boto3 would.
+    """
+
+    def __init__(self, faults=(), then=None):
+        self.faults = list(faults)
+        self.then = then
+        self.invocations = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, FunctionName, Payload, **kwargs):
+        with self._lock:
+            fault = self.faults[self.invocations] if self.invocations < len(self.faults) else self.then
+            self.invocations += 1
+        if fault == "throttled":
+            raise ClientError({"Error": {"Code": "TooManyRequestsException"}, "ResponseMetadata": {"HTTPStatusCode": 429}}, "Invoke")
+        if fault == "unavailable":
+            raise ClientError({"Error": {"Code": "ServiceException"}, "ResponseMetadata": {"HTTPStatusCode": 500}}, "Invoke")
+        if fault is not None:
+            time.sleep(fault)
+        body = {"response": {"functionResponse": {"responseBody": {"TEXT": {"body": json.dumps(BODY)}}}}}
+        return {"StatusCode": 200, "Payload": io.BytesIO(json.dumps(body).encode("utf-8"))}
+
+
+@pytest.fixture
+def lambda_client(monkeypatch):
+    """Install a FaultInjectingLambdaClient with fast retries; set its faults in the test."""
+    monkeypatch.setenv("LAMBDA_RETRY_BASE_MS", "1")
+    monkeypatch.setenv("LAMBDA_TIMEOUT_SECONDS", "5")
+    monkeypatch.setenv("LAMBDA_HEDGING_ENABLED", "false")
+    client = FaultInjectingLambdaClient()
+    aws_clients.set_client("lambda", client)
+    system_functions.reset_invocation_state()
+    yield client
+    system_functions.reset_invocation_state()
+    aws_clients.reset_clients()
+
+
+def _call():
+    return invoke_system_function(FUNCTION, "getInventory", {"productCode": "DD006"})
+
+
+def _stats():
+    return system_functions.invocation_stats()[FUNCTION]
+
+
+def test_breaker_opens_after_consecutive_failures(lambda_client, monkeypatch):
+    monkeypatch.setenv("LAMBDA_BREAKER_FAILURES", "3")
+    monkeypatch.setenv("LAMBDA_MAX_ATTEMPTS", "1")
+    lambda_client.then = "unavailable"
+
+    for _ in range(3):
+        with pytest.raises(SystemFunctionError) as failure:
+            _call()
+        assert failure.value.kind == "unavailable"
+
+    with pytest.raises(SystemFunctionError) as failure:
+        _call()
+    assert failure.value.kind == "circuit_open"
+    # The open breaker fails the call without invoking the function
+    assert lambda_client.invocations == 3
+    assert _stats()["breaker"] == OPEN
+    assert _stats()["short_circuited"] == 1
+
+
+def test_half_open_probe_closes_the_breaker(lambda_client, monkeypatch):
+    monkeypatch.setenv("LAMBDA_BREAKER_FAILURES", "2")
+    monkeypatch.setenv("LAMBDA_BREAKER_RESET_SECONDS", "0.05")
+    monkeypatch.setenv("LAMBDA_MAX_ATTEMPTS", "1")
+    lambda_client.faults = ["unavailable", "unavailable"]
+
+    for _ in range(2):
+        with pytest.raises(SystemFunctionError):
+            _call()
+    assert _stats()["breaker"] == OPEN
+
+    time.sleep(0.06)
+    assert _stats()["breaker"] == HALF_OPEN
+    assert _call() == BODY
+    assert _stats()["breaker"] == CLOSED
+    assert _call() == BODY
+
+
+def test_failed_half_open_probe_reopens_the_breaker(lambda_client, monkeypatch):
+    monkeypatch.setenv("LAMBDA_BREAKER_FAILURES", "2")
+    monkeypatch.setenv("LAMBDA_BREAKER_RESET_SECONDS", "0.05")
+    monkeypatch.setenv("LAMBDA_MAX_ATTEMPTS", "1")
+    lambda_client.then = "unavailable"
+
+    for _ in range(2):
+        with pytest.raises(SystemFunctionError):
+            _call()
+    time.sleep(0.06)
+    with pytest.raises(SystemFunctionError) as failure:
+        _call()
+    assert failure.value.kind == "unavailable"
+    assert _stats()["breaker"] == OPEN
+    assert lambda_client.invocations == 3
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10, clock=lambda: now[0])
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    now[0] = 10.0
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_hedged_request_wins_over_a_stalled_one(lambda_client, monkeypatch):
+    monkeypatch.setenv("LAMBDA_HEDGING_ENABLED", "true")
+    monkeypatch.setenv("LAMBDA_HEDGE_DEFAULT_DELAY_MS", "20")
+    # The first invocation stalls like a cold start; the hedge answers at once
+    lambda_client.faults = [0.5]
+
+    started = time.monotonic()
+    assert _call() == BODY
+    assert time.monotonic() - started < 0.4
+    stats = _stats()
+    assert stats["hedges"] == 1
+    assert stats["hedge_wins"] == 1
+    assert stats["breaker"] == CLOSED
+
+
+def test_throttled_attempt_is_retried(lambda_client):
+    lambda_client.faults = ["throttled"]
+
+    assert _call() == BODY
+    assert lambda_client.invocations == 2
+    assert _stats()["retries"] == 1
+
+
+def test_retries_stop_when_the_retry_budget_runs_out(lambda_client, monkeypatch):
+    monkeypatch.setenv("LAMBDA_RETRY_BUDGET_MAX", "2")
+    monkeypatch.setenv("LAMBDA_MAX_ATTEMPTS", "10")
+    monkeypatch.setenv("LAMBDA_BREAKER_FAILURES", "100")
+    lambda_client.then = "throttled"
+
+    # Two retries are paid for by the budget, then the call fails
+    with pytest.raises(SystemFunctionError) as failure:
+        _call()
+    assert failure.value.kind == "throttled"
+    assert lambda_client.invocations == 3
+
+    # With the budget spent, the next call gets a single attempt
+    with pytest.raises(SystemFunctionError):
+        _call()
+    assert lambda_client.invocations == 4
+    stats = _stats()
+    assert stats["retries"] == 2
+    assert stats["retry_budget"] == 0
+    assert stats["breaker"] == CLOSED
+
+
+@pytest.mark.parametrize("read_timeout,call_timeout,expected", [
+    (None, None, 10),
+    ("60", "3", 3),
+    ("2", "10", 2),
+])
+def test_lambda_client_stops_reading_after_the_call_timeout(monkeypatch, read_timeout, call_timeout, expected):
+    for name, value in (("AWS_CLIENT_READ_TIMEOUT", read_timeout), ("LAMBDA_TIMEOUT_SECONDS", call_timeout)):
+        if value is None:
+            monkeypatch.delenv(name, raising=False)
+        else:
+            monkeypatch.setenv(name, value)
+    assert aws_clients.client_config(1, aws_clients.lambda_call_timeout()).read_timeout == expected
+    assert aws_clients.client_config().read_timeout == float(read_timeout or 60)
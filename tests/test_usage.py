@@ -0,0 +1,101 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import pytest
+
+from deadline import Deadline
+from usage import (
+    COST_BUDGET, DEFAULT_MODEL_ID, TOKEN_BUDGET, TURN_BUDGET,
+    UsageBudget, estimate_cost, usage_report,
+)
+
+PRO = "us.amazon.nova-pro-v1:0"
+LITE = "us.amazon.nova-lite-v1:0"
+
+
+def _deadline(**budget):
+    return Deadline(60, usage_budget=UsageBudget(**budget))
+
+
+@pytest.mark.parametrize("tokens_by_model,cost", [
+    ({}, 0.0),
+    ({PRO: {"input": 1000, "output": 1000}}, 0.004),
+    ({LITE: {"input": 1000, "output": 1000}}, 0.0003),
+    # Cache reads are charged at a quarter of the input price
+    ({PRO: {"input": 1000, "output": 0, "cache_read": 400}}, 0.00056),
+    ({PRO: {"input": 2000, "output": 500}, LITE: {"input": 2000, "output": 500}}, 0.0032 + 0.00024),
+    # Models without a price are charged as the default model
+    ({"stand-in": {"input": 1000, "output": 1000}}, 0.004),
+])
+def test_estimate_cost(tokens_by_model, cost):
+    assert estimate_cost(tokens_by_model) == pytest.approx(cost)
+
+
+def test_model_prices_override_the_defaults(monkeypatch):
+    monkeypatch.setenv("MODEL_PRICES", '{"stand-in": [0.001, 0.002], "%s": [0.01, 0.01]}' % DEFAULT_MODEL_ID)
+    assert estimate_cost({"stand-in": {"input": 1000, "output": 1000}}) == pytest.approx(0.003)
+    assert estimate_cost({"unknown": {"input": 1000, "output": 0}}) == pytest.approx(0.01)
+
+
+@pytest.mark.parametrize("prices", ["not json", '{"stand-in": 1}', '["a"]'])
+def test_unusable_model_prices_are_ignored(monkeypatch, prices):
+    monkeypatch.setenv("MODEL_PRICES", prices)
+    assert estimate_cost({PRO: {"input": 1000, "output": 1000}}) == pytest.approx(0.004)
+
+
+def test_turn_budget_stops_after_the_last_turn():
+    deadline = _deadline(max_model_turns=2)
+    deadline.add_model_turn()
+    assert deadline.usage_budget.exceeded(deadline) is None
+    deadline.add_model_turn()
+    assert deadline.usage_budget.exceeded(deadline) == TURN_BUDGET
+    assert deadline.stop_reason() == TURN_BUDGET
+
+
+def test_token_budget_stops_before_a_turn_that_would_exceed_it():
+    deadline = _deadline(max_tokens=1000)
+    deadline.add_tokens(300, 100, PRO)
+    # 400 used and the next turn is expected to use 400 more
+    assert deadline.usage_budget.exceeded(deadline) is None
+    deadline.add_tokens(300, 100, PRO)
+    assert deadline.usage_budget.exceeded(deadline) == TOKEN_BUDGET
+
+
+def test_cost_budget_stops_before_a_turn_that_would_exceed_it():
+    deadline = _deadline(max_cost_usd=0.01)
+    deadline.add_tokens(1000, 1000, PRO)
+    assert deadline.usage_budget.exceeded(deadline) is None
+    deadline.add_tokens(1000, 1000, PRO)
+    assert deadline.usage_budget.exceeded(deadline) == COST_BUDGET
+
+
+def test_zero_means_no_limit():
+    deadline = _deadline()
+    for _ in range(50):
+        deadline.add_model_turn()
+        deadline.add_tokens(100000, 10000, PRO)
+    assert deadline.usage_budget.exceeded(deadline) is None
+
+
+def test_budgets_from_the_environment(monkeypatch):
+    monkeypatch.setenv("REQUEST_MAX_MODEL_TURNS", "-3")
+    monkeypatch.setenv("REQUEST_MAX_TOOL_CALLS", "oops")
+    monkeypatch.setenv("REQUEST_MAX_COST_USD", "0.05")
+    assert UsageBudget.from_env().as_dict() == {
+        "max_model_turns": None,
+        "max_tool_calls": 20,
+        "max_tokens": None,
+        "max_cost_usd": 0.05,
+    }
+
+
+def test_usage_report():
+    deadline = _deadline(max_model_turns=1)
+    deadline.add_model_turn()
+    deadline.add_tokens(1000, 1000, PRO, cache_read=400)
+    deadline.stopped = deadline.stop_reason()
+    report = usage_report(deadline)
+    assert report["tokens"] == {"input": 1000, "output": 1000, "cache_read": 400, "cache_write": 0, "total": 2000}
+    assert report["cost_usd"] == pytest.approx(0.00056 + 0.0032)
+    assert report["by_model"][PRO]["cost_usd"] == report["cost_usd"]
+    assert report["exceeded"] == TURN_BUDGET
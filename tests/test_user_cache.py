@@ -0,0 +1,117 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import pytest
+
+import user_cache
+from user_cache import BY_EMAIL, BY_ID, UserCache, is_not_found
+
+USER = {"id": "usr_001", "name": "John Doe", "email": "John.Doe@virtualpetstore.com", "subscription_status": "active"}
+
+
+class Loader:
+    """Returns the queued bodies in turn and counts the calls."""
+
+    def __init__(self, *bodies):
+        self.bodies = list(bodies)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        body = self.bodies.pop(0) if len(self.bodies) > 1 else self.bodies[0]
+        if isinstance(body, Exception):
+            raise body
+        return body
+
+
+class Clock:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.mark.parametrize("body,expected", [
+    ({"error": "User not found"}, True),
+    ({"error": "User usr_404 does not exist"}, True),
+    ({"error": "Lookup failed", "statusCode": 404}, True),
+    ({"error": "Task timed out after 3.00 seconds"}, False),
+    ({"error": "Internal server error"}, False),
+    ({"errorMessage": "boom"}, False),
+    (USER, False),
+    ("User not found", False),
+])
+def test_is_not_found(body, expected):
+    assert is_not_found(body) is expected
+
+
+def test_unknown_user_is_cached_as_negative(clock):
+    cache = UserCache(negative_ttl_seconds=60, clock=clock)
+    loader = Loader({"error": "User not found"})
+    assert cache.get_or_load(BY_ID, "usr_404", loader) == {"error": "User not found"}
+    assert cache.get_or_load(BY_ID, "usr_404", loader) == {"error": "User not found"}
+    assert loader.calls == 1
+    assert cache.stats()["negative_hits"] == 1
+
+    clock.now = 61
+    cache.get_or_load(BY_ID, "usr_404", loader)
+    assert loader.calls == 2
+
+
+def test_transient_error_body_is_not_cached(clock):
+    cache = UserCache(clock=clock)
+    loader = Loader({"error": "Task timed out after 3.00 seconds"}, USER)
+    assert cache.get_or_load(BY_ID, "usr_001", loader) == {"error": "Task timed out after 3.00 seconds"}
+    assert cache.stats()["unknown_users"] == 0
+    # The next lookup asks the function again and gets the record
+    assert cache.get_or_load(BY_ID, "usr_001", loader) == USER
+    assert loader.calls == 2
+
+
+def test_error_body_on_refresh_serves_the_cached_record(clock):
+    cache = UserCache(ttl_seconds=300, subscription_ttl_seconds=60, clock=clock)
+    loader = Loader(USER, {"error": "Internal server error"})
+    cache.get_or_load(BY_ID, "usr_001", loader)
+
+    clock.now = 120
+    assert cache.get_or_load(BY_ID, "usr_001", loader) == USER
+    assert loader.calls == 2
+    stats = cache.stats()
+    assert stats["stale"] == 1
+    assert stats["unknown_users"] == 0
+
+
+def test_failed_refresh_serves_the_cached_record(clock):
+    cache = UserCache(ttl_seconds=300, subscription_ttl_seconds=60, clock=clock)
+    loader = Loader(USER, RuntimeError("connection reset"))
+    cache.get_or_load(BY_ID, "usr_001", loader)
+
+    clock.now = 120
+    assert cache.get_or_load(BY_ID, "usr_001", loader) == USER
+    clock.now = 400
+    with pytest.raises(RuntimeError):
+        cache.get_or_load(BY_ID, "usr_001", loader)
+
+
+def test_record_answers_lookups_by_id_and_email(clock):
+    cache = UserCache(clock=clock)
+    loader = Loader(USER)
+    cache.get_or_load(BY_EMAIL, " john.doe@VirtualPetStore.com ", loader)
+    assert cache.get_or_load(BY_ID, "usr_001", loader) == USER
+    assert cache.get_or_load(BY_EMAIL, "JOHN.DOE@virtualpetstore.com", loader) == USER
+    assert loader.calls == 1
+
+
+def test_shared_cache_is_created_on_first_use_from_the_environment(monkeypatch):
+    user_cache.reset_user_cache()
+    monkeypatch.setenv("USER_CACHE_NEGATIVE_TTL_SECONDS", "5")
+    try:
+        assert user_cache.get_user_cache().negative_ttl_seconds == 5
+        assert user_cache.get_user_cache() is user_cache.get_user_cache()
+    finally:
+        user_cache.reset_user_cache()